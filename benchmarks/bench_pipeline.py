@@ -0,0 +1,223 @@
+""" Benchmark suite for the rendering pipeline, stage by stage.
+
+    uv run python benchmarks/bench_pipeline.py [--scales 1,100,10000] [--stages ...]
+                                               [--save baseline.json] [--compare baseline.json]
+
+    Each stage is run over 1, 100 and 10,000 cards of test pattern and TLE-like content,
+    reporting the time per card and the peak traced memory of the run.  Time and memory
+    are measured in separate passes, since tracemalloc slows the code down.  Stages that
+    rasterize are capped at --heavy-cards cards per scale, and stages whose backend
+    cannot be loaded (libcairo, numpy) are skipped.
+
+    --save writes the results as a baseline JSON; --compare reports every result that got
+    slower (or used more memory) than the baseline by more than --threshold, and exits 1
+    if there is any.  Nothing touches the network.
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from puncher.backends import BackendUnavailableError, available, cairosvg
+from puncher.puncher import PunchcardSVG, writepng, writesvg
+from puncher import svgwriter
+
+TEST_PATTERN = "&-0123456789ABCDEFGHIJKLMNOPQR/STUVWXYZ:#@'=\"[.<(+|]$*);^\\,%_>?"
+TLE_LINES = [
+    "ISS (ZARYA)",
+    "1 25544U 98067A   25324.86734766  .00014275  00000-0  26737-3 0  9990",
+    "2 25544  51.6324 250.7347 0003961 150.1460 209.9755 15.48935269539463",
+]
+
+SCALES = [1, 100, 10_000]
+HEAVY_CARDS = 20
+THRESHOLD = 1.25
+# Timing differences below this are noise, whatever the ratio
+NOISE_MS = 0.05
+# Small decks are timed repeatedly, keeping the fastest pass
+MIN_TIMED_CARDS = 100
+
+# makesvg switches, in the order of the +/- flags in the option-combination stage names
+SWITCHES = [ 'print_cellboundaries', 'print_punchboundaries', 'print_punchboxes', 'optimize_cuts', 'merge_punches' ]
+
+
+def deck(cards : int) -> list[str]:
+    """ cards of test pattern, TLE and TLE-like content (TLE lines with varied epochs) """
+    contents = [ TEST_PATTERN, *TLE_LINES ]
+    for number in itertools.count():
+        if len(contents) >= cards:
+            break
+        epoch = f"{25000 + number % 365:05d}.{(number * 7919) % 100000000:08d}"
+        contents.append(f"1 {25544 + number % 1000:05d}U 98067A   {epoch}  .00014275  00000-0  26737-3 0  999{number % 10}")
+    return contents[:cards]
+
+
+def _option_name(options : dict) -> str:
+    return "".join("+" if options.get(name) else "-" for name in SWITCHES)
+
+def _stages(directory : Path) -> dict:
+    """ name -> (run(cards), heavy, requirement) """
+    stages = {}
+    # Each run drops its outputs as it goes, so the peak is the memory one card needs
+    def run_construct(cards):
+        for content in cards:
+            PunchcardSVG(content)
+    stages['construct'] = (run_construct, False, None)
+
+    for flags in itertools.product([False, True], repeat=len(SWITCHES)):
+        options = dict(zip(SWITCHES, flags))
+        def run_makesvg(cards, options=options):
+            for content in cards:
+                PunchcardSVG(content).makesvg(**options)
+        stages[f"makesvg[{_option_name(options)}]"] = (run_makesvg, False, None)
+
+    def run_writesvg(cards):
+        for number, content in enumerate(cards):
+            writesvg(PunchcardSVG(content).makesvg(), directory, f"svg_{number % 100}")
+    stages['writesvg'] = (run_writesvg, False, None)
+
+    def run_svgwriter(cards):
+        for number, content in enumerate(cards):
+            writesvg(svgwriter.dumps(PunchcardSVG(content)), directory, f"direct_{number % 100}")
+    stages['svgwriter+writesvg'] = (run_svgwriter, False, None)
+
+    def run_svgz(cards):
+        for number, content in enumerate(cards):
+            with open(directory / f"svgz_{number % 100}.svgz", "wb") as svgz_file:
+                svgwriter.dump_svgz(PunchcardSVG(content), svgz_file)
+    stages['svgwriter svgz'] = (run_svgz, False, None)
+
+    def run_outlines(cards):
+        for number, content in enumerate(cards):
+            writesvg(svgwriter.dumps(PunchcardSVG(content), outline_text=True), directory, f"outlined_{number % 100}")
+    stages['svgwriter outlines'] = (run_outlines, False, None)
+
+    def run_pdf(cards):
+        from puncher.pdf import writepdf
+        writepdf(cards, directory, "deck")
+    stages['pdf deck'] = (run_pdf, False, None)
+
+    def run_cut_files(cards):
+        from puncher.cutfile import dump_cuts
+        for number, content in enumerate(cards):
+            for form in ('dxf', 'hpgl'):
+                with open(directory / f"cuts_{number % 100}.{form}", "w") as cut_file:
+                    dump_cuts([content], cut_file, form)
+    stages['dxf+hpgl'] = (run_cut_files, False, None)
+
+    def run_writepng(cards):
+        for number, content in enumerate(cards):
+            writepng(svgwriter.dumps(PunchcardSVG(content)), directory, f"png_{number % 100}", dpi=150)
+    stages['writepng[150dpi]'] = (run_writepng, True, 'cairosvg')
+
+    def run_native(cards):
+        from puncher import raster
+        for number, content in enumerate(cards):
+            raster.writepng(PunchcardSVG(content), directory, f"native_{number % 100}", dpi=150)
+    stages['native png[150dpi]'] = (run_native, True, 'native')
+
+    def run_flatten(cards):
+        for number, content in enumerate(cards):
+            writesvg(PunchcardSVG(content).makesvg(flatten_printed_material=True), directory, f"flat_{number % 100}")
+    stages['flatten'] = (run_flatten, True, 'cairosvg')
+    return stages
+
+
+def _time_per_card_ms(run, cards : list[str], repeats : int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(cards)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0 / len(cards)
+
+def _peak_kib(run, cards : list[str]) -> float:
+    tracemalloc.start()
+    try:
+        run(cards)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024.0
+
+def _available(requirement : str | None) -> bool:
+    if requirement is None:
+        return True
+    try:
+        if requirement == 'cairosvg':
+            cairosvg()
+            return True
+    except BackendUnavailableError:
+        return False
+    return available(requirement)
+
+
+def run_suite(scales : list[int], stage_names : list[str] | None, heavy_cards : int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        stages = _stages(Path(directory))
+        for name, (run, heavy, requirement) in stages.items():
+            if stage_names and name not in stage_names:
+                continue
+            if not _available(requirement):
+                print(f"{name:24} skipped, {requirement} is not available")
+                continue
+            run(deck(1))        # warm the per-process caches
+            for scale in scales:
+                cards = deck(min(scale, heavy_cards) if heavy else scale)
+                repeats = 1 if heavy else max(1, MIN_TIMED_CARDS // len(cards))
+                ms_per_card = _time_per_card_ms(run, cards, repeats)
+                peak_kib = _peak_kib(run, cards)
+                key = f"{name}@{scale}"
+                results[key] = { "cards" : len(cards), "ms_per_card" : ms_per_card, "peak_kib" : peak_kib }
+                capped = f" (capped at {len(cards)})" if len(cards) < scale else ""
+                print(f"{name:24} {scale:>6} cards  {ms_per_card:9.3f} ms/card  peak {peak_kib:10.1f} KiB{capped}")
+    return results
+
+def compare(results : dict, baseline : dict, threshold : float) -> list[str]:
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get("results", {}).get(key)
+        if before is None:
+            continue
+        for metric in ("ms_per_card", "peak_kib"):
+            if metric == "ms_per_card" and result[metric] - before[metric] < NOISE_MS:
+                continue
+            if before[metric] > 0 and result[metric] > before[metric] * threshold:
+                regressions.append(f"{key} {metric}: {before[metric]:.3f} -> {result[metric]:.3f} "
+                                   f"({result[metric] / before[metric]:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the punchcard rendering pipeline by stage")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)), help="comma separated deck sizes")
+    parser.add_argument("--stages", help="comma separated stage names to run (default all)")
+    parser.add_argument("--heavy-cards", type=int, default=HEAVY_CARDS, help="most cards for rasterizing stages")
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="compare the results with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="ratio over the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    scales = [ int(scale) for scale in args.scales.split(",") ]
+    stage_names = args.stages.split(",") if args.stages else None
+    results = run_suite(scales, stage_names, args.heavy_cards)
+
+    if args.save:
+        baseline = { "python" : platform.python_version(), "machine" : platform.machine(), "results" : results }
+        Path(args.save).write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {args.threshold}x against {args.compare}")
+
+if __name__ == "__main__":
+    main()
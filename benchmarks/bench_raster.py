@@ -0,0 +1,50 @@
+""" Per-card PNG benchmark: cairosvg rendering of the SVG vs the native raster backend.
+
+    uv run python benchmarks/bench_raster.py [--cards N] [--dpi DPI]
+
+    The cairosvg side is skipped when libcairo cannot be loaded.
+"""
+import argparse
+import time
+
+from puncher.puncher import PunchcardSVG
+from puncher import raster, svgwriter
+
+CARDS = [
+    "&-0123456789ABCDEFGHIJKLMNOPQR/STUVWXYZ:#@'=\"[.<(+|]$*);^\\,%_>?",
+    "1 25544U 98067A   25324.86734766  .00014275  00000-0  26737-3 0  9990",
+    "2 25544  51.6324 250.7347 0003961 150.1460 209.9755 15.48935269539463",
+]
+
+def _cairosvg(content : str, dpi : float) -> bytes:
+    import cairosvg
+    return cairosvg.svg2png(bytestring=svgwriter.dumps(PunchcardSVG(content)).encode('utf-8'),
+                            background_color="white", dpi=dpi)
+
+def _native(content : str, dpi : float) -> bytes:
+    return raster.png_bytes(PunchcardSVG(content), dpi)
+
+def _per_card_ms(render, cards : int, dpi : float) -> float:
+    render(CARDS[0], dpi)       # warm the caches
+    start = time.perf_counter()
+    for index in range(cards):
+        render(CARDS[index % len(CARDS)], dpi)
+    return (time.perf_counter() - start) * 1000.0 / cards
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cairosvg PNG rendering with the native raster backend")
+    parser.add_argument("--cards", type=int, default=50, help="cards rendered per measurement")
+    parser.add_argument("--dpi", type=float, default=96, help="PNG resolution")
+    args = parser.parse_args()
+
+    native_ms = _per_card_ms(_native, args.cards, args.dpi)
+    print(f"native   {native_ms:8.3f} ms/card at {args.dpi} dpi")
+    try:
+        cairo_ms = _per_card_ms(_cairosvg, args.cards, args.dpi)
+    except (ImportError, OSError) as e:
+        print(f"cairosvg unavailable: {e}")
+        return
+    print(f"cairosvg {cairo_ms:8.3f} ms/card at {args.dpi} dpi   speedup {cairo_ms / native_ms:5.1f}x")
+
+if __name__ == "__main__":
+    main()
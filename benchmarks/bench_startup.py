@@ -0,0 +1,81 @@
+""" Start-up benchmark for `puncher --form svg`.
+
+    uv run python benchmarks/bench_startup.py [--runs N] [--target MS]
+
+    Times whole `python -m puncher --form svg` runs in fresh interpreters, lists the
+    slowest imports from `python -X importtime`, and checks that no rasterization module
+    (cairosvg, cairocffi, Pillow, numpy) is loaded for SVG output.  Exits 1 if the median
+    run is over the target or a rasterization module was loaded.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Median wall time of an SVG-only run, in milliseconds.  Most of it is interpreter start
+# and importing svg.py.
+TARGET_MS = 350.0
+
+RASTER_MODULES = [ "cairosvg", "cairocffi", "PIL", "numpy" ]
+
+COMMAND = [ "-m", "puncher", "--form", "svg", "--out", "startup", "--cstring", "HELLO WORLD" ]
+
+_LOADED_MODULES_SCRIPT = """
+import sys
+sys.argv = ["puncher"] + sys.argv[1:]
+import puncher.__main__
+puncher.__main__.main()
+print(" ".join(sorted({ name.split(".")[0] for name in sys.modules })))
+"""
+
+def _run_ms(directory : str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *COMMAND], cwd=directory, check=True, capture_output=True)
+    return (time.perf_counter() - start) * 1000.0
+
+def _slowest_imports(directory : str, count : int) -> list[tuple[int, str]]:
+    """ (cumulative microseconds, module) of the slowest top-level imports """
+    result = subprocess.run([sys.executable, "-X", "importtime", *COMMAND], cwd=directory,
+                            check=True, capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        (_, cumulative, name) = line[len("import time:"):].split("|")
+        if not name.startswith("  "):          # top level imports only, nested ones are included
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def _loaded_raster_modules(directory : str) -> list[str]:
+    result = subprocess.run([sys.executable, "-c", _LOADED_MODULES_SCRIPT, *COMMAND[2:]], cwd=directory,
+                            check=True, capture_output=True, text=True)
+    loaded = set(result.stdout.split())
+    return [ name for name in RASTER_MODULES if name in loaded ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Time puncher start-up for SVG output")
+    parser.add_argument("--runs", type=int, default=10, help="timed runs")
+    parser.add_argument("--target", type=float, default=TARGET_MS, help=f"median target in ms (default {TARGET_MS})")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        _run_ms(directory)     # warm the filesystem and bytecode caches
+        times = [ _run_ms(directory) for _ in range(args.runs) ]
+        median = statistics.median(times)
+        print(f"puncher --form svg: median {median:.1f} ms, min {min(times):.1f} ms over {args.runs} runs (target {args.target:.0f} ms)")
+
+        print("slowest imports (cumulative):")
+        for (microseconds, name) in _slowest_imports(directory, 8):
+            print(f"  {microseconds / 1000.0:8.1f} ms  {name}")
+
+        raster = _loaded_raster_modules(directory)
+        if raster:
+            print(f"rasterization modules loaded for SVG output: {', '.join(raster)}")
+
+    if median > args.target or raster:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
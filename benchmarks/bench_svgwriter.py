@@ -0,0 +1,48 @@
+""" Per-card benchmark: svg.py tree serialization vs the direct SVG writer.
+
+    uv run python benchmarks/bench_svgwriter.py [--cards N]
+"""
+import argparse
+import time
+
+from puncher.puncher import PunchcardSVG
+from puncher import svgwriter
+
+CARDS = [
+    "&-0123456789ABCDEFGHIJKLMNOPQR/STUVWXYZ:#@'=\"[.<(+|]$*);^\\,%_>?",
+    "1 25544U 98067A   25324.86734766  .00014275  00000-0  26737-3 0  9990",
+    "2 25544  51.6324 250.7347 0003961 150.1460 209.9755 15.48935269539463",
+]
+
+OPTION_SETS = {
+    "default" : dict(),
+    "structure" : dict(print_cellboundaries=True, print_punchboundaries=True),
+}
+
+def _tree(content : str, options : dict) -> str:
+    return str(PunchcardSVG(content).makesvg(**options))
+
+def _direct(content : str, options : dict) -> str:
+    # numbers in full, as makesvg writes them
+    return svgwriter.dumps(PunchcardSVG(content), precision=None, **options)
+
+def _per_card_ms(render, cards : int, options : dict) -> float:
+    start = time.perf_counter()
+    for index in range(cards):
+        render(CARDS[index % len(CARDS)], options)
+    return (time.perf_counter() - start) * 1000.0 / cards
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare svg.py tree output with the direct SVG writer")
+    parser.add_argument("--cards", type=int, default=200, help="cards rendered per measurement")
+    args = parser.parse_args()
+
+    for name, options in OPTION_SETS.items():
+        # warm the per-process static layer caches and check the outputs agree
+        assert _tree(CARDS[0], options) == _direct(CARDS[0], options)
+        tree_ms = _per_card_ms(_tree, args.cards, options)
+        direct_ms = _per_card_ms(_direct, args.cards, options)
+        print(f"{name:10} tree {tree_ms:8.3f} ms/card   direct {direct_ms:8.3f} ms/card   speedup {tree_ms / direct_ms:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,31 @@
 import argparse
+from contextlib import contextmanager
 import colorama
 from colorama import Fore, Style
 import logging
 from logging import StreamHandler
 import io
+from itertools import islice, repeat, tee
 from pathlib import Path
 import os
 import sys
+import time
+
+from typing import Iterable, Iterator
+
+from puncher.backends import PNG_BACKENDS
+from puncher.deck import LONG_LINE_MODES
 
 
 logger = logging.getLogger('puncher')
 colorama.init()
 
 def test_cairosvg() -> bool:
+    from puncher.backends import BackendUnavailableError, cairosvg
     try:
-        import cairosvg
-    except OSError as e:
-        print(f"\nAn OS error occurred during import: {e}, please make sure CairoSVG is installed and on the dynamic library path.", file=sys.stderr)
-        print(f"\n\nOn Mac with cairosvg installed using Homebrew, I need:\nexport DYLD_LIBRARY_PATH=/opt/homebrew/lib", file=sys.stderr)
-        # You can add specific handling logic here,
-        # such as providing a fallback or logging the error.
-        return False
-    except ImportError as e:
-        print(f"An import error occurred: {e}")
-        # Handle cases where the module simply isn't found
-        return False
-    except Exception as e:
-        print(f"An unexpected error occurred during import: {e}")
-        # Catch any other unforeseen exceptions
+        cairosvg()
+    except BackendUnavailableError as e:
+        print(f"\n{e}", file=sys.stderr)
         return False
     return True
 
@@ -50,6 +48,19 @@ def _switches(args : argparse.Namespace) -> str:
         switches.append( "+" + switch if getattr(args,switch) else "-" + switch )
     return ','.join(switches)
 
+def _precision(text : str) -> int | None:
+    from puncher.svgwriter import MIN_PRECISION
+
+    if text == "full":
+        return None
+    try:
+        digits = int(text)
+    except ValueError:
+        digits = -1
+    if digits < MIN_PRECISION:
+        raise argparse.ArgumentTypeError(f"invalid precision \"{text}\", expected at least {MIN_PRECISION} decimal places or 'full'")
+    return digits
+
 def _create_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog = "puncher.py",
@@ -68,25 +79,108 @@ EXAMPLES:
   $ puncher --form svg --out iss_tle_1_flat +flatten \
     --cstring "1 25544U 98067A   25324.86734766  .00014275  00000-0  26737-3 0  9990"
 
+  Generate one card per line of a file, written to deck_0001.svg, deck_0002.svg, ...
+  $ puncher --form svg --out deck --deck program.txt
+
+  Same again as PNG, rendering on 8 cores
+  $ puncher --form png --out deck --deck program.txt --jobs 8
+
+  Lay the deck out on 12x24 in cutting mats, written to deck_mat_001.svg, deck_mat_002.svg, ...
+  $ puncher --form svg --out deck --deck program.txt --mat 12x24
+
+  Write the whole deck as one PDF, deck.pdf, a card per page
+  $ puncher --form pdf --out deck --deck program.txt
+
+  Write only the cut lines of the deck, for the cutter, on 12x24 in mats as deck_mat_001.dxf, ...
+  $ puncher --form dxf --out deck --deck program.txt --mat 12x24 +optimizecuts
+
+  Write 96 dpi PNG thumbnails of a deck without going through the SVG
+  $ puncher --form png --out thumb --deck program.txt --png-backend native --dpi 96
+
+  Pipe a compressed card straight to another program, with nothing written to disk
+  $ puncher --form svgz --out - --cstring "HELLO" | ssh plotter 'cat > hello.svgz'
+
+  Keep a render server running for on-demand cards, see puncher serve --help
+  $ puncher serve --port 8080
+
+  Check that every card of a deck punches its line of the deck, see puncher verify --help
+  $ puncher verify --deck program.txt deck_*.svg
+
+  Cut each card as one path in an optimized order, and report the blade work saved
+  $ puncher --form svg --out deck --deck program.txt +optimizecuts +cutreport
+
 DEPENDENCIES:
 
-  libcairo2 - puncher needs to be able to find libcairo2 on the library search path.
+  libcairo2 - for PNG output with the default cairosvg backend, +flatten and PNG mats, puncher
+              needs to be able to find libcairo2 on the library search path.  SVG output does not.
 
 """,
         prefix_chars="+-")
 
     parser.add_argument('--out',
                         required=True,
-                        help="Output path stem, .svg or .png will be appended depending on --form setting")
+                        help="Output path stem, .svg, .svgz, .png, .pdf, .dxf or .hpgl will be appended depending on --form setting.  "
+                             "With -, a single card is written to stdout in the last --form given")
     parser.add_argument('--form', 
-                        choices=['svg','png'], 
+                        choices=['svg','svgz','png','pdf','dxf','hpgl'], 
                         action="append", 
-                        default=['svg'],
-                        help="specify output file form(s) and extensions, options are PNG and SVG")
+                        help="specify output file form(s) and extensions, options are PNG, SVG, SVGZ (gzip compressed SVG) "
+                             "and PDF (with --deck, one PDF of the whole deck, a card per page), or DXF and HPGL for the cut lines alone; "
+                             "SVG by default")
+    parser.add_argument("--precision",
+                        type=_precision,
+                        default=4,
+                        metavar="DIGITS",
+                        help="Decimal places of the lengths and coordinates written to SVG (default 4, 0.0001 in, at least 3), or 'full' for every digit")
     
     cg = parser.add_mutually_exclusive_group(required=True)
     cg.add_argument("--cstring", action="store", help="String to print on the card", required=False)
     cg.add_argument("--testpattern", action="store_true", help="Print a test pattern", required=False)
+    cg.add_argument("--deck", action="store", metavar="PATH", help="Read one card per line from PATH, or - for stdin", required=False)
+
+    parser.add_argument("--long-lines",
+                        choices=LONG_LINE_MODES,
+                        default='split',
+                        help="With --deck, what to do with lines that do not fit on one card: continue on the next card(s) (default), truncate, or stop with an error")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        metavar="N",
+                        help="With --deck, render with N worker processes (default 1, 0 for one per CPU)")
+    parser.add_argument("--dpi",
+                        type=float,
+                        default=600,
+                        help="Resolution of PNG output in pixels per inch (default 600)")
+    parser.add_argument("--png-backend",
+                        choices=PNG_BACKENDS,
+                        default='cairosvg',
+                        help="Draw PNGs by rendering the SVG with cairosvg (default), or natively with numpy, which needs no libcairo")
+    parser.add_argument("--no-cache",
+                        action="store_true",
+                        help="Render every output, without reading or updating the output cache")
+    parser.add_argument("--cache-dir",
+                        metavar="PATH",
+                        help="Output cache directory (default $XDG_CACHE_HOME/puncher or ~/.cache/puncher)")
+    parser.add_argument("--cache-size",
+                        type=float,
+                        default=512,
+                        metavar="MB",
+                        help="Output cache size limit, least recently used outputs are evicted beyond it (default 512)")
+    parser.add_argument("--mat",
+                        metavar="WxH",
+                        help="Lay the card(s) out on cutting mats of W x H inches (e.g. 12x24), one output file per mat")
+    parser.add_argument("--gutter",
+                        type=float,
+                        default=0.25,
+                        metavar="IN",
+                        help="With --mat, space between cards in inches (default 0.25)")
+    parser.add_argument("--profile",
+                        nargs="?",
+                        const="text",
+                        choices=["text", "json"],
+                        help="Report the time spent in each rendering stage, elements drawn per layer and bytes written; with json, as JSON on stdout")
+    parser.add_argument("+sequence",action="store_true", help="With --deck, put sequence numbers in columns 73-80")
+    parser.add_argument("-sequence",action="store_false", help="With --deck, don't put sequence numbers in columns 73-80")
     
     parser.add_argument("+flatten",action="store_true", help="Do flatten printed material to a raster image")
     parser.add_argument("-flatten",action="store_false", help="Don't Flatten printed material to a raster image")
@@ -96,8 +190,131 @@ DEPENDENCIES:
     parser.add_argument("-punchboundaries",action="store_false", help="Don't print all the punch hole location boundaries")
     parser.add_argument("+printpunch",action="store_true", help="Do print boxes for punch holes")
     parser.add_argument("-printpunch",action="store_false", help="Don't print boxes for punch holes")
+    parser.add_argument("+optimizecuts",action="store_true", help="Do cut each card as one path, ordered to keep the cutter's travel short")
+    parser.add_argument("-optimizecuts",action="store_false", help="Don't optimize the cut path, cut the boundary and then each hole")
+    parser.add_argument("+mergepunches",action="store_true", help="Do cut punches in adjacent rows of a column as one slot (implies +optimizecuts)")
+    parser.add_argument("-mergepunches",action="store_false", help="Don't merge punches in adjacent rows")
+    parser.add_argument("+defs",action="store_true", help="Do draw repeated labels and grid shapes once in <defs> and place them with <use>, for smaller files")
+    parser.add_argument("-defs",action="store_false", help="Don't use <defs>, write every element in full")
+    parser.add_argument("+outlines",action="store_true", help="Do draw the printed labels as glyph outlines, so they look the same in every renderer")
+    parser.add_argument("-outlines",action="store_false", help="Don't outline the labels, write them as text in the style's fonts")
+    parser.add_argument("+cutreport",action="store_true", help="Do report cut length and travel, before and after cut path optimization")
+    parser.add_argument("-cutreport",action="store_false", help="Don't report cut length and travel")
+    return parser
+
+def _create_serve_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog = "puncher.py serve",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description = """Punchcard render server\n\n
+Renders cards on request over loopback HTTP (or a Unix socket), keeping the renderers warm
+between requests.  POST /render with a JSON body such as
+
+  {"text": "HELLO", "form": "png", "dpi": 150, "options": {"print_punchboundaries": true}}
+
+returns the SVG or PNG.  GET /health returns "ok".
+
+EXAMPLES:
+
+  $ puncher serve --port 8080 --jobs 4
+  $ curl -s -d '{"text": "HELLO"}' http://127.0.0.1:8080/render > hello.svg
+""")
+    parser.add_argument("--host", default="127.0.0.1", help="Loopback address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default 8080)")
+    parser.add_argument("--socket", metavar="PATH", help="Listen on the Unix socket PATH instead of HTTP on --host:--port")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=0,
+                        metavar="N",
+                        help="Render with N worker processes (default 0, one per CPU)")
+    return parser
+
+def _serve(argv : list[str]) -> None:
+    from puncher.serve import serve
+
+    args = _create_serve_parser().parse_args(argv)
+    where = args.socket if args.socket else f"http://{args.host}:{args.port}"
+    _console_message(f"serving punchcards on {where}, jobs={args.jobs or os.cpu_count()}")
+    try:
+        serve(host=args.host, port=args.port, unix_socket=args.socket, jobs=args.jobs)
+    except (OSError, ValueError) as e:
+        _console_message(f"{e}", type='ERROR')
+        sys.exit(1)
+
+def _create_verify_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog = "puncher.py verify",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description = """Punchcard verifier\n\n
+Reads rendered cards (SVG, SVGZ, PNG or puncher's PDF decks) back to text from the holes in
+their cut lines.  With --deck or --cstring, checks that each card carries the text it was
+made from, in order, and exits 1 if any card differs; otherwise prints each card's text.
+
+EXAMPLES:
+
+  $ puncher verify --deck program.txt +sequence deck_*.svg
+  $ puncher verify --deck program.txt --jobs 8 deck.pdf
+  $ puncher verify iss_tle_1.png
+""",
+        prefix_chars="+-")
+    parser.add_argument("files", nargs="+", metavar="FILE", help="Card files to read, in deck order")
+    cg = parser.add_mutually_exclusive_group()
+    cg.add_argument("--deck", metavar="PATH", help="Deck the cards were made from, one card per line, or - for stdin")
+    cg.add_argument("--cstring", help="Text of the single card")
+    parser.add_argument("--long-lines",
+                        choices=LONG_LINE_MODES,
+                        default='split',
+                        help="How the deck's long lines were handled when the cards were made (default split)")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        metavar="N",
+                        help="Read the files with N worker processes (0 for one per CPU)")
+    parser.add_argument("+sequence",action="store_true", help="The cards were made with sequence numbers in columns 73-80")
+    parser.add_argument("-sequence",action="store_false", help="The cards were made without sequence numbers")
     return parser
 
+def _verify(argv : list[str]) -> None:
+    from puncher.deck import cards_from_lines, read_lines
+    from puncher.verify import verify
+
+    args = _create_verify_parser().parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    deck_file = None
+    expected = None
+    if args.deck:
+        try:
+            deck_file = sys.stdin if args.deck == "-" else open(args.deck)
+        except OSError as e:
+            _console_message(f"{args.deck}: {type(e).__name__}: {e}", type='ERROR')
+            sys.exit(1)
+        expected = cards_from_lines(read_lines(deck_file), long_lines=args.long_lines, sequence=args.sequence)
+    elif args.cstring is not None:
+        expected = [args.cstring]
+
+    start = time.perf_counter()
+    count = 0
+    failed = 0
+    try:
+        for check in verify(args.files, expected, jobs=jobs):
+            count += 1
+            if not check.ok:
+                failed += 1
+                _console_message(check.describe(), type='ERROR')
+            elif expected is None:
+                print(f"{check.source}\t{check.text.rstrip()}")
+    except ValueError as e:
+        _console_message(f"{e}", type='ERROR')
+        sys.exit(1)
+    finally:
+        if deck_file is not None and deck_file is not sys.stdin:
+            deck_file.close()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    _console_message(f"read {count} cards in {elapsed:.2f}s ({rate:.1f} cards/s), {failed} failed")
+    if failed:
+        sys.exit(1)
+
 def main():
     parser = _create_parser()
     
@@ -110,36 +327,272 @@ def main():
         logger.addHandler(ch)
         logger.setLevel(debug_level)
 
+    if sys.argv[1:2] == ['serve']:
+        _serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['verify']:
+        _verify(sys.argv[2:])
+        return
+
     args = parser.parse_args()
+    args.form = args.form or ['svg']
+    if args.profile:
+        from puncher import profiling
+        profiling.enable()
+        try:
+            _run(args)
+        finally:
+            _print_profile(args.profile, profiling.disable())
+    else:
+        _run(args)
 
-    if not test_cairosvg():
+def _run(args : argparse.Namespace) -> None:
+    needs_cairosvg = args.flatten or ('png' in args.form and (args.png_backend == 'cairosvg' or args.mat))
+    if needs_cairosvg and not test_cairosvg():
         _console_message("Failure loading cairosvg library, bailing out.", type='ERROR')
         sys.exit(1)
 
     logger.info("puncher start")
-    if args.testpattern:
-        content = "&-0123456789ABCDEFGHIJKLMNOPQR/STUVWXYZ:#@'=\"[.<(+|]$*);^\\,%_>?"
-    else: 
-        content = args.cstring
+    if args.out == '-' and (args.mat or (args.deck and args.form != ['pdf'])):
+        _console_message("--out - writes a single card, or a deck as --form pdf, to stdout", type='ERROR')
+        sys.exit(1)
+    if args.mat and 'pdf' in args.form:
+        _console_message("--mat cannot write PDF, use --form svg, svgz, png, dxf or hpgl", type='ERROR')
+        sys.exit(1)
+    if args.mat:
+        _render_mats(args)
+        return
+    if args.deck:
+        _render_deck(args)
+        return
+
+    content = _single_card_content(args)
     _console_message(f"creating punchcard with content: \"{content}\", switches={_switches(args)} ")
      
     logger.debug(f"puncher with arguments: {str(args)}")
+    try:
+        if args.out == '-':
+            _write_card_stdout(content, args)
+        else:
+            _render_card(content, args, args.out)
+        if args.cutreport:
+            totals = _cut_totals()
+            for _ in _cut_report_pass([content], args, totals):
+                pass
+            _print_cut_report(totals)
+    except ValueError as e:
+        _console_message(f"{e}", type='ERROR')
+        sys.exit(1)
 
-    from puncher.puncher import PunchcardSVG, writepng, writesvg
-    ps = PunchcardSVG(content)
-    svg_content = ps.makesvg(flatten_printed_material=args.flatten,
-                             print_cellboundaries=args.cellboundaries,
-                             print_punchboundaries=args.punchboundaries,
-                             print_punchboxes=args.printpunch,)
+def _print_profile(form : str, stats) -> None:
+    if form == "json":
+        import json
+        print(json.dumps(stats.as_dict(), indent=2))
+        return
+    for line in stats.describe():
+        _console_message(f"profile: {line}")
 
-    if 'svg' in args.form:
-        _console_message(f"writing SVG to: {args.out}.svg")
-        writesvg(svg_content=svg_content,path=Path('.'), stem=args.out)
+def _single_card_content(args : argparse.Namespace) -> str:
+    if args.testpattern:
+        return "&-0123456789ABCDEFGHIJKLMNOPQR/STUVWXYZ:#@'=\"[.<(+|]$*);^\\,%_>?"
+    return args.cstring
 
+def _render_card(content : str, args : argparse.Namespace, stem : str) -> None:
+    from puncher.batch import render_card_files
+    options = _render_options(args)
+    (outputs, hits) = render_card_files(content, Path('.'), stem, args.form, **options)
+    for output in outputs:
+        _console_message(f"writing {output.suffix[1:].upper()} to: {output}")
+    if options['cache'] is not None:
+        if hits:
+            _console_message(f"{hits} of {len(outputs)} outputs from the cache in {options['cache'].directory}")
+        options['cache'].trim()
 
-    if 'png' in args.form:
-        _console_message(f"writing PNG to: {args.out}.png")
-        writepng(svg_content=svg_content,path=Path('.'), stem=args.out)
+def _write_card_stdout(content : str, args : argparse.Namespace) -> None:
+    """ The card in the last --form given, streamed to stdout for another program """
+    from puncher.puncher import render
+    _console_message(f"writing {args.form[-1].upper()} to stdout")
+    render(content, args.form[-1], sys.stdout.buffer, dpi=args.dpi, png_backend=args.png_backend, **_makesvg_options(args))
+    sys.stdout.buffer.flush()
+
+def _makesvg_options(args : argparse.Namespace) -> dict:
+    return dict(flatten_printed_material=args.flatten,
+                print_cellboundaries=args.cellboundaries,
+                print_punchboundaries=args.punchboundaries,
+                print_punchboxes=args.printpunch,
+                optimize_cuts=args.optimizecuts or args.mergepunches,
+                merge_punches=args.mergepunches,
+                use_defs=args.defs,
+                outline_text=args.outlines,
+                precision=args.precision)
+
+def _render_options(args : argparse.Namespace) -> dict:
+    return dict(_makesvg_options(args), png_backend=args.png_backend, dpi=args.dpi, cache=_output_cache(args))
+
+def _output_cache(args : argparse.Namespace):
+    if args.no_cache:
+        return None
+    from puncher.cache import OutputCache
+    return OutputCache(args.cache_dir, max_bytes=int(args.cache_size * 1024 * 1024))
+
+def _cut_totals() -> list:
+    """ Running [plain, optimized] CutStats for a run """
+    from puncher.cutpath import CutStats
+    return [ CutStats(), CutStats() ]
+
+def _cut_report_pass(cards : Iterable[str], args : argparse.Namespace, totals : list) -> Iterator[str]:
+    """ Pass the cards through, adding each card's plain and optimized CutStats to totals """
+    from puncher.cutpath import cut_report
+    from puncher.puncher import PunchcardSVG
+    for content in cards:
+        (before, after) = cut_report(PunchcardSVG(content), merge_punches=args.mergepunches)
+        totals[0] += before
+        totals[1] += after
+        yield content
+
+def _print_cut_report(totals : list) -> None:
+    (before, after) = totals
+    _console_message(f"cut path as drawn: {before.describe()}")
+    _console_message(f"cut path optimized: {after.describe()}")
+    if before.travel_in > 0:
+        _console_message(f"travel saved: {before.travel_in - after.travel_in:.2f} in "
+                         f"({100.0 * (1.0 - after.travel_in / before.travel_in):.0f}%)")
+
+def _pdf_pass(cards : Iterable[str], pdf) -> Iterator[str]:
+    """ Pass the cards through, writing each as the next page of the DeckPDF pdf """
+    for content in cards:
+        pdf.add(content)
+        yield content
+
+def _render_deck(args : argparse.Namespace) -> None:
+    from puncher.batch import render_deck
+    from puncher.deck import cards_from_lines, read_lines
+    import puncher.svgwriter    # load the renderer before the clock starts
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    _console_message(f"creating punchcards from deck: \"{args.deck}\", jobs={jobs}, switches={_switches(args)} ")
+    try:
+        deck_file = sys.stdin if args.deck == "-" else open(args.deck)
+    except OSError as e:
+        _console_message(f"{args.deck}: {type(e).__name__}: {e}", type='ERROR')
+        sys.exit(1)
+    card_forms = [ form for form in args.form if form != 'pdf' ]
+    options = _render_options(args)
+    start = time.perf_counter()
+    count = 0
+    failed = 0
+    cache_hits = 0
+    with deck_file, _deck_pdf(args) as pdf:
+        cards = cards_from_lines(read_lines(deck_file), long_lines=args.long_lines, sequence=args.sequence)
+        totals = _cut_totals()
+        if args.cutreport:
+            cards = _cut_report_pass(cards, args, totals)
+        if pdf is not None:
+            cards = _pdf_pass(cards, pdf)
+        try:
+            if not card_forms:
+                # PDF only: the pass writes every page
+                count = sum(1 for _ in cards)
+            else:
+                for result in render_deck(cards, Path('.'), args.out, card_forms, jobs=jobs, **options):
+                    count += 1
+                    cache_hits += result.cache_hits
+                    if result.error:
+                        failed += 1
+                        _console_message(f"card {result.number} \"{result.content}\": {result.error}", type='ERROR')
+                    else:
+                        logger.info(f"card {result.number}: \"{result.content}\" -> {result.stem}")
+        except ValueError as e:
+            _console_message(f"{e}", type='ERROR')
+            sys.exit(1)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    written = [ f"{args.out}_NNNN.{{{','.join(sorted(set(card_forms)))}}}" ] if card_forms else []
+    if pdf is not None:
+        written.append("stdout" if args.out == '-' else f"{args.out}.pdf")
+    _console_message(f"wrote {count - failed} cards to {' and '.join(written)} in {elapsed:.2f}s ({rate:.1f} cards/s)")
+    if options['cache'] is not None and card_forms:
+        _console_message(f"{cache_hits} outputs from the cache in {options['cache'].directory}")
+        options['cache'].trim()
+    if args.cutreport:
+        _print_cut_report(totals)
+    if failed:
+        _console_message(f"{failed} of {count} cards failed", type='ERROR')
+        sys.exit(1)
+
+@contextmanager
+def _deck_pdf(args : argparse.Namespace) -> Iterator:
+    """ DeckPDF writing <out>.pdf (or stdout for --out -) with --form pdf, otherwise None """
+    if 'pdf' not in args.form:
+        yield None
+        return
+    from puncher.pdf import DeckPDF
+    if args.out == '-':
+        with DeckPDF(sys.stdout.buffer, **_makesvg_options(args)) as pdf:
+            yield pdf
+        sys.stdout.buffer.flush()
+        return
+    _console_message(f"writing PDF to: {args.out}.pdf")
+    with open(f"{args.out}.pdf", "wb") as pdf_file, DeckPDF(pdf_file, **_makesvg_options(args)) as pdf:
+        yield pdf
+
+def _render_mats(args : argparse.Namespace) -> None:
+    from puncher.deck import cards_from_lines, read_lines
+    from puncher.cutfile import CUT_FORMATS, dump_cuts
+    from puncher.impose import impose, mat_layout, mat_stem, parse_mat_size
+    from puncher.puncher import writepng, writesvg, writesvgz
+
+    deck_file = None
+    try:
+        (mat_width, mat_height) = parse_mat_size(args.mat)
+        if args.deck:
+            try:
+                deck_file = sys.stdin if args.deck == "-" else open(args.deck)
+            except OSError as e:
+                _console_message(f"{args.deck}: {type(e).__name__}: {e}", type='ERROR')
+                sys.exit(1)
+            cards = cards_from_lines(read_lines(deck_file), long_lines=args.long_lines, sequence=args.sequence)
+        else:
+            cards = iter([_single_card_content(args)])
+        totals = _cut_totals()
+        if args.cutreport:
+            cards = _cut_report_pass(cards, args, totals)
+        _console_message(f"imposing punchcards on {mat_width}x{mat_height} in mats, switches={_switches(args)} ")
+        per_mat = len(mat_layout(mat_width, mat_height, gutter_in=args.gutter))
+        svg_forms = [ form for form in args.form if form not in CUT_FORMATS ]
+        if svg_forms:
+            # The cut files are written from the same cards as each SVG mat, a mat's worth behind
+            (cards, mat_cards) = tee(cards)
+            mats = impose(cards, mat_width_in=mat_width, mat_height_in=mat_height, gutter_in=args.gutter,
+                          **_makesvg_options(args))
+        else:
+            mat_cards = cards
+            mats = repeat(None)
+        batches = iter(lambda: list(islice(mat_cards, per_mat)), [])
+        for number, (batch, mat) in enumerate(zip(batches, mats), start=1):
+            stem = mat_stem(args.out, number)
+            for form in [ form for form in CUT_FORMATS if form in args.form ]:
+                _console_message(f"writing {form.upper()} to: {stem}.{form}")
+                with open(f"{stem}.{form}", "w") as cut_file:
+                    dump_cuts(batch, cut_file, form, mat_width_in=mat_width, mat_height_in=mat_height,
+                              gutter_in=args.gutter, **_makesvg_options(args))
+            if 'svg' in args.form:
+                _console_message(f"writing SVG to: {stem}.svg")
+                writesvg(svg_content=mat, path=Path('.'), stem=stem)
+            if 'svgz' in args.form:
+                _console_message(f"writing SVGZ to: {stem}.svgz")
+                writesvgz(svg_content=mat, path=Path('.'), stem=stem)
+            if 'png' in args.form:
+                _console_message(f"writing PNG to: {stem}.png")
+                writepng(svg_content=mat, path=Path('.'), stem=stem, dpi=args.dpi)
+        if args.cutreport:
+            _print_cut_report(totals)
+    except (ValueError, OSError) as e:
+        _console_message(f"{e}", type='ERROR')
+        sys.exit(1)
+    finally:
+        if deck_file is not None and deck_file is not sys.stdin:
+            deck_file.close()
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
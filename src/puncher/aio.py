@@ -0,0 +1,180 @@
+""" Asyncio front end to rendering, for services running on an event loop.
+
+    Rendering is CPU bound, cairosvg most of all, and would hold the event loop for the
+    whole card.  Here the renders run on an executor, a thread pool or a pool of worker
+    processes, and output files are written from a thread.  A semaphore caps the renders
+    in flight, so one card's rasterization overlaps other cards' compression and writes
+    without queueing an unbounded backlog on the pool:
+
+        async with AsyncRenderer('process', jobs=4, dpi=150) as renderer:
+            png = await renderer.render("HELLO", "png")
+            async for result in renderer.render_deck(lines, Path("out"), "deck", forms=('svg', 'png')):
+                ...
+
+    Cancelling a task cancels its cards: renders still queued on the executor are
+    dropped, and a render already running finishes in the background and is discarded.
+
+    A PunchcardSVG keeps the output it last wrote and builds its layers on first use, so
+    on a thread pool the renders of one card object take turns; different cards render
+    in parallel.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Iterable
+from weakref import WeakKeyDictionary
+
+from puncher.batch import CardResult, _worker_init
+from puncher.deck import card_stem
+from puncher.puncher import OUTPUT_FORMATS, PunchcardSVG, render
+
+logger = logging.getLogger("puncher")
+
+EXECUTORS = [ 'thread', 'process' ]
+
+# PunchcardSVG -> the lock its renders hold, for cards shared between threads
+_card_locks : WeakKeyDictionary = WeakKeyDictionary()
+_card_locks_lock = threading.Lock()
+
+def _render_card(card : PunchcardSVG | str, format : str, **options) -> bytes:
+    """ render() holding card's lock if it is a PunchcardSVG, which renders mutate """
+    if not isinstance(card, PunchcardSVG):
+        return render(card, format, **options)
+    with _card_locks_lock:
+        lock = _card_locks.setdefault(card, threading.Lock())
+    with lock:
+        return render(card, format, **options)
+
+async def render_async(card : PunchcardSVG | str,
+                       format : str = 'svg',
+                       executor : Executor | None = None,
+                       **options) -> bytes:
+    """ The bytes of puncher.puncher.render(card, format, **options), rendered on executor
+        (the event loop's default thread pool if None) without blocking the loop.  With a
+        process pool, card must be the text to punch.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(_render_card, card, format, **options))
+
+async def _cards(cards : Iterable[str] | AsyncIterable[str]) -> AsyncIterator[str]:
+    if isinstance(cards, AsyncIterable):
+        async for content in cards:
+            yield content
+    else:
+        for content in cards:
+            yield content
+
+
+class AsyncRenderer:
+    """ Renders cards off the event loop, at most limit at a time """
+
+    def __init__(self,
+                 executor : str | Executor = 'thread',
+                 jobs : int = 0,
+                 limit : int | None = None,
+                 **options):
+        """ executor is one of EXECUTORS, for a pool of jobs threads or worker processes
+            (0 for one per CPU) owned by the renderer, or an Executor of the caller's,
+            left running on close.  limit caps the renders in flight, by default twice
+            the workers.  options are render options (dpi, png_backend and the makesvg
+            switches) applied to every card, which each call can override.
+        """
+        workers = jobs if jobs > 0 else os.cpu_count()
+        if isinstance(executor, Executor):
+            self.executor = executor
+            self._owned = False
+        elif executor == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="puncher")
+            self._owned = True
+        elif executor == 'process':
+            # each worker builds the card template and loads the PNG backend once
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                                                initargs=(('svg', 'png'), options))
+            self._owned = True
+        else:
+            raise ValueError(f"unknown executor \"{executor}\", expected one of {', '.join(EXECUTORS)} or an Executor")
+        self.limit = limit if limit is not None else 2 * workers
+        if self.limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.options = options
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def render(self, card : PunchcardSVG | str, format : str = 'svg', **options) -> bytes:
+        """ card rendered in format, as puncher.puncher.render would return it """
+        async with self._semaphore:
+            return await render_async(card, format, self.executor, **dict(self.options, **options))
+
+    async def write(self,
+                    card : PunchcardSVG | str,
+                    path : Path,
+                    stem : str,
+                    forms : Iterable[str] = ('svg',),
+                    **options) -> list[Path]:
+        """ Render card to path / stem.<form> for each form, rendering the forms concurrently
+            and writing the files from a thread.  Returns the files written.
+        """
+        forms = [ form for form in OUTPUT_FORMATS if form in set(forms) ]
+        renders = await asyncio.gather(*(self.render(card, form, **options) for form in forms))
+        outputs = [ path / f"{stem}.{form}" for form in forms ]
+        for filename in outputs:
+            logger.info(f"writing to \"{filename}\"")
+        await asyncio.gather(*(asyncio.to_thread(filename.write_bytes, data)
+                               for filename, data in zip(outputs, renders)))
+        return outputs
+
+    async def _card_result(self, number : int, content : str, path : Path, stem : str,
+                           forms : Iterable[str], options : dict) -> CardResult:
+        result = CardResult(number=number, content=content, stem=card_stem(stem, number))
+        try:
+            result.outputs = await self.write(content, path, result.stem, forms, **options)
+        except Exception as e:
+            logger.debug(f"card {number} failed", exc_info=True)
+            result.error = f"{type(e).__name__}: {e}"
+        return result
+
+    async def render_deck(self,
+                          cards : Iterable[str] | AsyncIterable[str],
+                          path : Path,
+                          stem : str,
+                          forms : Iterable[str] = ('svg',),
+                          **options) -> AsyncIterator[CardResult]:
+        """ Render every card in cards, an iterable or async iterable of card texts, to
+            path / <stem>_NNNN.<form>, yielding a CardResult per card in deck order as
+            batch.render_deck does.  The deck is consumed lazily, limit cards ahead of the
+            results.  Closing the iterator early, or cancelling the task consuming it,
+            cancels the cards still in flight.
+        """
+        forms = tuple(forms)
+        in_flight : deque[asyncio.Task] = deque()
+        try:
+            number = 0
+            async for content in _cards(cards):
+                number += 1
+                in_flight.append(asyncio.create_task(self._card_result(number, content, path, stem, forms, options)))
+                if len(in_flight) >= self.limit:
+                    result = await in_flight[0]
+                    in_flight.popleft()
+                    yield result
+            while in_flight:
+                result = await in_flight[0]
+                in_flight.popleft()
+                yield result
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def aclose(self) -> None:
+        """ Shut down the executor if the renderer made it, dropping queued renders """
+        if self._owned:
+            await asyncio.to_thread(self.executor.shutdown, cancel_futures=True)
+
+    async def __aenter__(self) -> "AsyncRenderer":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
@@ -0,0 +1,72 @@
+""" Rendering backends, loaded on first use.
+
+    Nothing here imports cairosvg, Pillow or numpy until a backend is asked for, so SVG
+    output never pays for (or depends on) the rasterization machinery.  A backend that
+    cannot be loaded raises BackendUnavailableError when it is first used.
+"""
+import logging
+from functools import lru_cache
+from typing import Callable
+
+logger = logging.getLogger("puncher")
+
+
+class BackendUnavailableError(ImportError):
+    """ Raised when a backend's libraries cannot be loaded """
+
+
+@lru_cache(maxsize=None)
+def cairosvg():
+    """ The cairosvg module, loading libcairo """
+    try:
+        import cairosvg
+    except OSError as e:
+        raise BackendUnavailableError(
+            f"cairosvg cannot load libcairo: {e}.  Please make sure cairo is installed and on the "
+            "dynamic library path; on a Mac with cairo installed using Homebrew, "
+            "export DYLD_LIBRARY_PATH=/opt/homebrew/lib") from e
+    except ImportError as e:
+        raise BackendUnavailableError(f"cairosvg is not installed: {e}") from e
+    logger.debug("backends: loaded cairosvg")
+    return cairosvg
+
+def available(name : str) -> bool:
+    """ Whether the PNG backend name can be loaded """
+    try:
+        _PNG_LOADERS[name]()
+    except BackendUnavailableError:
+        return False
+    return True
+
+
+def _load_cairosvg_png() -> Callable:
+    cairosvg()
+    from puncher.puncher import renderpng
+    from puncher import svgwriter
+
+    def png(card, dpi : float, **options) -> bytes:
+        return renderpng(svgwriter.dumps(card, **options), dpi=dpi)
+    return png
+
+def _load_native_png() -> Callable:
+    try:
+        from puncher import raster
+    except ImportError as e:
+        raise BackendUnavailableError(f"the native PNG backend needs numpy (pip install puncher[native]): {e}") from e
+    return raster.png_bytes
+
+# PNG backend name -> loader returning png(card, dpi, **makesvg options) -> bytes
+_PNG_LOADERS : dict[str, Callable[[], Callable]] = {
+    'cairosvg' : _load_cairosvg_png,
+    'native' : _load_native_png,
+}
+
+PNG_BACKENDS = list(_PNG_LOADERS)
+
+@lru_cache(maxsize=None)
+def png_renderer(name : str) -> Callable:
+    """ png(card, dpi, **options) -> bytes for the PNG backend name, loading it on first use """
+    loader = _PNG_LOADERS.get(name)
+    if loader is None:
+        raise ValueError(f"unknown PNG backend \"{name}\", expected one of {', '.join(PNG_BACKENDS)}")
+    return loader()
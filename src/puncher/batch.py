@@ -0,0 +1,162 @@
+""" Batch rendering of many cards, optionally spread over a pool of worker processes.
+
+    Results always come back in deck order, with each card's outputs named from the
+    deck stem and the card's position, and errors reported per card.
+"""
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from puncher import profiling
+from puncher.backends import PNG_BACKENDS
+from puncher.deck import card_stem
+
+logger = logging.getLogger("puncher")
+
+# Cards handed to a worker per task, to keep the inter-process overhead per card small
+CHUNK_SIZE = 16
+
+
+@dataclass
+class CardResult:
+    """ Outcome of rendering one card of a deck """
+    number : int                            # position in the deck, from 1
+    content : str
+    stem : str
+    outputs : list[Path] = field(default_factory=list)
+    cache_hits : int = 0                    # outputs copied from the cache
+    error : str | None = None
+
+
+def render_card_files(content : str,
+                      path : Path,
+                      stem : str,
+                      forms : Iterable[str] = ('svg',),
+                      png_backend : str = 'cairosvg',
+                      dpi : float = 600,
+                      cache = None,
+                      **options) -> tuple[list[Path], int]:
+    """ Render one card to path / stem.<form> for each form, one of puncher.puncher.OUTPUT_FORMATS.
+        PNGs are drawn at dpi by png_backend, one of PNG_BACKENDS.  With an OutputCache as
+        cache, outputs already in it are copied instead of rendered.  options are the
+        svgwriter.dump options.  Returns the files written, and how many came from
+        the cache.
+    """
+    from puncher.puncher import OUTPUT_FORMATS
+
+    outputs = []
+    hits = 0
+    for form in [ form for form in OUTPUT_FORMATS if form in set(forms) ]:
+        filename = path / f"{stem}.{form}"
+        data = None
+        if cache is not None:
+            from puncher.cache import cache_key
+            key = cache_key(content, form, dpi, png_backend, options)
+            data = cache.get(key, form)
+            hits += data is not None
+            profiling.count("cache.hits", data is not None)
+        if data is None:
+            data = render_card_bytes(content, form, png_backend, dpi, **options)
+            if cache is not None:
+                cache.put(key, form, data)
+        logger.info(f"writing to \"{filename}\"")
+        filename.write_bytes(data)
+        profiling.count(f"bytes.{form}", len(data))
+        outputs.append(filename)
+    return (outputs, hits)
+
+def render_card_bytes(content : str,
+                      form : str = 'svg',
+                      png_backend : str = 'cairosvg',
+                      dpi : float = 600,
+                      **options) -> bytes:
+    """ Render one card in memory as SVG (UTF-8), gzip compressed SVG, PNG, PDF, DXF or HPGL
+        bytes, the contents of its output file, with the options of render_card_files.
+    """
+    from puncher.puncher import render
+
+    return render(content, form, dpi=dpi, png_backend=png_backend, **options)
+
+def _render_result(number : int, content : str, path : Path, stem : str, forms : Iterable[str], options : dict) -> CardResult:
+    result = CardResult(number=number, content=content, stem=card_stem(stem, number))
+    try:
+        (result.outputs, result.cache_hits) = render_card_files(content, path, result.stem, forms, **options)
+    except Exception as e:
+        logger.debug(f"card {number} failed", exc_info=True)
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+def _render_chunk(first : int, contents : list[str], path : Path, stem : str, forms : Iterable[str], options : dict):
+    """ The chunk's CardResults, and the worker's profiling stats for them if profiling """
+    results = [ _render_result(first + index, content, path, stem, forms, options)
+                for index, content in enumerate(contents) ]
+    return (results, profiling.take())
+
+def _worker_init(forms : Iterable[str], options : dict, profile : bool = False) -> None:
+    """ Build the static card template, and load the PNG backend if PNGs are wanted,
+        once per worker.  With profile, the worker collects profiling stats for its cards.
+    """
+    from puncher.backends import BackendUnavailableError, png_renderer
+    from puncher.puncher import PunchcardSVG
+    from puncher import svgwriter
+    warm = dict(options, flatten_printed_material=False)
+    png_backend = warm.pop('png_backend', 'cairosvg')
+    warm.pop('dpi', None)
+    warm.pop('cache', None)
+    svgwriter.dumps(PunchcardSVG(""), **warm)
+    if 'png' in forms:
+        try:
+            png_renderer(png_backend)
+        except (BackendUnavailableError, ValueError):
+            pass        # reported per card
+    if profile:
+        profiling.enable()
+
+def _chunks(cards : Iterable[str], size : int) -> Iterator[tuple[int, list[str]]]:
+    cards = iter(cards)
+    first = 1
+    while chunk := list(islice(cards, size)):
+        yield (first, chunk)
+        first += len(chunk)
+
+
+def render_deck(cards : Iterable[str],
+                path : Path,
+                stem : str,
+                forms : Iterable[str] = ('svg',),
+                jobs : int = 1,
+                **options) -> Iterator[CardResult]:
+    """ Render every card in cards to path / <stem>_NNNN.<form>, yielding a CardResult per
+        card in deck order.  options are those of render_card_files: png_backend, dpi,
+        cache and the PunchcardSVG.makesvg options.
+
+        With jobs > 1 the cards are rendered by a pool of that many worker processes; the
+        deck is consumed lazily, with only a few chunks per worker in flight at a time.
+        Profiling stats collected by the workers are merged into this process's.
+    """
+    forms = tuple(forms)
+    if jobs <= 1:
+        for number, content in enumerate(cards, start=1):
+            yield _render_result(number, content, path, stem, forms, options)
+        return
+
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    def chunk_results(future : Future) -> list[CardResult]:
+        (results, stats) = future.result()
+        if stats is not None and profiling.enabled():
+            profiling.current().merge(stats)
+        return results
+
+    initargs = (forms, options, profiling.enabled())
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_worker_init, initargs=initargs) as executor:
+        in_flight : deque[Future] = deque()
+        for first, chunk in _chunks(cards, CHUNK_SIZE):
+            in_flight.append(executor.submit(_render_chunk, first, chunk, path, stem, forms, options))
+            if len(in_flight) >= 2 * jobs:
+                yield from chunk_results(in_flight.popleft())
+        while in_flight:
+            yield from chunk_results(in_flight.popleft())
@@ -0,0 +1,109 @@
+""" Content-addressed cache of rendered card outputs.
+
+    An output is stored under a hash of everything that decides its bytes: the card
+    text, the output form, the makesvg options, for PNGs the dpi and backend, and the
+    puncher version and source.  Rebuilding a deck then only renders the cards that
+    changed; every other output is copied from the cache.  The cache is trimmed to a size
+    limit by evicting the least recently used entries, with use tracked by file mtime.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger("puncher")
+
+DEFAULT_CACHE_SIZE_MB = 512
+
+
+def default_cache_dir() -> Path:
+    """ $XDG_CACHE_HOME/puncher, or ~/.cache/puncher """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "puncher"
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """ The installed puncher version plus a fingerprint of its source files, so editing
+        the code invalidates the cache as a release would
+    """
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        release = version("puncher")
+    except PackageNotFoundError:
+        release = "unknown"
+    fingerprint = hashlib.sha256()
+    for source in sorted(Path(__file__).parent.glob("*.py")):
+        stat = source.stat()
+        fingerprint.update(f"{source.name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return f"{release}+{fingerprint.hexdigest()[:16]}"
+
+def cache_key(content : str, form : str, dpi : float, png_backend : str, options : dict) -> str:
+    """ Hash of everything that decides the bytes of one output """
+    identity = { "version" : code_version(), "content" : content, "form" : form, "options" : options }
+    if form == 'png':
+        identity.update(dpi=dpi, png_backend=png_backend)
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class OutputCache():
+    """ Rendered outputs under directory, trimmed to max_bytes by trim().  Safe to share
+        between processes: entries are written atomically and only trim() deletes.
+    """
+    def __init__(self, directory : Path | str | None = None, max_bytes : int = DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def _path(self, key : str, form : str) -> Path:
+        return self.directory / key[:2] / f"{key}.{form}"
+
+    def get(self, key : str, form : str) -> bytes | None:
+        """ The cached output, or None.  A hit marks the entry as recently used. """
+        path = self._path(key, form)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key : str, form : str, data : bytes) -> None:
+        path = self._path(key, form)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            (fd, temporary) = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as temporary_file:
+                temporary_file.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            # a cache that cannot be written only costs speed
+            logger.warning(f"cache: cannot store {path}: {e}")
+
+    def trim(self) -> int:
+        """ Evict least recently used entries until the cache fits in max_bytes.
+            Returns the number of entries evicted.
+        """
+        entries = []
+        total = 0
+        for path in self.directory.glob("??/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+        evicted = 0
+        for (_, size, path) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        if evicted:
+            logger.info(f"cache: evicted {evicted} entries, {total} bytes left in {self.directory}")
+        return evicted
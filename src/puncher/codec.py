@@ -0,0 +1,135 @@
+""" Compiled punch code for card content.
+
+    Each card column is a 12-bit hole mask, one bit per punch row, with row 12 in the
+    most significant bit and row 9 in the least significant bit (the usual column
+    binary order).  A card is COLUMNS masks in an array('H') (uint16), a deck is the
+    cards' masks concatenated.
+"""
+import sys
+from array import array
+from typing import Iterable
+
+from puncher.geometry import COLUMNS, HOLE_ROWS
+
+# Number of distinct 12-bit masks
+MASKS = 1 << HOLE_ROWS
+
+
+class UnencodableCharacterError(ValueError):
+    """ Raised in strict mode for characters that have no punch code.
+
+        positions is a list of (card, column, character), with card and column
+        counted from 0.
+    """
+    def __init__(self, positions : list[tuple[int, int, str]]):
+        self.positions = positions
+        shown = ", ".join(f"{character!r} at card {card} column {column + 1}" for (card, column, character) in positions[:10])
+        more = f" (and {len(positions) - 10} more)" if len(positions) > 10 else ""
+        super().__init__(f"{len(positions)} unencodable character(s): {shown}{more}")
+
+
+class CardCodec():
+    """ Encoder and decoder between text and 12-bit column masks for a set of punch rules
+        (character -> list of row names) and the row numbering, top row first.
+    """
+    def __init__(self, punch_rules : dict[str, list[str]], row_numbering : list[str], replacement : str = "\ufffd"):
+        row_bits = { name : 1 << (HOLE_ROWS - 1 - index) for index, name in enumerate(row_numbering) }
+
+        # 256-entry character -> mask table, plus 0/1 flags for which characters have a code
+        self.encode_table = array('H', bytes(2 * 256))
+        self._encodable = bytearray(256)
+        for character, rows in punch_rules.items():
+            mask = 0
+            for name in rows:
+                mask |= row_bits[name]
+            self.encode_table[ord(character)] = mask
+            self._encodable[ord(character)] = 1
+
+        # Low and high bytes of each mask as bytes.translate tables, for whole-string encoding
+        self._low_bytes = bytes(mask & 0xff for mask in self.encode_table)
+        self._high_bytes = bytes(mask >> 8 for mask in self.encode_table)
+
+        # mask -> character, and mask -> punched row indices (top row first)
+        self.decode_table = [ replacement ] * MASKS
+        self._decodable = bytearray(MASKS)
+        for character in punch_rules:
+            mask = self.encode_table[ord(character)]
+            self.decode_table[mask] = character
+            self._decodable[mask] = 1
+        self.mask_rows = [ [ row for row in range(HOLE_ROWS) if mask & (1 << (HOLE_ROWS - 1 - row)) ]
+                           for mask in range(MASKS) ]
+
+    def _latin1(self, text : str) -> bytes:
+        try:
+            return text.encode('latin-1')
+        except UnicodeEncodeError:
+            # characters past U+00FF have no code, map them to NUL which has none either
+            return bytes(ord(c) if ord(c) < 256 else 0 for c in text)
+
+    def _unencodable(self, data : bytes, text : str, card : int = 0) -> list[tuple[int, int, str]]:
+        flags = data.translate(self._encodable)
+        positions = []
+        column = flags.find(0)
+        while column != -1:
+            positions.append((card, column, text[column]))
+            column = flags.find(0, column + 1)
+        return positions
+
+    def _masks(self, data : bytes) -> array:
+        interleaved = bytearray(2 * len(data))
+        if sys.byteorder == 'little':
+            interleaved[0::2] = data.translate(self._low_bytes)
+            interleaved[1::2] = data.translate(self._high_bytes)
+        else:
+            interleaved[0::2] = data.translate(self._high_bytes)
+            interleaved[1::2] = data.translate(self._low_bytes)
+        return array('H', interleaved)
+
+    def encode(self, text : str, strict : bool = False, columns : int = COLUMNS) -> array:
+        """ Encode text as columns masks, padding with blank columns.  Unencodable
+            characters become blank columns, or raise UnencodableCharacterError in
+            strict mode; text longer than columns always raises ValueError.
+        """
+        if len(text) > columns:
+            raise ValueError(f"text is {len(text)} columns long, a card holds {columns}")
+        data = self._latin1(text)
+        if strict:
+            positions = self._unencodable(data, text)
+            if positions:
+                raise UnencodableCharacterError(positions)
+        return self._masks(data.ljust(columns, b' '))
+
+    def encode_deck(self, cards : Iterable[str], strict : bool = False, columns : int = COLUMNS) -> array:
+        """ Encode a whole deck in one call, as the cards' masks concatenated.  In strict
+            mode every unencodable character in the deck is reported together.
+        """
+        data = bytearray()
+        positions : list[tuple[int, int, str]] = []
+        for card, text in enumerate(cards):
+            if len(text) > columns:
+                raise ValueError(f"card {card} is {len(text)} columns long, a card holds {columns}")
+            encoded = self._latin1(text)
+            if strict:
+                positions.extend(self._unencodable(encoded, text, card))
+            data += encoded.ljust(columns, b' ')
+        if positions:
+            raise UnencodableCharacterError(positions)
+        return self._masks(data)
+
+    def decode(self, codes : Iterable[int], strict : bool = False) -> str:
+        """ Decode masks back to text.  Masks that no character punches decode to the
+            replacement character, or raise ValueError in strict mode.
+        """
+        codes = codes if isinstance(codes, array) else array('H', codes)
+        if strict:
+            flags = bytes(map(self._decodable.__getitem__, codes))
+            column = flags.find(0)
+            if column != -1:
+                raise ValueError(f"punch pattern {codes[column]:#05x} at position {column} is not a character")
+        return "".join(map(self.decode_table.__getitem__, codes))
+
+    def decode_deck(self, codes : Iterable[int], strict : bool = False, columns : int = COLUMNS) -> list[str]:
+        """ Decode a deck of concatenated masks into one string per card.
+        """
+        text = self.decode(codes, strict=strict)
+        return [ text[start:start + columns] for start in range(0, len(text), columns) ]
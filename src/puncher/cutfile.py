@@ -0,0 +1,152 @@
+""" Cutter-native output: only the cut lines, as DXF or HPGL, with no printed material.
+
+    Cutter software loads these files as they are, with nothing to parse but the outlines
+    to cut, and nothing here needs cairo.  The cards are placed where the SVG output puts
+    them: a single card inside the document margins, or a deck laid out on cutting mats as
+    puncher.impose lays it out.  Coordinates are physical, from the CARD_* dimensions,
+    measured up from the bottom left corner of the sheet: inches in DXF, and plotter units
+    of 0.025 mm (HPGL_UNITS_PER_IN) in HPGL.
+
+    The DXF is AutoCAD R12, the version every cutter and CAD program reads, with each
+    outline a closed POLYLINE on the layer CUT.  The HPGL is one PU/PD pair per outline,
+    with pen 1 as the blade.
+"""
+import io
+import logging
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from puncher.cutpath import Point, document_cut_plan, optimized_cut_plan
+from puncher.impose import MAT_GUTTER_IN, MAT_HEIGHT_IN, MAT_MARGIN_IN, MAT_WIDTH_IN, mat_layout
+from puncher.puncher import PunchcardSVG
+
+logger = logging.getLogger("puncher")
+
+CUT_FORMATS = [ 'dxf', 'hpgl' ]
+
+# HP-GL plotter units, 40 per millimetre
+HPGL_UNITS_PER_IN = 1016
+
+_DXF_LAYER = "CUT"
+_DXF_RED = 1
+
+
+def _sheet(cards : list[PunchcardSVG],
+           mat_width_in : float | None,
+           mat_height_in : float | None,
+           margin_in : float,
+           gutter_in : float) -> tuple[float, float, list[tuple[float, float]]]:
+    """ Width and height of the sheet, and the top left corner of each card on it """
+    if mat_width_in is None or mat_height_in is None:
+        if len(cards) > 1:
+            raise ValueError(f"{len(cards)} cards need a mat, give mat_width_in and mat_height_in")
+        return (PunchcardSVG.DOCUMENT_WIDTH_IN, PunchcardSVG.DOCUMENT_HEIGHT_IN,
+                [ (PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN, PunchcardSVG.DOCUMENT_MARGIN_TOP_IN) ])
+    slots = mat_layout(mat_width_in, mat_height_in, margin_in, gutter_in)
+    if len(cards) > len(slots):
+        raise ValueError(f"{len(cards)} cards do not fit on a mat with {len(slots)} slots")
+    return (mat_width_in, mat_height_in, slots)
+
+def sheet_outlines(cards : list[PunchcardSVG],
+                   sheet_height_in : float,
+                   slots : list[tuple[float, float]],
+                   optimize_cuts : bool = False,
+                   merge_punches : bool = False) -> Iterator[list[Point]]:
+    """ The cut outlines of each card at its slot, in inches up from the bottom left
+        corner of the sheet, card by card in cutting order
+    """
+    for card, (left, top) in zip(cards, slots):
+        if optimize_cuts:
+            plan = optimized_cut_plan(card, merge_punches=merge_punches)
+        else:
+            plan = document_cut_plan(card)
+        for outline in plan.outlines:
+            yield [ (left + x, sheet_height_in - (top + y)) for (x, y) in outline ]
+
+
+def _dxf_pairs(pairs : list[tuple[int, str]]) -> str:
+    return "".join(f"{code:>3}\n{value}\n" for (code, value) in pairs)
+
+# A closed polyline (flag 1) whose vertices follow it, up to the SEQEND
+_DXF_POLYLINE = _dxf_pairs([ (0, "POLYLINE"), (8, _DXF_LAYER), (66, "1"), (70, "1") ])
+_DXF_VERTEX = _dxf_pairs([ (0, "VERTEX"), (8, _DXF_LAYER), (10, "{}"), (20, "{}") ])
+_DXF_SEQEND = _dxf_pairs([ (0, "SEQEND"), (8, _DXF_LAYER) ])
+
+@lru_cache(maxsize=4096)
+def _dxf_num(x : float, precision : int | None) -> str:
+    return repr(x) if precision is None else f"{x:.{precision}f}"
+
+def _dump_dxf(outlines : Iterable[list[Point]], fp : TextIO, width : float, height : float, precision : int | None) -> None:
+    fp.write(_dxf_pairs([ (0, "SECTION"), (2, "HEADER"),
+                          (9, "$ACADVER"), (1, "AC1009"),
+                          (9, "$INSUNITS"), (70, "1"),
+                          (9, "$EXTMIN"), (10, _dxf_num(0.0, precision)), (20, _dxf_num(0.0, precision)),
+                          (9, "$EXTMAX"), (10, _dxf_num(width, precision)), (20, _dxf_num(height, precision)),
+                          (0, "ENDSEC"),
+                          (0, "SECTION"), (2, "TABLES"),
+                          (0, "TABLE"), (2, "LAYER"), (70, "1"),
+                          (0, "LAYER"), (2, _DXF_LAYER), (70, "0"), (62, str(_DXF_RED)), (6, "CONTINUOUS"),
+                          (0, "ENDTAB"),
+                          (0, "ENDSEC"),
+                          (0, "SECTION"), (2, "ENTITIES") ]))
+    for outline in outlines:
+        fp.write(_DXF_POLYLINE
+                 + "".join(_DXF_VERTEX.format(_dxf_num(x, precision), _dxf_num(y, precision)) for (x, y) in outline)
+                 + _DXF_SEQEND)
+    fp.write(_dxf_pairs([ (0, "ENDSEC"), (0, "EOF") ]))
+
+def _dump_hpgl(outlines : Iterable[list[Point]], fp : TextIO) -> None:
+    fp.write("IN;\nSP1;\n")
+    for outline in outlines:
+        points = [ f"{round(x * HPGL_UNITS_PER_IN)},{round(y * HPGL_UNITS_PER_IN)}" for (x, y) in outline ]
+        fp.write(f"PU{points[0]};\nPD{','.join(points[1:] + points[:1])};\n")
+    fp.write("PU0,0;\nSP0;\n")
+
+
+def dump_cuts(cards : Iterable[PunchcardSVG | str],
+              fp : TextIO,
+              format : str = 'dxf',
+              mat_width_in : float | None = None,
+              mat_height_in : float | None = None,
+              margin_in : float = MAT_MARGIN_IN,
+              gutter_in : float = MAT_GUTTER_IN,
+              optimize_cuts : bool = False,
+              merge_punches : bool = False,
+              precision : int | None = PunchcardSVG.COORDINATE_PRECISION,
+              **options) -> None:
+    """ Write the cut lines of cards (PunchcardSVGs, or the text to punch) to the text
+        stream fp in format, one of CUT_FORMATS.  Without a mat size there must be one
+        card, placed as on the SVG document; with one, the cards are laid out on a mat
+        as puncher.impose.dump_mat does.  With optimize_cuts (or merge_punches) the
+        outlines follow puncher.cutpath.optimized_cut_plan.  DXF coordinates are written
+        to precision decimal places, or in full with None.  The other svgwriter.dump
+        options are accepted and make no difference, as nothing is printed.
+    """
+    if format not in CUT_FORMATS:
+        raise ValueError(f"unknown cut file format \"{format}\", expected one of {', '.join(CUT_FORMATS)}")
+    cards = [ card if isinstance(card, PunchcardSVG) else PunchcardSVG(card) for card in cards ]
+    (width, height, slots) = _sheet(cards, mat_width_in, mat_height_in, margin_in, gutter_in)
+    outlines = sheet_outlines(cards, height, slots, optimize_cuts or merge_punches, merge_punches)
+    if format == 'dxf':
+        _dump_dxf(outlines, fp, width, height, precision)
+    else:
+        _dump_hpgl(outlines, fp)
+
+def cut_mats(cards : Iterable[PunchcardSVG | str],
+             format : str = 'dxf',
+             mat_width_in : float = MAT_WIDTH_IN,
+             mat_height_in : float = MAT_HEIGHT_IN,
+             margin_in : float = MAT_MARGIN_IN,
+             gutter_in : float = MAT_GUTTER_IN,
+             **options) -> Iterator[str]:
+    """ Lay a deck of cards out on as many mats as it needs, as puncher.impose.impose
+        does, yielding the cut file of each mat in format.  options are those of
+        dump_cuts.
+    """
+    per_mat = len(mat_layout(mat_width_in, mat_height_in, margin_in, gutter_in))
+    cards = iter(cards)
+    while mat_cards := list(islice(cards, per_mat)):
+        fp = io.StringIO()
+        dump_cuts(mat_cards, fp, format, mat_width_in, mat_height_in, margin_in, gutter_in, **options)
+        yield fp.getvalue()
@@ -0,0 +1,136 @@
+""" Cut path planning for the card's cut lines.
+
+    The plain SVG output cuts the card boundary first and then every hole as its own
+    rectangle, column by column with the rows top down in each column, which is the order
+    a cutter follows.  A CutPlan instead lists the outlines in an order that keeps the
+    pen-up travel short: the punches serpentine through the columns (down one punched
+    column, up the next) and the card boundary is cut last, so the card stays held on
+    the mat while its holes are cut.  Optionally, holes in adjacent rows of a column are
+    merged into one slot.
+"""
+import math
+from dataclasses import dataclass
+
+from puncher.geometry import hole_index
+from puncher.puncher import PunchcardSVG
+
+# Most punch rows merged into one slot.  Longer slots leave too little card between
+# them and the next column for the card to stay stiff.
+MAX_SLOT_ROWS = 3
+
+_GEOMETRY = PunchcardSVG.GEOMETRY
+
+Point = tuple[float, float]
+
+
+@dataclass
+class CutStats:
+    """ Blade work for a cut plan, in inches """
+    cuts : int = 0                  # closed outlines cut
+    cut_length_in : float = 0.0     # blade down
+    travel_in : float = 0.0         # blade up, moving between outlines
+
+    def __add__(self, other : "CutStats") -> "CutStats":
+        return CutStats(self.cuts + other.cuts,
+                        self.cut_length_in + other.cut_length_in,
+                        self.travel_in + other.travel_in)
+
+    def describe(self) -> str:
+        return f"{self.cuts} cuts, {self.cut_length_in:.2f} in cut, {self.travel_in:.2f} in travel"
+
+
+@dataclass
+class CutPlan:
+    """ Closed outlines in cutting order, each as its corner points starting (and ending)
+        where the blade goes down, in card coordinates.
+    """
+    outlines : list[list[Point]]
+
+    def stats(self, home : Point = (0.0, 0.0)) -> CutStats:
+        """ Cut and travel length when the blade starts at home """
+        stats = CutStats(cuts=len(self.outlines))
+        pen = home
+        for outline in self.outlines:
+            stats.travel_in += math.dist(pen, outline[0])
+            stats.cut_length_in += sum(math.dist(a, b) for a, b in zip(outline, outline[1:] + outline[:1]))
+            pen = outline[0]
+        return stats
+
+
+def punch_slots(codes, merge : bool = False, max_slot_rows : int = MAX_SLOT_ROWS) -> list[tuple[int, int, int]]:
+    """ (column, first row, last row) of each opening to cut for a card's column masks,
+        in column order with the rows top down.  Without merge every hole is its own
+        opening; with merge, runs of up to max_slot_rows adjacent rows become one slot.
+    """
+    mask_rows = PunchcardSVG.CODEC.mask_rows
+    slots : list[tuple[int, int, int]] = []
+    for column, mask in enumerate(codes):
+        if not mask:
+            continue
+        rows = mask_rows[mask]
+        if not merge:
+            slots.extend((column, row, row) for row in rows)
+            continue
+        first = last = rows[0]
+        for row in rows[1:]:
+            if row == last + 1 and row - first < max_slot_rows:
+                last = row
+            else:
+                slots.append((column, first, last))
+                first = last = row
+        slots.append((column, first, last))
+    return slots
+
+def _slot_outline(column : int, first : int, last : int, from_bottom : bool = False) -> list[Point]:
+    """ Clockwise corners of a slot, starting top left, or bottom left with from_bottom """
+    top = hole_index(first, column)
+    x_left = _GEOMETRY.hole_x[top]
+    x_right = x_left + _GEOMETRY.hole_width
+    y_top = _GEOMETRY.hole_y[top]
+    y_bottom = _GEOMETRY.hole_y[hole_index(last, column)] + _GEOMETRY.hole_height
+    if from_bottom:
+        return [ (x_left, y_bottom), (x_left, y_top), (x_right, y_top), (x_right, y_bottom) ]
+    return [ (x_left, y_top), (x_right, y_top), (x_right, y_bottom), (x_left, y_bottom) ]
+
+def _boundary_outline(start_near : Point | None = None) -> list[Point]:
+    """ The card boundary, starting at the corner nearest start_near """
+    outline = [ (float(x), float(y)) for [x, y] in PunchcardSVG.CARD_BOUNDARY_POINTS ]
+    if start_near is not None:
+        nearest = min(range(len(outline)), key=lambda index: math.dist(start_near, outline[index]))
+        outline = outline[nearest:] + outline[:nearest]
+    return outline
+
+
+def document_cut_plan(card : PunchcardSVG) -> CutPlan:
+    """ The cutting order of the plain SVG output: boundary first, then each hole """
+    outlines = [ _boundary_outline() ]
+    outlines.extend(_slot_outline(column, row, row) for (column, row, _) in punch_slots(card.card_codes))
+    return CutPlan(outlines)
+
+def optimized_cut_plan(card : PunchcardSVG,
+                       merge_punches : bool = False,
+                       max_slot_rows : int = MAX_SLOT_ROWS) -> CutPlan:
+    """ The card's openings serpentine by column, then the card boundary """
+    slots = punch_slots(card.card_codes, merge=merge_punches, max_slot_rows=max_slot_rows)
+
+    # Group the slots by column, keeping the columns' left to right order
+    columns : list[list[tuple[int, int, int]]] = []
+    for slot in slots:
+        if columns and columns[-1][0][0] == slot[0]:
+            columns[-1].append(slot)
+        else:
+            columns.append([slot])
+
+    outlines : list[list[Point]] = []
+    for index, column_slots in enumerate(columns):
+        upwards = index % 2 == 1
+        if upwards:
+            column_slots = column_slots[::-1]
+        outlines.extend(_slot_outline(*slot, from_bottom=upwards) for slot in column_slots)
+
+    outlines.append(_boundary_outline(start_near=outlines[-1][0] if outlines else None))
+    return CutPlan(outlines)
+
+def cut_report(card : PunchcardSVG, merge_punches : bool = False) -> tuple[CutStats, CutStats]:
+    """ CutStats of the plain cutting order and of the optimized plan for card """
+    return (document_cut_plan(card).stats(), optimized_cut_plan(card, merge_punches=merge_punches).stats())
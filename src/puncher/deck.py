@@ -0,0 +1,53 @@
+""" Card decks: one card per input line, streamed through a generator pipeline so a deck
+    of any length is processed in constant memory.
+"""
+import logging
+from typing import Iterable, Iterator, TextIO
+
+from puncher.geometry import COLUMNS
+
+logger = logging.getLogger("puncher")
+
+# Columns 73-80 hold the sequence number when sequencing is on
+SEQUENCE_COLUMNS = 8
+TEXT_COLUMNS_SEQUENCED = COLUMNS - SEQUENCE_COLUMNS
+
+LONG_LINE_MODES = ['split', 'truncate', 'error']
+
+
+def read_lines(stream : TextIO) -> Iterator[str]:
+    """ Lines of stream, without their line endings """
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+def cards_from_lines(lines : Iterable[str], long_lines : str = 'split', sequence : bool = False) -> Iterator[str]:
+    """ Turn input lines into card content.
+
+        long_lines decides what happens to a line that does not fit on one card: 'split'
+        continues it on as many following cards as it needs, 'truncate' drops the excess
+        and 'error' raises ValueError.  With sequence, the text is limited to columns
+        1-72 and columns 73-80 carry the card's sequence number.
+    """
+    width = TEXT_COLUMNS_SEQUENCED if sequence else COLUMNS
+    number = 0
+    for line_number, line in enumerate(lines, start=1):
+        if len(line) <= width:
+            pieces = [line]
+        elif long_lines == 'split':
+            pieces = [ line[start:start + width] for start in range(0, len(line), width) ]
+        elif long_lines == 'truncate':
+            logger.warning(f"deck line {line_number} is {len(line)} columns long, truncating to {width}")
+            pieces = [line[:width]]
+        else:
+            raise ValueError(f"deck line {line_number} is {len(line)} columns long, a card holds {width}")
+
+        for piece in pieces:
+            number += 1
+            if sequence:
+                yield piece.ljust(width) + f"{number:0{SEQUENCE_COLUMNS}d}"
+            else:
+                yield piece
+
+def card_stem(stem : str, number : int) -> str:
+    """ Output stem for the card numbered number (from 1) in a deck """
+    return f"{stem}_{number:04d}"
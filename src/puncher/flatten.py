@@ -0,0 +1,152 @@
+""" Raster of the printed material for +flatten output.
+
+    The card-invariant part of the printed material (row and column number labels, the
+    manufacturer label) and the optional structure layers are rasterized once per process
+    and cached.  A card's printed characters are composited onto a copy of that
+    background from a glyph atlas, each glyph rasterized once per character and sub-pixel
+    position, so only the compositing and PNG encoding are paid per card.
+"""
+import io
+import logging
+import math
+from functools import lru_cache
+
+from puncher.puncher import PunchcardSVG, escape
+from puncher import profiling, svgwriter
+
+logger = logging.getLogger("puncher")
+
+# Same raster scale as rendering the printed layer with cairosvg.svg2png(scale=5)
+FLATTEN_SCALE = 5
+PIXELS_PER_INCH = 96 * FLATTEN_SCALE
+
+# Glyph tiles cover the character's cell plus a small margin, in pixels
+_TILE_HALF_WIDTH = math.ceil(PunchcardSVG.CARD_INCHES_PER_COLUMN * PIXELS_PER_INCH / 2.0) + 2
+_TILE_HEIGHT = math.ceil(PunchcardSVG.CARD_INCHES_PER_LINE * PIXELS_PER_INCH) + 4
+
+# (character, sub-pixel x offset) -> RGBA glyph tile
+_glyph_atlas : dict = {}
+
+
+def _rasterize(svg_text : str, background_color : str | None = None, scale : float = FLATTEN_SCALE):
+    from PIL import Image
+    from puncher.backends import cairosvg
+
+    with profiling.timer("cairosvg.svg2png"):
+        png_bytes = cairosvg().svg2png(bytestring=svg_text.encode('utf-8'),
+                                     background_color=background_color,
+                                     scale=scale)
+    return Image.open(io.BytesIO(png_bytes)).convert("RGBA")
+
+def _card_document(card : PunchcardSVG, layers : list[str]) -> str:
+    return (svgwriter._svg_open(PunchcardSVG.CARD_DIM_WIDTH_IN, PunchcardSVG.CARD_DIM_LENGTH_IN)
+            + svgwriter._static_layer(card, 'style')
+            + "".join(layers)
+            + "</svg>")
+
+@lru_cache(maxsize=8)
+def _printed_background(card_manufacturer_string : str, outline_text : bool = False):
+    """ The printed material without the card's characters, on white """
+    card = PunchcardSVG("", card_manufacturer_string=card_manufacturer_string)
+    printed = svgwriter._group([ svgwriter._shared_layer(card, 'row_number_labels', outline_text=outline_text),
+                                 svgwriter._shared_layer(card, 'column_number_labels', outline_text=outline_text),
+                                 svgwriter._manufacturer_label_layer(card, outline_text=outline_text) ],
+                               id="card_printed")
+    logger.debug(f"_printed_background: rasterizing for \"{card_manufacturer_string}\"")
+    return _rasterize(_card_document(card, [printed]), background_color="white")
+
+@lru_cache(maxsize=4)
+def _structure_overlay(print_cellboundaries : bool, print_punchboundaries : bool):
+    """ The structure layers on a transparent background """
+    card = PunchcardSVG("")
+    structure = svgwriter._group(svgwriter._structure_layers(card, print_cellboundaries, print_punchboundaries),
+                                 id="punchcard_structure")
+    return _rasterize(_card_document(card, [structure]))
+
+def _tile_x(column : int) -> int:
+    """ Pixel x of the left edge of the glyph tiles of column """
+    return math.floor(svgwriter._cell_center(column, 0)[0] * PIXELS_PER_INCH) - _TILE_HALF_WIDTH
+
+def _glyph(card : PunchcardSVG, character : str, column : int, outline_text : bool = False):
+    """ Glyph tile for character printed in column, and the pixel x of its left edge """
+    (x_center, y_center) = svgwriter._cell_center(column, 0)
+    x_pixels = x_center * PIXELS_PER_INCH
+    tile_x = _tile_x(column)
+    key = (character, round(x_pixels - math.floor(x_pixels), 3), outline_text)
+
+    tile = _glyph_atlas.get(key)
+    if tile is None:
+        width = 2 * _TILE_HALF_WIDTH
+        viewbox = f"{tile_x / PIXELS_PER_INCH} 0 {width / PIXELS_PER_INCH} {_TILE_HEIGHT / PIXELS_PER_INCH}"
+        if outline_text:
+            label = svgwriter._outlined_labels([ (x_center, y_center, character) ], "cardchar")
+        else:
+            label = svgwriter._centered_text(x_center, y_center, escape(character), "cardchar")
+        tile_svg = (f'<svg xmlns="{svgwriter._XMLNS}" viewBox="{viewbox}" width="{width}" height="{_TILE_HEIGHT}">'
+                    + svgwriter._static_layer(card, 'style')
+                    + label
+                    + "</svg>")
+        tile = _glyph_atlas[key] = _rasterize(tile_svg, scale=1)
+    return (tile, tile_x)
+
+
+def _printed_characters(card : PunchcardSVG, outline_text : bool = False):
+    """ The card's characters composited onto the printed background.  The image is kept on
+        the card, and after PunchcardSVG.set_content() only the changed columns are
+        composited again.
+    """
+    key = ('flatten', outline_text)
+    kept = card._column_outputs.get(key)
+    if kept is None:
+        image = _printed_background(card.card_manufacturer_string, outline_text).copy()
+        for column, character in enumerate(card.card_content):
+            if character.isspace():
+                continue
+            (tile, tile_x) = _glyph(card, character, column, outline_text)
+            image.alpha_composite(tile, dest=(tile_x, 0))
+        card._column_outputs[key] = (list(card._column_versions), image)
+        return image
+
+    (versions, image) = kept
+    stale = [ column for (column, version) in enumerate(card._column_versions) if versions[column] != version ]
+    for column in stale:
+        _recomposite_column(card, image, column, outline_text)
+    versions[:] = card._column_versions
+    return image
+
+def _recomposite_column(card : PunchcardSVG, image, column : int, outline_text : bool = False) -> None:
+    """ Redraw the pixels of column's glyph tile in image from the background, compositing
+        the glyphs of the neighbouring columns that overlap it in column order as well, as
+        printed_material_png composites the whole card
+    """
+    left = _tile_x(column)
+    box = (left, 0, left + 2 * _TILE_HALF_WIDTH, _TILE_HEIGHT)
+    region = _printed_background(card.card_manufacturer_string, outline_text).crop(box)
+    for neighbour in range(max(0, column - 1), min(len(card.card_content), column + 2)):
+        character = card.card_content[neighbour]
+        if character.isspace():
+            continue
+        (tile, tile_x) = _glyph(card, character, neighbour, outline_text)
+        start = max(left, tile_x)
+        end = min(box[2], tile_x + tile.width)
+        region.alpha_composite(tile, dest=(start - left, 0), source=(start - tile_x, 0, end - tile_x, tile.height))
+    image.paste(region, box)
+
+
+@profiling.timed("flatten")
+def printed_material_png(card : PunchcardSVG,
+                         print_cellboundaries : bool = False,
+                         print_punchboundaries : bool = False,
+                         outline_text : bool = False) -> bytes:
+    """ PNG of the card's printed material (and structure layers, if asked for) at
+        FLATTEN_SCALE, on white, for embedding in flattened output, with the labels
+        rasterized from glyph outlines with outline_text.
+    """
+    image = _printed_characters(card, outline_text)
+    if print_cellboundaries or print_punchboundaries:
+        image = image.copy()
+        image.alpha_composite(_structure_overlay(print_cellboundaries, print_punchboundaries))
+
+    png = io.BytesIO()
+    image.save(png, format="PNG")
+    return png.getvalue()
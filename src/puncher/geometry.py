@@ -0,0 +1,82 @@
+""" Precomputed punchcard geometry.
+
+    Every character cell and punch hole position on the card is computed once, into
+    dense row-major coordinate tables indexed by integer row and column, so drawing
+    code never has to look up row or column names.
+"""
+from array import array
+from operator import itemgetter
+
+# Punch hole rows (12, 11, 0-9), character cell rows and card columns
+HOLE_ROWS = 12
+CELL_ROWS = 25
+COLUMNS = 80
+
+
+class CardGeometry():
+    """ Coordinate tables (in inches, card coordinates) for one card layout.
+
+        Cell tables are CELL_ROWS x COLUMNS and hole tables are HOLE_ROWS x COLUMNS,
+        stored row-major: the entry for (row, column) is at row * COLUMNS + column.
+        Hole row r sits in the middle of character cell row 2 * r + 1.
+    """
+    def __init__(self,
+                 left_margin : float,
+                 top_margin : float,
+                 inches_per_column : float,
+                 inches_per_line : float,
+                 hole_width : float,
+                 hole_height : float):
+        self.cell_width = inches_per_column
+        self.cell_height = inches_per_line
+        self.hole_width = hole_width
+        self.hole_height = hole_height
+
+        # Bottom left corner of each character cell
+        self.cell_x = array('d', [ left_margin + (column * inches_per_column)
+                                   for row in range(CELL_ROWS) for column in range(COLUMNS) ])
+        self.cell_y = array('d', [ top_margin + ((row + 1) * inches_per_line)
+                                   for row in range(CELL_ROWS) for column in range(COLUMNS) ])
+
+        # Centre of each character cell
+        self.cell_center_x = array('d', [ x + inches_per_column / 2.0 for x in self.cell_x ])
+        self.cell_center_y = array('d', [ y - inches_per_line / 2.0 for y in self.cell_y ])
+
+        # Centre and top left corner of each punch hole
+        hole_cells = [ cell_index(2 * row + 1, column) for row in range(HOLE_ROWS) for column in range(COLUMNS) ]
+        self.hole_center_x = array('d', [ self.cell_center_x[i] for i in hole_cells ])
+        self.hole_center_y = array('d', [ self.cell_center_y[i] for i in hole_cells ])
+        self.hole_x = array('d', [ x - hole_width / 2.0 for x in self.hole_center_x ])
+        self.hole_y = array('d', [ y - hole_height / 2.0 for y in self.hole_center_y ])
+
+    def rounded(self, digits : int) -> "CardGeometry":
+        """ A copy with every length and coordinate rounded to digits decimal places """
+        geometry = object.__new__(CardGeometry)
+        for name, value in vars(self).items():
+            if isinstance(value, array):
+                value = array('d', [ round(x, digits) for x in value ])
+            else:
+                value = round(value, digits)
+            setattr(geometry, name, value)
+        return geometry
+
+    def hole_corners(self, holes : list[int]) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        """ Top left corners of a set of holes (as hole_index values), gathered in one call.
+        """
+        return (gather(self.hole_x, holes), gather(self.hole_y, holes))
+
+
+def cell_index(row : int, column : int) -> int:
+    return row * COLUMNS + column
+
+def hole_index(row : int, column : int) -> int:
+    return row * COLUMNS + column
+
+def gather(table : array, indices : list[int]) -> tuple[float, ...]:
+    """ table[i] for each i in indices, as a single C-level lookup.
+    """
+    if len(indices) == 1:
+        return (table[indices[0]],)
+    if not indices:
+        return ()
+    return itemgetter(*indices)(table)
@@ -0,0 +1,224 @@
+""" Printed labels as glyph outlines instead of text, for output that looks the same
+    wherever it is rendered.
+
+    SVG text leaves font lookup and shaping to every renderer, and the result depends on
+    the fonts each machine has.  With outline_text the labels are drawn from the built-in
+    face here: a 5 x 7 dot matrix like the one a keypunch printed with, covering printable
+    ASCII, with the dots of each glyph merged into as few rectangles as possible.  Any
+    other character is drawn as an empty box.  Glyphs are laid out monospaced, 0.6 em
+    apart, with the dot pitch a tenth of the em.
+
+    Each text's outline is made once per size and anchor and cached, as path data
+    relative to the anchor point, so placing a label is one string join.  The cached
+    numbers are rounded to GLYPH_PRECISION decimal places (of an inch), whatever the
+    precision of the rest of the document, so a glyph has the same outline everywhere.
+"""
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger("puncher")
+
+# Font sizes of the card style's label classes in inches: CSS em sizes of the 16px
+# default font, in user units (see PunchcardSVG._define_card_style)
+LABEL_SIZES_IN = {
+    'numlabel' : 0.007 * 16,
+    'cardchar' : 0.007 * 16,
+    'collabel' : 0.004 * 16,
+    'card_manufacturer_label' : 0.004 * 16,
+}
+
+# Decimal places of the outline coordinates, 0.0001 in
+GLYPH_PRECISION = 4
+
+# Anchors: "middle" centres the text on x and its capitals on y (the SVG's middle/central
+# labels), "start" starts it at x with its baseline on y
+ANCHORS = [ 'middle', 'start' ]
+
+# Dot pitch and advance in ems, and the matrix: 5 dots wide, 7 above the baseline and
+# one below it for descenders
+_DOT_EM = 0.1
+_ADVANCE_DOTS = 6
+_CAP_DOTS = 7
+
+_DOT_MATRIX = {
+    ' ' : (),
+    '!' : ("..#..", "..#..", "..#..", "..#..", "..#..", ".....", "..#.."),
+    '"' : (".#.#.", ".#.#.", ".#.#."),
+    '#' : (".#.#.", ".#.#.", "#####", ".#.#.", "#####", ".#.#.", ".#.#."),
+    '$' : ("..#..", ".####", "#.#..", ".###.", "..#.#", "####.", "..#.."),
+    '%' : ("##...", "##..#", "...#.", "..#..", ".#...", "#..##", "...##"),
+    '&' : (".##..", "#..#.", "#.#..", ".#...", "#.#.#", "#..#.", ".##.#"),
+    "'" : ("..#..", "..#..", ".#..."),
+    '(' : ("...#.", "..#..", ".#...", ".#...", ".#...", "..#..", "...#."),
+    ')' : (".#...", "..#..", "...#.", "...#.", "...#.", "..#..", ".#..."),
+    '*' : (".....", "..#..", "#.#.#", ".###.", "#.#.#", "..#..", "....."),
+    '+' : (".....", "..#..", "..#..", "#####", "..#..", "..#..", "....."),
+    ',' : (".....", ".....", ".....", ".....", ".##..", "..#..", ".#..."),
+    '-' : (".....", ".....", ".....", "#####", ".....", ".....", "....."),
+    '.' : (".....", ".....", ".....", ".....", ".....", ".##..", ".##.."),
+    '/' : (".....", "....#", "...#.", "..#..", ".#...", "#....", "....."),
+    '0' : (".###.", "#...#", "#..##", "#.#.#", "##..#", "#...#", ".###."),
+    '1' : ("..#..", ".##..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    '2' : (".###.", "#...#", "....#", "...#.", "..#..", ".#...", "#####"),
+    '3' : ("#####", "...#.", "..#..", "...#.", "....#", "#...#", ".###."),
+    '4' : ("...#.", "..##.", ".#.#.", "#..#.", "#####", "...#.", "...#."),
+    '5' : ("#####", "#....", "####.", "....#", "....#", "#...#", ".###."),
+    '6' : ("..##.", ".#...", "#....", "####.", "#...#", "#...#", ".###."),
+    '7' : ("#####", "....#", "...#.", "..#..", ".#...", ".#...", ".#..."),
+    '8' : (".###.", "#...#", "#...#", ".###.", "#...#", "#...#", ".###."),
+    '9' : (".###.", "#...#", "#...#", ".####", "....#", "...#.", ".##.."),
+    ':' : (".....", ".##..", ".##..", ".....", ".##..", ".##..", "....."),
+    ';' : (".....", ".##..", ".##..", ".....", ".##..", "..#..", ".#..."),
+    '<' : ("...#.", "..#..", ".#...", "#....", ".#...", "..#..", "...#."),
+    '=' : (".....", ".....", "#####", ".....", "#####", ".....", "....."),
+    '>' : (".#...", "..#..", "...#.", "....#", "...#.", "..#..", ".#..."),
+    '?' : (".###.", "#...#", "....#", "...#.", "..#..", ".....", "..#.."),
+    '@' : (".###.", "#...#", "....#", ".##.#", "#.#.#", "#.#.#", ".###."),
+    'A' : (".###.", "#...#", "#...#", "#####", "#...#", "#...#", "#...#"),
+    'B' : ("####.", "#...#", "#...#", "####.", "#...#", "#...#", "####."),
+    'C' : (".###.", "#...#", "#....", "#....", "#....", "#...#", ".###."),
+    'D' : ("###..", "#..#.", "#...#", "#...#", "#...#", "#..#.", "###.."),
+    'E' : ("#####", "#....", "#....", "####.", "#....", "#....", "#####"),
+    'F' : ("#####", "#....", "#....", "####.", "#....", "#....", "#...."),
+    'G' : (".###.", "#...#", "#....", "#.###", "#...#", "#...#", ".####"),
+    'H' : ("#...#", "#...#", "#...#", "#####", "#...#", "#...#", "#...#"),
+    'I' : (".###.", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    'J' : ("..###", "...#.", "...#.", "...#.", "...#.", "#..#.", ".##.."),
+    'K' : ("#...#", "#..#.", "#.#..", "##...", "#.#..", "#..#.", "#...#"),
+    'L' : ("#....", "#....", "#....", "#....", "#....", "#....", "#####"),
+    'M' : ("#...#", "##.##", "#.#.#", "#.#.#", "#...#", "#...#", "#...#"),
+    'N' : ("#...#", "#...#", "##..#", "#.#.#", "#..##", "#...#", "#...#"),
+    'O' : (".###.", "#...#", "#...#", "#...#", "#...#", "#...#", ".###."),
+    'P' : ("####.", "#...#", "#...#", "####.", "#....", "#....", "#...."),
+    'Q' : (".###.", "#...#", "#...#", "#...#", "#.#.#", "#..#.", ".##.#"),
+    'R' : ("####.", "#...#", "#...#", "####.", "#.#..", "#..#.", "#...#"),
+    'S' : (".####", "#....", "#....", ".###.", "....#", "....#", "####."),
+    'T' : ("#####", "..#..", "..#..", "..#..", "..#..", "..#..", "..#.."),
+    'U' : ("#...#", "#...#", "#...#", "#...#", "#...#", "#...#", ".###."),
+    'V' : ("#...#", "#...#", "#...#", "#...#", "#...#", ".#.#.", "..#.."),
+    'W' : ("#...#", "#...#", "#...#", "#.#.#", "#.#.#", "#.#.#", ".#.#."),
+    'X' : ("#...#", "#...#", ".#.#.", "..#..", ".#.#.", "#...#", "#...#"),
+    'Y' : ("#...#", "#...#", ".#.#.", "..#..", "..#..", "..#..", "..#.."),
+    'Z' : ("#####", "....#", "...#.", "..#..", ".#...", "#....", "#####"),
+    '[' : (".###.", ".#...", ".#...", ".#...", ".#...", ".#...", ".###."),
+    '\\' : (".....", "#....", ".#...", "..#..", "...#.", "....#", "....."),
+    ']' : (".###.", "...#.", "...#.", "...#.", "...#.", "...#.", ".###."),
+    '^' : ("..#..", ".#.#.", "#...#"),
+    '_' : (".....", ".....", ".....", ".....", ".....", ".....", "#####"),
+    '`' : (".#...", "..#..", "...#."),
+    'a' : (".....", ".....", ".###.", "....#", ".####", "#...#", ".####"),
+    'b' : ("#....", "#....", "#.##.", "##..#", "#...#", "#...#", "####."),
+    'c' : (".....", ".....", ".###.", "#....", "#....", "#...#", ".###."),
+    'd' : ("....#", "....#", ".##.#", "#..##", "#...#", "#...#", ".####"),
+    'e' : (".....", ".....", ".###.", "#...#", "#####", "#....", ".###."),
+    'f' : ("..##.", ".#..#", ".#...", "###..", ".#...", ".#...", ".#..."),
+    'g' : (".....", ".....", ".####", "#...#", "#...#", ".####", "....#", ".###."),
+    'h' : ("#....", "#....", "#.##.", "##..#", "#...#", "#...#", "#...#"),
+    'i' : ("..#..", ".....", ".##..", "..#..", "..#..", "..#..", ".###."),
+    'j' : ("...#.", ".....", "..##.", "...#.", "...#.", "...#.", "#..#.", ".##.."),
+    'k' : ("#....", "#....", "#..#.", "#.#..", "##...", "#.#..", "#..#."),
+    'l' : (".##..", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    'm' : (".....", ".....", "##.#.", "#.#.#", "#.#.#", "#...#", "#...#"),
+    'n' : (".....", ".....", "#.##.", "##..#", "#...#", "#...#", "#...#"),
+    'o' : (".....", ".....", ".###.", "#...#", "#...#", "#...#", ".###."),
+    'p' : (".....", ".....", "####.", "#...#", "#...#", "####.", "#....", "#...."),
+    'q' : (".....", ".....", ".####", "#...#", "#...#", ".####", "....#", "....#"),
+    'r' : (".....", ".....", "#.##.", "##..#", "#....", "#....", "#...."),
+    's' : (".....", ".....", ".###.", "#....", ".###.", "....#", "####."),
+    't' : (".#...", ".#...", "###..", ".#...", ".#...", ".#..#", "..##."),
+    'u' : (".....", ".....", "#...#", "#...#", "#...#", "#..##", ".##.#"),
+    'v' : (".....", ".....", "#...#", "#...#", "#...#", ".#.#.", "..#.."),
+    'w' : (".....", ".....", "#...#", "#...#", "#.#.#", "#.#.#", ".#.#."),
+    'x' : (".....", ".....", "#...#", ".#.#.", "..#..", ".#.#.", "#...#"),
+    'y' : (".....", ".....", "#...#", "#...#", "#...#", ".####", "....#", ".###."),
+    'z' : (".....", ".....", "#####", "...#.", "..#..", ".#...", "#####"),
+    '{' : ("...#.", "..#..", "..#..", ".#...", "..#..", "..#..", "...#."),
+    '|' : ("..#..", "..#..", "..#..", "..#..", "..#..", "..#..", "..#.."),
+    '}' : (".#...", "..#..", "..#..", "...#.", "..#..", "..#..", ".#..."),
+    '~' : (".....", ".....", ".#...", "#.#.#", "...#.", ".....", "....."),
+}
+
+# Drawn for characters the matrix does not have
+_MISSING = ("#####", "#...#", "#...#", "#...#", "#...#", "#...#", "#####")
+
+
+@lru_cache(maxsize=None)
+def _glyph_rects(character : str) -> tuple[tuple[int, int, int, int], ...]:
+    """ The dots of character as (column, row, width, height) rectangles, in dots from the
+        top left of the matrix: each row's runs of dots, with a run carried down while the
+        rows below repeat it
+    """
+    rects : list[list[int]] = []
+    open_runs : dict[tuple[int, int], list[int]] = {}
+    for row, dots in enumerate(_DOT_MATRIX.get(character, _MISSING)):
+        runs : dict[tuple[int, int], list[int]] = {}
+        column = 0
+        while column < len(dots):
+            if dots[column] != '#':
+                column += 1
+                continue
+            start = column
+            while column < len(dots) and dots[column] == '#':
+                column += 1
+            rect = open_runs.get((start, column))
+            if rect is None:
+                rect = [ start, row, column - start, 0 ]
+                rects.append(rect)
+            rect[3] += 1
+            runs[(start, column)] = rect
+        open_runs = runs
+    return tuple(tuple(rect) for rect in rects)
+
+@lru_cache(maxsize=4096)
+def text_rects(text : str, size_in : float, anchor : str = 'middle') -> tuple[tuple[float, float, float, float], ...]:
+    """ The outline of text at size_in (the em, in inches) as (x, y, width, height)
+        rectangles relative to the anchor point, one of ANCHORS, rounded to GLYPH_PRECISION
+    """
+    if anchor not in ANCHORS:
+        raise ValueError(f"unknown anchor \"{anchor}\", expected one of {', '.join(ANCHORS)}")
+    dot = _DOT_EM * size_in
+    if anchor == 'middle':
+        # centred on the inked width, from the first glyph's left edge to the last's right
+        left = -(_ADVANCE_DOTS * len(text) - 1) * dot / 2.0
+        top = -_CAP_DOTS * dot / 2.0
+    else:
+        left = 0.0
+        top = -_CAP_DOTS * dot
+    rects = []
+    for index, character in enumerate(text):
+        for (column, row, width, height) in _glyph_rects(character):
+            x = left + (index * _ADVANCE_DOTS + column) * dot
+            y = top + row * dot
+            rects.append((round(x, GLYPH_PRECISION), round(y, GLYPH_PRECISION),
+                          round(width * dot, GLYPH_PRECISION), round(height * dot, GLYPH_PRECISION)))
+    return tuple(rects)
+
+def _num(x : float) -> str:
+    """ x to GLYPH_PRECISION places, without trailing zeros or a leading zero """
+    text = f"{x:.{GLYPH_PRECISION}f}".rstrip("0").rstrip(".")
+    if text == "-0":
+        return "0"
+    return text.replace("0.", ".", 1) if text.startswith(("0.", "-0.")) else text
+
+@lru_cache(maxsize=4096)
+def text_path(text : str, size_in : float, anchor : str = 'middle') -> str:
+    """ SVG path data of the outline of text, in relative commands starting from the
+        anchor point, so that "M x y" before it draws the text anchored at x, y
+    """
+    commands = []
+    (x, y) = (0.0, 0.0)
+    for (left, top, width, height) in text_rects(text, size_in, anchor):
+        # each rectangle closes back at its top left corner, where the next move starts
+        dy = _num(round(top - y, GLYPH_PRECISION))
+        # a minus sign separates the numbers as well as a space does
+        commands.append(f"m{_num(round(left - x, GLYPH_PRECISION))}{dy if dy.startswith('-') else ' ' + dy}"
+                        f"h{_num(width)}v{_num(height)}h{_num(-width)}z")
+        (x, y) = (left, top)
+    return "".join(commands)
+
+def label_path(x : float | str, y : float | str, text : str, class_ : str, anchor : str = 'middle') -> str:
+    """ Path data drawing text as a label of class_ anchored at x, y (numbers, or already
+        written out as they appear in the document), or "" if nothing of it is inked
+    """
+    data = text_path(text, LABEL_SIZES_IN[class_], anchor)
+    return f"M{x} {y}{data}" if data else ""
@@ -0,0 +1,140 @@
+""" Sheet imposition: many cards laid out on one cutting mat.
+
+    Each mat is one SVG document.  The card-invariant printed and structure layers are
+    written once per mat in <defs> and placed on every card with <use>; each card adds
+    only its own characters, manufacturer label and cut lines.  The cut lines are kept
+    inline so that cutter software which ignores <use> still cuts every card.
+"""
+import io
+import logging
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from puncher.puncher import PunchcardSVG
+from puncher import svgwriter
+
+logger = logging.getLogger("puncher")
+
+# 12 x 24 in Cricut / Silhouette mat
+MAT_WIDTH_IN = 12.0
+MAT_HEIGHT_IN = 24.0
+MAT_MARGIN_IN = 0.5
+MAT_GUTTER_IN = 0.25
+
+
+def parse_mat_size(text : str) -> tuple[float, float]:
+    """ '12x24' -> (12.0, 24.0) """
+    try:
+        (width, height) = (float(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"mat size \"{text}\" is not of the form WIDTHxHEIGHT, in inches") from None
+    return (width, height)
+
+def mat_layout(mat_width_in : float = MAT_WIDTH_IN,
+               mat_height_in : float = MAT_HEIGHT_IN,
+               margin_in : float = MAT_MARGIN_IN,
+               gutter_in : float = MAT_GUTTER_IN) -> list[tuple[float, float]]:
+    """ Top left corner of each card slot on the mat, filled row by row.
+    """
+    pitch_x = PunchcardSVG.CARD_DIM_WIDTH_IN + gutter_in
+    pitch_y = PunchcardSVG.CARD_DIM_LENGTH_IN + gutter_in
+    across = int((mat_width_in - 2 * margin_in + gutter_in) // pitch_x)
+    down = int((mat_height_in - 2 * margin_in + gutter_in) // pitch_y)
+    if across < 1 or down < 1:
+        raise ValueError(f"a {PunchcardSVG.CARD_DIM_WIDTH_IN}x{PunchcardSVG.CARD_DIM_LENGTH_IN} in card does not fit "
+                         f"on a {mat_width_in}x{mat_height_in} in mat with {margin_in} in margins")
+    return [ (margin_in + column * pitch_x, margin_in + row * pitch_y)
+             for row in range(down) for column in range(across) ]
+
+def _use(layer_id : str) -> str:
+    return f'<use href="#{layer_id}"/>'
+
+
+def dump_mat(cards : list[PunchcardSVG],
+             fp : TextIO,
+             mat_width_in : float = MAT_WIDTH_IN,
+             mat_height_in : float = MAT_HEIGHT_IN,
+             margin_in : float = MAT_MARGIN_IN,
+             gutter_in : float = MAT_GUTTER_IN,
+             first_number : int = 1,
+             flatten_printed_material : bool = False,
+             print_cellboundaries : bool = False,
+             print_punchboundaries: bool = False,
+             print_punchboxes : bool = True,
+             optimize_cuts : bool = False,
+             merge_punches : bool = False,
+             use_defs : bool = False,
+             outline_text : bool = False,
+             precision : int | None = PunchcardSVG.COORDINATE_PRECISION) -> None:
+    """ Write one mat holding cards to the text stream fp.  Cards are numbered from
+        first_number in element ids.  The remaining options are those of
+        svgwriter.dump.
+    """
+    slots = mat_layout(mat_width_in, mat_height_in, margin_in, gutter_in)
+    if len(cards) > len(slots):
+        raise ValueError(f"{len(cards)} cards do not fit on a mat with {len(slots)} slots")
+    if not cards:
+        return
+    template = cards[0]
+    numbers = svgwriter._numbers(precision)
+
+    fp.write(svgwriter._svg_open(mat_width_in, mat_height_in))
+    fp.write(svgwriter._static_layer(template, 'style', precision))
+
+    # Shared layers, referenced by every card on the mat
+    defs : list[str] = []
+    structure_ids : list[str] = []
+    if not flatten_printed_material:
+        names = svgwriter._shared_layer_names(print_cellboundaries, print_punchboundaries)
+        if use_defs:
+            defs.extend(svgwriter._layer_templates(template, names, precision, outline_text))
+        defs.extend(svgwriter._shared_layer(template, name, use_defs, precision, outline_text) for name in names)
+        if print_cellboundaries:
+            structure_ids.append("character_grid__draw_character_cell_box")
+        if print_punchboundaries:
+            structure_ids.append("cardpunch_hole_boundary")
+    if defs:
+        fp.write(svgwriter._defs(defs))
+
+    for index, (card, (x, y)) in enumerate(zip(cards, slots)):
+        suffix = f"_{first_number + index:04d}"
+        parts : list[str] = []
+        if flatten_printed_material:
+            parts.append(svgwriter._flattened_layer(card, print_cellboundaries, print_punchboundaries,
+                                                    transform=None, suffix=suffix, numbers=numbers, outline_text=outline_text))
+        else:
+            printed = [ _use("row_number_labels"),
+                        _use("column_number_labels"),
+                        svgwriter._content_labels_layer(card, suffix, numbers, outline_text),
+                        svgwriter._manufacturer_label_layer(card, suffix, numbers, outline_text) ]
+            parts.append(svgwriter._group(printed, id="card_printed" + suffix))
+            parts.append(svgwriter._group([ _use(layer_id) for layer_id in structure_ids ],
+                                          id="punchcard_structure" + suffix))
+        cut_lines = svgwriter._cut_lines(card, optimize_cuts, merge_punches, suffix, numbers)
+        parts.append(svgwriter._group(cut_lines, id="card_cutlines" + suffix))
+        fp.write(svgwriter._group(parts, id="card" + suffix, transform=f"translate({numbers.num(x)}, {numbers.num(y)})"))
+    fp.write("</svg>")
+
+def impose(cards : Iterable[str | PunchcardSVG],
+           mat_width_in : float = MAT_WIDTH_IN,
+           mat_height_in : float = MAT_HEIGHT_IN,
+           margin_in : float = MAT_MARGIN_IN,
+           gutter_in : float = MAT_GUTTER_IN,
+           **options) -> Iterator[str]:
+    """ Lay a deck of cards (strings or PunchcardSVG) out on as many mats as it needs,
+        yielding each mat's SVG document.  options are the svgwriter.dump options.
+    """
+    per_mat = len(mat_layout(mat_width_in, mat_height_in, margin_in, gutter_in))
+    cards = ( card if isinstance(card, PunchcardSVG) else PunchcardSVG(card) for card in cards )
+    first_number = 1
+    while mat_cards := list(islice(cards, per_mat)):
+        fp = io.StringIO()
+        dump_mat(mat_cards, fp, mat_width_in, mat_height_in, margin_in, gutter_in,
+                 first_number=first_number, **options)
+        logger.debug(f"impose: mat with cards {first_number}-{first_number + len(mat_cards) - 1}")
+        first_number += len(mat_cards)
+        yield fp.getvalue()
+
+def mat_stem(stem : str, number : int) -> str:
+    """ Output stem for the mat numbered number (from 1) """
+    return f"{stem}_mat_{number:03d}"
@@ -0,0 +1,293 @@
+""" Multi-page PDF output: a whole deck as one document, one card per page.
+
+    The PDF is written directly, with no cairo and no SVG round trip, and streamed: each
+    page is written as soon as its card is drawn, and only the byte offsets of the objects
+    written so far are kept, so a deck of any length takes the same memory.  The
+    card-invariant artwork (the row and column number labels, and the optional structure
+    layers) is one Form XObject, written once and drawn on every page; each page adds only
+    its card's characters, manufacturer label and cut lines.  Text uses the standard
+    Courier and Helvetica fonts, which PDF viewers supply, so no font is embedded.
+"""
+import logging
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+from puncher import profiling
+from puncher.geometry import COLUMNS, HOLE_ROWS, cell_index, hole_index
+from puncher.glyphs import text_rects
+from puncher.puncher import PunchcardSVG
+
+logger = logging.getLogger("puncher")
+
+_GEOMETRY = PunchcardSVG.GEOMETRY
+_POINTS_PER_IN = 72
+
+# Fixed object numbers; pages take the numbers from _FIRST_PAGE_OBJECT on, two per page
+_CATALOG = 1
+_PAGES = 2
+_COURIER = 3
+_HELVETICA = 4
+_CARD_ARTWORK = 5
+_FIRST_PAGE_OBJECT = 6
+
+# Font sizes of the card style in inches: CSS em sizes of the 16px default font, in user units
+_NUMBER_LABEL_EM_IN = 0.007 * 16
+_COLUMN_LABEL_EM_IN = 0.004 * 16
+_MANUFACTURER_EM_IN = 0.004 * 16
+
+# Courier glyphs are 0.6 em wide, and its capitals and digits 0.562 em tall
+_COURIER_ADVANCE_EM = 0.6
+_COURIER_CAP_HEIGHT_EM = 0.562
+
+# Colours of the card style (see PunchcardSVG._define_card_style)
+_PRINTED_BROWN = "0.6 0.4 0.2"
+_MANUFACTURER_GREEN = "0 0.502 0"
+_BOUNDARY_GREY = "0.502 0.502 0.502"
+_CUTLINE_RED = "1 0 0"
+
+
+@lru_cache(maxsize=None)
+def _num(x : float) -> str:
+    """ x to 4 decimal places (0.0001 in), without trailing zeros.  Cached, as the
+        coordinates come from the card geometry tables and repeat on every page.
+    """
+    text = f"{x:.4f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+def _string(text : str) -> str:
+    """ text as a PDF literal string """
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+def _centered_text(x : float, y : float, text : str, size_in : float) -> str:
+    """ Courier text centred on x, y, like the SVG's middle/central anchored labels.  The
+        page space is flipped to run down the card, so the text matrix flips it back.
+    """
+    left = x - len(text) * _COURIER_ADVANCE_EM * size_in / 2.0
+    baseline = y + _COURIER_CAP_HEIGHT_EM * size_in / 2.0
+    return f"1 0 0 -1 {_num(left)} {_num(baseline)} Tm {_string(text)} Tj"
+
+def _rect(x : float, y : float, width : float, height : float) -> str:
+    return f"{_num(x)} {_num(y)} {_num(width)} {_num(height)} re"
+
+def _outlined_text(x : float, y : float, text : str, size_in : float, anchor : str = 'middle') -> str:
+    """ text as the rectangles of its glyph outlines (see puncher.glyphs), anchored at x, y,
+        to be filled
+    """
+    return " ".join(_rect(x + left, y + top, width, height) for (left, top, width, height) in text_rects(text, size_in, anchor))
+
+@lru_cache(maxsize=None)
+def _point(x : float, y : float) -> str:
+    return f"{_num(x)} {_num(y)}"
+
+def _polygon(points : list[tuple[float, float]]) -> str:
+    return _point(*points[0]) + " m " + " l ".join(_point(x, y) for (x, y) in points[1:]) + " l h"
+
+
+def _outlined_labels() -> list[str]:
+    """ The row and column number labels as glyph outlines """
+    operators = [ f"{_PRINTED_BROWN} rg" ]
+    for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS):
+        rowname = PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row]
+        for col in range(COLUMNS):
+            hole = hole_index(row, col)
+            operators.append(_outlined_text(_GEOMETRY.hole_center_x[hole], _GEOMETRY.hole_center_y[hole], rowname, _NUMBER_LABEL_EM_IN))
+    for row in [6, 24]:
+        for col in range(COLUMNS):
+            cell = cell_index(row, col)
+            operators.append(_outlined_text(_GEOMETRY.cell_center_x[cell], _GEOMETRY.cell_center_y[cell], str(col + 1), _COLUMN_LABEL_EM_IN))
+    operators.append("f")
+    return operators
+
+def _text_labels() -> list[str]:
+    """ The row and column number labels in Courier """
+    operators = [ f"{_PRINTED_BROWN} rg", "BT", f"/F1 {_num(_NUMBER_LABEL_EM_IN)} Tf" ]
+    for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS):
+        rowname = PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row]
+        for col in range(COLUMNS):
+            hole = hole_index(row, col)
+            operators.append(_centered_text(_GEOMETRY.hole_center_x[hole], _GEOMETRY.hole_center_y[hole], rowname, _NUMBER_LABEL_EM_IN))
+    operators.append(f"/F1 {_num(_COLUMN_LABEL_EM_IN)} Tf")
+    for row in [6, 24]:
+        for col in range(COLUMNS):
+            cell = cell_index(row, col)
+            operators.append(_centered_text(_GEOMETRY.cell_center_x[cell], _GEOMETRY.cell_center_y[cell], str(col + 1), _COLUMN_LABEL_EM_IN))
+    operators.append("ET")
+    return operators
+
+@lru_cache(maxsize=8)
+def _card_artwork(print_cellboundaries : bool, print_punchboundaries : bool, outline_text : bool = False) -> bytes:
+    """ Content stream of the card-invariant artwork, in card coordinates """
+    operators = _outlined_labels() if outline_text else _text_labels()
+    operators.append(f"{_BOUNDARY_GREY} RG {_num(PunchcardSVG.STROKE_WEIGHT_1PT_IN)} w")
+    if print_cellboundaries:
+        # stroke-dasharray="3 1", in inches like every other length of the card
+        operators.append("[3 1] 0 d")
+        operators.extend(_rect(x, y - _GEOMETRY.cell_height, _GEOMETRY.cell_width, _GEOMETRY.cell_height)
+                         for (x, y) in zip(_GEOMETRY.cell_x, _GEOMETRY.cell_y))
+        operators.append("S [] 0 d")
+    if print_punchboundaries:
+        operators.extend(_rect(x, y, _GEOMETRY.hole_width, _GEOMETRY.hole_height)
+                         for (x, y) in zip(_GEOMETRY.hole_x, _GEOMETRY.hole_y))
+        operators.append("S")
+    return "\n".join(operators).encode('ascii')
+
+
+class DeckPDF():
+    """ Cards written to the binary stream fp as the pages of one PDF, a page per add().
+        close() finishes the document (fp itself is left open).  Takes the
+        svgwriter.dump options; flatten_printed_material, print_punchboxes, use_defs and
+        precision make no difference to the PDF.  With outline_text the labels are
+        filled glyph outlines (see puncher.glyphs) instead of Courier and Helvetica text.
+    """
+    def __init__(self,
+                 fp : BinaryIO,
+                 flatten_printed_material : bool = False,
+                 print_cellboundaries : bool = False,
+                 print_punchboundaries : bool = False,
+                 print_punchboxes : bool = True,
+                 optimize_cuts : bool = False,
+                 merge_punches : bool = False,
+                 use_defs : bool = False,
+                 outline_text : bool = False,
+                 precision : int | None = None,
+                 compresslevel : int = 6):
+        self.fp = fp
+        self.optimize_cuts = optimize_cuts or merge_punches
+        self.merge_punches = merge_punches
+        self.outline_text = outline_text
+        self.compresslevel = compresslevel
+        self.position = 0
+        self.offsets : dict[int, int] = {}
+        self.pages : list[int] = []
+
+        # The binary comment marks the file as binary for transfer programs
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(_CATALOG, f"<< /Type /Catalog /Pages {_PAGES} 0 R >>".encode('ascii'))
+        self._object(_COURIER, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+        self._object(_HELVETICA, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        # The artwork is drawn in the page's card coordinates, so its box is the document's
+        bbox = " ".join(_num(x) for x in (-PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN, -PunchcardSVG.DOCUMENT_MARGIN_TOP_IN,
+                                          PunchcardSVG.CARD_DIM_WIDTH_IN + PunchcardSVG.DOCUMENT_MARGIN_RIGHT_IN,
+                                          PunchcardSVG.CARD_DIM_LENGTH_IN + PunchcardSVG.DOCUMENT_MARGIN_BOTTOM_IN))
+        self._stream(_CARD_ARTWORK, _card_artwork(print_cellboundaries, print_punchboundaries, outline_text),
+                     f"/Type /XObject /Subtype /Form /BBox [{bbox}] /Resources << /Font << /F1 {_COURIER} 0 R >> >>")
+
+    def __enter__(self) -> "DeckPDF":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _write(self, data : bytes) -> None:
+        self.fp.write(data)
+        self.position += len(data)
+
+    def _object(self, number : int, body : bytes) -> None:
+        self.offsets[number] = self.position
+        self._write(f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n")
+
+    def _stream(self, number : int, content : bytes, dictionary : str = "") -> None:
+        data = zlib.compress(content, self.compresslevel)
+        header = f"<< {dictionary} /Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode('ascii')
+        self._object(number, header + data + b"\nendstream")
+
+    def _text_printing(self, card : PunchcardSVG) -> list[str]:
+        """ The card's characters and manufacturer label in Courier and Helvetica """
+        operators = [ "0 g BT", f"/F1 {_num(_NUMBER_LABEL_EM_IN)} Tf" ]
+        for column, character in enumerate(card.card_content):
+            if not character.isspace():
+                cell = cell_index(0, column)
+                operators.append(_centered_text(_GEOMETRY.cell_center_x[cell], _GEOMETRY.cell_center_y[cell], character, _NUMBER_LABEL_EM_IN))
+        if card.card_manufacturer_string:
+            # with its runs of spaces collapsed, as SVG text is rendered
+            operators.append(f"{_MANUFACTURER_GREEN} rg /F2 {_num(_MANUFACTURER_EM_IN)} Tf "
+                             f"1 0 0 -1 {_num(PunchcardSVG.CARD_LEFT_MARGIN_IN)} {_num(PunchcardSVG.CARD_DIM_LENGTH_IN - 0.03)} Tm "
+                             f"{_string(' '.join(card.card_manufacturer_string.split()))} Tj")
+        operators.append("ET")
+        return operators
+
+    def _outlined_printing(self, card : PunchcardSVG) -> list[str]:
+        """ The card's characters and manufacturer label as glyph outlines """
+        operators = []
+        characters = [ _outlined_text(_GEOMETRY.cell_center_x[cell_index(0, column)], _GEOMETRY.cell_center_y[cell_index(0, column)],
+                                      character, _NUMBER_LABEL_EM_IN)
+                       for column, character in enumerate(card.card_content) if not character.isspace() ]
+        if characters:
+            operators.append("0 g " + " ".join(characters) + " f")
+        label = " ".join(card.card_manufacturer_string.split())
+        if label:
+            operators.append(f"{_MANUFACTURER_GREEN} rg "
+                             + _outlined_text(PunchcardSVG.CARD_LEFT_MARGIN_IN, PunchcardSVG.CARD_DIM_LENGTH_IN - 0.03,
+                                              label, _MANUFACTURER_EM_IN, anchor='start')
+                             + " f")
+        return operators
+
+    def _page_content(self, card : PunchcardSVG) -> bytes:
+        from puncher.cutpath import document_cut_plan, optimized_cut_plan
+
+        # Inches, with y running down the card from its top left corner, as in the SVG
+        page_height = PunchcardSVG.DOCUMENT_HEIGHT_IN * _POINTS_PER_IN
+        operators = [ f"q {_POINTS_PER_IN} 0 0 {-_POINTS_PER_IN} {_num(PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN * _POINTS_PER_IN)} "
+                      f"{_num(page_height - PunchcardSVG.DOCUMENT_MARGIN_TOP_IN * _POINTS_PER_IN)} cm",
+                      "/Card Do" ]
+        if self.outline_text:
+            operators.extend(self._outlined_printing(card))
+        else:
+            operators.extend(self._text_printing(card))
+
+        if self.optimize_cuts:
+            plan = optimized_cut_plan(card, merge_punches=self.merge_punches)
+        else:
+            plan = document_cut_plan(card)
+        operators.append(f"{_CUTLINE_RED} RG {_num(PunchcardSVG.STROKE_WEIGHT_1PT_IN)} w")
+        operators.extend(_polygon(outline) for outline in plan.outlines)
+        operators.append("S Q")
+        return "\n".join(operators).encode('cp1252', errors='replace')
+
+    @profiling.timed("pdf.page")
+    def add(self, card : PunchcardSVG | str) -> None:
+        """ Write card as the next page """
+        if isinstance(card, str):
+            card = PunchcardSVG(card)
+        contents = _FIRST_PAGE_OBJECT + 2 * len(self.pages)
+        self._stream(contents, self._page_content(card))
+        self._object(contents + 1, f"<< /Type /Page /Parent {_PAGES} 0 R /Contents {contents} 0 R >>".encode('ascii'))
+        self.pages.append(contents + 1)
+
+    def close(self) -> None:
+        """ Write the page tree, which every page inherits its size and resources from,
+            and the cross-reference table
+        """
+        if self.fp is None:
+            return
+        media_box = f"0 0 {_num(PunchcardSVG.DOCUMENT_WIDTH_IN * _POINTS_PER_IN)} {_num(PunchcardSVG.DOCUMENT_HEIGHT_IN * _POINTS_PER_IN)}"
+        kids = " ".join(f"{page} 0 R" for page in self.pages)
+        self._object(_PAGES, (f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} /MediaBox [{media_box}] "
+                              f"/Resources << /Font << /F1 {_COURIER} 0 R /F2 {_HELVETICA} 0 R >> "
+                              f"/XObject << /Card {_CARD_ARTWORK} 0 R >> >> >>").encode('ascii'))
+        xref = self.position
+        objects = max(self.offsets) + 1
+        entries = [ "0000000000 65535 f \n" ] + [ f"{self.offsets[number]:010d} 00000 n \n" for number in range(1, objects) ]
+        self._write((f"xref\n0 {objects}\n" + "".join(entries) +
+                     f"trailer\n<< /Size {objects} /Root {_CATALOG} 0 R >>\nstartxref\n{xref}\n%%EOF\n").encode('ascii'))
+        profiling.count("bytes.pdf", self.position)
+        self.fp = None
+
+
+def dump_pdf(cards : Iterable[PunchcardSVG | str], fp : BinaryIO, **options) -> int:
+    """ Write cards (PunchcardSVGs, or the text to punch) to the binary stream fp as one
+        PDF, a page per card, taking the DeckPDF options.  Returns the number of pages.
+    """
+    with DeckPDF(fp, **options) as pdf:
+        for card in cards:
+            pdf.add(card)
+    return len(pdf.pages)
+
+def writepdf(cards : Iterable[PunchcardSVG | str], path : Path, stem : str, **options) -> int:
+    """ Write cards to path / [stem].pdf, a page per card.  Returns the number of pages. """
+    pdf_filename = path / (stem + ".pdf")
+    logger.info(f"writing to \"{pdf_filename}\"")
+    with open(pdf_filename, "wb") as pdf_file:
+        return dump_pdf(cards, pdf_file, **options)
@@ -0,0 +1,164 @@
+""" Per-stage timing and counters for rendering.
+
+    Profiling is off by default.  While it is off, timer() hands back one shared no-op
+    context manager and count() returns at once, so the instrumented code costs a function
+    call per stage.  Turn it on around some work to see where its time went:
+
+        with profiling.collect() as stats:
+            writesvg(PunchcardSVG("HELLO").makesvg(), Path("."), "hello")
+        print("\\n".join(stats.describe()))
+
+    Stages are timed inclusively, so a stage's time includes that of the stages it calls
+    (makesvg includes the draw.* stages that build its layers, for instance).  Counters
+    hold the elements drawn per layer, by layer id, and the bytes of output written.
+"""
+import re
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Iterator
+
+# Collecting stats, or None while profiling is off
+_stats : "RenderStats | None" = None
+
+_NO_TIMER = nullcontext()
+_LAYER_ID = re.compile(r'<\w+[^>]*? id="([^"]*)"')
+
+
+@dataclass
+class StageTime:
+    calls : int = 0
+    seconds : float = 0.0
+
+@dataclass
+class RenderStats:
+    """ Time per stage and counters, accumulated over everything rendered while collecting """
+    stages : dict[str, StageTime] = field(default_factory=dict)
+    counts : dict[str, int] = field(default_factory=dict)
+
+    def add_time(self, stage : str, seconds : float) -> None:
+        timing = self.stages.get(stage)
+        if timing is None:
+            timing = self.stages[stage] = StageTime()
+        timing.calls += 1
+        timing.seconds += seconds
+
+    def add_count(self, name : str, n : int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def merge(self, other : "RenderStats") -> None:
+        """ Add other's times and counts, e.g. from a worker process """
+        for stage, timing in other.stages.items():
+            mine = self.stages.setdefault(stage, StageTime())
+            mine.calls += timing.calls
+            mine.seconds += timing.seconds
+        for name, n in other.counts.items():
+            self.add_count(name, n)
+
+    def as_dict(self) -> dict:
+        """ Plain dict for JSON or a metrics pipeline """
+        return { "stages" : { stage : { "calls" : timing.calls, "seconds" : timing.seconds }
+                              for stage, timing in sorted(self.stages.items()) },
+                 "counts" : dict(sorted(self.counts.items())) }
+
+    def describe(self) -> list[str]:
+        """ Report lines, stages slowest first, then the counters """
+        lines = []
+        for stage, timing in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{stage:40} {timing.calls:7} calls {1000.0 * timing.seconds:10.1f} ms "
+                         f"{1000.0 * timing.seconds / timing.calls:9.3f} ms/call")
+        for name, n in sorted(self.counts.items()):
+            lines.append(f"{name:40} {n:7}")
+        return lines
+
+
+class _Timer():
+    __slots__ = ('stats', 'stage', 'start')
+
+    def __init__(self, stats : RenderStats, stage : str):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.stage, time.perf_counter() - self.start)
+
+
+def enabled() -> bool:
+    return _stats is not None
+
+def current() -> RenderStats | None:
+    """ The stats being collected, or None while profiling is off """
+    return _stats
+
+def enable(stats : RenderStats | None = None) -> RenderStats:
+    """ Start collecting into stats (a new RenderStats by default), and return it """
+    global _stats
+    _stats = stats if stats is not None else RenderStats()
+    return _stats
+
+def disable() -> RenderStats | None:
+    """ Stop collecting, returning what was collected """
+    global _stats
+    (stats, _stats) = (_stats, None)
+    return stats
+
+def take() -> RenderStats | None:
+    """ What was collected so far, collecting afresh from now on; None while off """
+    global _stats
+    if _stats is None:
+        return None
+    (stats, _stats) = (_stats, RenderStats())
+    return stats
+
+@contextmanager
+def collect(stats : RenderStats | None = None) -> Iterator[RenderStats]:
+    """ Collect stats for the duration of the with block """
+    global _stats
+    previous = _stats
+    try:
+        yield enable(stats)
+    finally:
+        _stats = previous
+
+
+def timer(stage : str):
+    """ Context manager timing stage, a no-op while profiling is off """
+    if _stats is None:
+        return _NO_TIMER
+    return _Timer(_stats, stage)
+
+def timed(stage : str) -> Callable:
+    """ Decorator timing every call of the function as stage """
+    def decorator(function : Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _stats is None:
+                return function(*args, **kwargs)
+            with _Timer(_stats, stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name : str, n : int = 1) -> None:
+    if _stats is not None:
+        _stats.add_count(name, n)
+
+def count_elements(element) -> None:
+    """ Count the elements of an svg.py layer under elements.<layer id> """
+    if _stats is not None:
+        _stats.add_count(f"elements.{element.id}", _tree_size(element) - 1)
+
+def count_layer_text(text : str) -> None:
+    """ Count the elements of a layer emitted as SVG text under elements.<layer id> """
+    if _stats is not None:
+        match = _LAYER_ID.match(text)
+        if match:
+            # every element opens with "<"; text content is escaped, so any other "<" closes one
+            _stats.add_count(f"elements.{match.group(1)}", text.count("<") - text.count("</") - 1)
+
+def _tree_size(element) -> int:
+    return 1 + sum(_tree_size(child) for child in (getattr(element, 'elements', None) or []))
@@ -1,25 +1,14 @@
-from pydoc import text
 import svg 
+from dataclasses import dataclass
 import logging
-from typing import Callable
+from typing import BinaryIO, Callable
 from textwrap import dedent
 from pathlib import Path
 import io
 
-try:
-    import cairosvg
-except OSError as e:
-    print(f"An OS error occurred during import: {e}")
-    # You can add specific handling logic here,
-    # such as providing a fallback or logging the error.
-except ImportError as e:
-    print(f"An import error occurred: {e}")
-    # Handle cases where the module simply isn't found
-except Exception as e:
-    print(f"An unexpected error occurred during import: {e}")
-    # Catch any other unforeseen exceptions
-    
-import base64
+from puncher import glyphs, profiling
+from puncher.codec import CardCodec
+from puncher.geometry import CardGeometry, CELL_ROWS, COLUMNS, HOLE_ROWS, cell_index, hole_index
 
 
 # https://homepage.divms.uiowa.edu/~jones/cards/codes.html
@@ -35,6 +24,51 @@ def escape(text: str) -> str:
     text = text.replace("<", "&lt;")
     return text
 
+# Serialized SVG text of the shared card-invariant layers, keyed by id() of the layer.
+# Entries are only made for layers held in PunchcardSVG._static_layers, which live for
+# the whole process, so the ids are never reused.
+_static_layer_text : dict[int, str] = {}
+
+@dataclass
+class _StaticG(svg.G):
+    """ svg.G for a card-invariant layer.  Every card shares the same instance, so the
+        serialized text is computed once and reused by every document that contains it.
+    """
+    def as_str(self) -> str:
+        text = _static_layer_text.get(id(self))
+        if text is None:
+            text = super().as_str()
+        return text
+
+@dataclass
+class _ColumnsG(svg.G):
+    """ svg.G of a card layer drawn column by column.  The serialized text of each column
+        is kept until the column is redrawn, so after an edit only the changed columns are
+        serialized again.  elements is kept as the columns' elements in order.
+    """
+    columns : list[list[svg.Element]] | None = None
+    column_text : list[str | None] | None = None
+
+    def set_columns(self, columns : list[list[svg.Element]]) -> None:
+        self.columns = columns
+        self.column_text = [ None ] * len(columns)
+        self.elements = [ element for column in columns for element in column ]
+
+    def redraw_columns(self, columns : dict[int, list[svg.Element]]) -> None:
+        """ Replace the elements of the columns in columns, column -> elements """
+        for column, elements in columns.items():
+            self.columns[column] = elements
+            self.column_text[column] = None
+        self.elements = [ element for column in self.columns for element in column ]
+
+    def as_str(self) -> str:
+        # svg.G with only an id, as svg.py writes it
+        for column, text in enumerate(self.column_text):
+            if text is None:
+                self.column_text[column] = "".join(self._as_str(element) for element in self.columns[column])
+        content = "".join(self.column_text)
+        return f'<g id="{self.id}">{content}</g>' if content else f'<g id="{self.id}"/>'
+
 class PunchcardSVG():
     # EIA RS-292 standard punchcard size
     CARD_DIM_WIDTH_IN = 7.0 + (3.0 / 8.0)
@@ -64,6 +98,10 @@ class PunchcardSVG():
     DPI_GUESS = 300
     STROKE_WEIGHT_1PT_IN = 1.0 / DPI_GUESS
 
+    # Decimal places written for lengths and coordinates by puncher.svgwriter: 0.0001 in,
+    # ten times finer than a cutter's 0.001 in, instead of every digit of 0.30450000000000005
+    COORDINATE_PRECISION = 4
+
     # Style information
     STROKE_COLOR_CUTLINES = "red"
     STROKE_COLOR_HOLE_BOUNDARIES = "grey"
@@ -74,6 +112,15 @@ class PunchcardSVG():
     CARD_PUNCH_HOLE_ROWHEIGHT_IN = 0.07
     CARD_PUNCH_HOLE_COLWIDTH_IN = 0.04
 
+    # Card outline, with the clipped top left corner, in card coordinates
+    CARD_BOUNDARY_POINTS = [
+        [ 0, CARD_INCHES_PER_LINE],
+        [ CARD_INCHES_PER_COLUMN, 0 ],
+        [ CARD_DIM_WIDTH_IN, 0],
+        [ CARD_DIM_WIDTH_IN, CARD_DIM_LENGTH_IN],
+        [ 0, CARD_DIM_LENGTH_IN],
+    ]
+
     EBCD_PUNCH_RULES = {
         ' ' : [],
         '&' : ['12'],
@@ -141,6 +188,53 @@ class PunchcardSVG():
         '?': ['0','7','8'],
     }
 
+    # Layers that do not depend on card_content, as attribute name -> builder method name.
+    # Each is built the first time any card in the process asks for it, then shared by every card.
+    STATIC_LAYER_BUILDERS = {
+        '_card_style' : '_define_card_style',
+        '_card_boundary_g' : '_draw_card_boundary',
+        '_card_character_cells_g' : '_draw_character_grid',
+        '_card_punch_boundaries_g' : '_draw_punchhole_boundaries',
+        '_card_row_number_labels' : '_draw_row_number_labels',
+        '_card_column_number_labels' : '_draw_column_number_labels',
+        # use_defs: one column of each grid as a template in <defs>, and the grid as
+        # a <use> of the template per column
+        '_card_cell_column_template' : '_define_cell_column_template',
+        '_card_hole_column_template' : '_define_hole_column_template',
+        '_card_row_label_column_template' : '_define_row_label_column_template',
+        '_card_character_cells_use_g' : '_draw_character_grid_instances',
+        '_card_punch_boundaries_use_g' : '_draw_punchhole_boundary_instances',
+        '_card_row_number_labels_use_g' : '_draw_row_number_label_instances',
+        # outline_text: the labels as glyph outlines, see puncher.glyphs
+        '_card_row_number_outlines' : '_draw_row_number_outlines',
+        '_card_column_number_outlines' : '_draw_column_number_outlines',
+        '_card_row_outline_column_template' : '_define_row_outline_column_template',
+    }
+    _static_layers : dict[str, svg.Element] = {}
+
+    # Layers that depend on card_content, built the first time the card asks for them
+    CARD_LAYER_BUILDERS = {
+        '_punched_holes_g' : '_draw_cardpunch_content_punches',
+        '_card_content_column_labels' : '_draw_cardpunch_content_labels',
+        '_card_manufacturer_label' : '_draw_manufacturer_labeltext',
+        '_card_content_column_outlines' : '_draw_cardpunch_content_outlines',
+        '_card_manufacturer_outline' : '_draw_manufacturer_outline',
+    }
+
+    # Row name -> index into CARD_HOLE_ROW_NUMBERING
+    CARD_HOLE_ROW_INDEX = { name : index for index, name in enumerate(CARD_HOLE_ROW_NUMBERING) }
+
+    # Character <-> 12-bit column hole mask tables compiled from EBCD_PUNCH_RULES
+    CODEC = CardCodec(EBCD_PUNCH_RULES, CARD_HOLE_ROW_NUMBERING)
+
+    # Every cell and hole position on the card, precomputed once as dense coordinate tables
+    GEOMETRY = CardGeometry(left_margin=CARD_LEFT_MARGIN_IN,
+                            top_margin=CARD_TOP_MARGIN_IN,
+                            inches_per_column=CARD_INCHES_PER_COLUMN,
+                            inches_per_line=CARD_INCHES_PER_LINE,
+                            hole_width=CARD_PUNCH_HOLE_COLWIDTH_IN,
+                            hole_height=CARD_PUNCH_HOLE_ROWHEIGHT_IN)
+
    
     def _character_cell_size(self) -> tuple[float, float]:
         cell_x_size = 1.0 / PunchcardSVG.CARD_COLUMNS_PER_INCH
@@ -148,22 +242,12 @@ class PunchcardSVG():
         return (cell_x_size, cell_y_size)
 
     def _character_cell_location(self, column: int, row: int) -> tuple[float, float]:
-        cell_x_location = PunchcardSVG.CARD_LEFT_MARGIN_IN + (column * PunchcardSVG.CARD_INCHES_PER_COLUMN)
-        cell_y_location = PunchcardSVG.CARD_TOP_MARGIN_IN + ((row + 1) * PunchcardSVG.CARD_INCHES_PER_LINE)
-        return (cell_x_location, cell_y_location)
+        cell = cell_index(row, column)
+        return (PunchcardSVG.GEOMETRY.cell_x[cell], PunchcardSVG.GEOMETRY.cell_y[cell])
 
     def _character_cell_center_location(self, column: int, row: int) -> tuple[float, float]:
-        cell_x_location, cell_y_location = self._character_cell_location(column, row)
-        return (cell_x_location + PunchcardSVG.CARD_INCHES_PER_COLUMN / 2.0, 
-                cell_y_location - PunchcardSVG.CARD_INCHES_PER_LINE / 2.0)
-
-    def _character_cell_location_for_punch(self, column : str, row : str) -> tuple[int, int]:
-        punch_column = PunchcardSVG.CARD_HOLE_COLUMN_NUMBERING.index(column)
-        punch_row = PunchcardSVG.CARD_HOLE_ROW_NUMBERING.index(row)
-        
-        punch_column_character_cell = punch_column
-        punch_row_character_cell = punch_row * 2 + 1
-        return (punch_column_character_cell, punch_row_character_cell)
+        cell = cell_index(row, column)
+        return (PunchcardSVG.GEOMETRY.cell_center_x[cell], PunchcardSVG.GEOMETRY.cell_center_y[cell])
 
     def _draw_character_cell_box(self, text_column, text_row, cell_bottomleftcorner_x, cell_bottomleftcorner_y) -> svg.Element:
         # Callable[[int, int, float, float], svg.Element]
@@ -185,14 +269,17 @@ class PunchcardSVG():
         """ Calls a function for each location in the element grid,
             passing in the row/column index and the x,y location of the character cell origin.
         """
+        geometry = PunchcardSVG.GEOMETRY
         elements : list[svg.Element] = []
-        for row in range(25):
-            for col in range(80):
-                (x, y) = self._character_cell_location(col, row)
-                element = drawfunc(text_column=col, text_row = row, cell_bottomleftcorner_x=x, cell_bottomleftcorner_y=y)
+        for row in range(CELL_ROWS):
+            for col in range(COLUMNS):
+                cell = cell_index(row, col)
+                element = drawfunc(text_column=col, text_row = row, 
+                                   cell_bottomleftcorner_x=geometry.cell_x[cell], 
+                                   cell_bottomleftcorner_y=geometry.cell_y[cell])
                 elements.append(element)
         logger.debug(f"Character grid has {len(elements)} elements")
-        return svg.G(elements=elements, 
+        return _StaticG(elements=elements, 
                     id=f"character_grid_{drawfunc.__name__}" 
                     # id=f"character_grid" 
                     )    
@@ -200,22 +287,16 @@ class PunchcardSVG():
         self._card_character_cells_g = self._draw_punchcard_character_grid(self._draw_character_cell_box)
         logger.debug(f"_draw_character_grid: _card_character_cells_g is a group with {len(self._card_character_cells_g.elements)}")
 
-    def _draw_cardpunch_hole_by_holecoord(self, 
-                                          hole_coord_x, 
-                                          hole_coord_y,
-                                          class_ : str | None = None, 
-                                          fill : str = "transparent", 
-                                          stroke : str | None = None) -> svg.Element:
-        # print(f" row {row} index {rindex}, col {col}, index {cindex}")
-        # we draw the cardpunch hole at the bottom left coordinate of the character cell
-        col_location, row_location = self._character_cell_location_for_punch(hole_coord_x, hole_coord_y)
-        
-        # This is the lower-left cell location
-        x_center, y_center = self._character_cell_center_location(col_location, row_location)
-        # print(f" row {row:3} ({rindex:3}), col {col:3} ({cindex:3}) origin=({x_location:3.2f},{y_location:3.2f})in")
+    def _draw_cardpunch_hole(self, 
+                             hole_x : float, 
+                             hole_y : float,
+                             class_ : str | None = None, 
+                             fill : str = "transparent", 
+                             stroke : str | None = None) -> svg.Element:
+        # hole_x, hole_y is the top left corner of the punch rectangle
         punch_rectangle = svg.Rect(
-                x=x_center - PunchcardSVG.CARD_PUNCH_HOLE_COLWIDTH_IN / 2.0, 
-                y=y_center - PunchcardSVG.CARD_PUNCH_HOLE_ROWHEIGHT_IN / 2.0,
+                x=hole_x, 
+                y=hole_y,
                 width=PunchcardSVG.CARD_PUNCH_HOLE_COLWIDTH_IN, 
                 height=PunchcardSVG.CARD_PUNCH_HOLE_ROWHEIGHT_IN,
                 rx=0, ry=0,
@@ -226,6 +307,18 @@ class PunchcardSVG():
             ) 
         return punch_rectangle
 
+    def _draw_cardpunch_hole_by_holecoord(self, 
+                                          row : int, 
+                                          column : int,
+                                          class_ : str | None = None, 
+                                          fill : str = "transparent", 
+                                          stroke : str | None = None) -> svg.Element:
+        # row is the index into CARD_HOLE_ROW_NUMBERING, column is 0-79
+        hole = hole_index(row, column)
+        return self._draw_cardpunch_hole(PunchcardSVG.GEOMETRY.hole_x[hole], 
+                                         PunchcardSVG.GEOMETRY.hole_y[hole],
+                                         class_=class_, fill=fill, stroke=stroke)
+
     def _define_card_style(self) -> svg.Style:
         # #996633; is IBM punchcard printed brown
         self._card_style = svg.Style(
@@ -243,15 +336,8 @@ class PunchcardSVG():
             )
 
     def _draw_card_boundary(self) -> svg.G:
-        box_points = [  
-            [ 0, PunchcardSVG.CARD_INCHES_PER_LINE],
-            [ PunchcardSVG.CARD_INCHES_PER_COLUMN, 0 ],
-            [ PunchcardSVG.CARD_DIM_WIDTH_IN, 0],
-            [ PunchcardSVG.CARD_DIM_WIDTH_IN, PunchcardSVG.CARD_DIM_LENGTH_IN],
-            [ 0, PunchcardSVG.CARD_DIM_LENGTH_IN],    
-        ]
-        box_points_string = [ f"{x}, {y} " for [x,y] in box_points ]
-        self._card_boundary_g = svg.G(id="cardpunch_boundary",                    
+        box_points_string = [ f"{x}, {y} " for [x,y] in PunchcardSVG.CARD_BOUNDARY_POINTS ]
+        self._card_boundary_g = _StaticG(id="cardpunch_boundary",                    
                     elements=[
                         svg.Polygon(stroke = PunchcardSVG.STROKE_COLOR_CUTLINES,
                                     stroke_width = PunchcardSVG.STROKE_WEIGHT_1PT_IN,
@@ -261,88 +347,162 @@ class PunchcardSVG():
     def _draw_punchhole_boundaries(self) -> None:
         """Placeholder for drawing punch-hole boundary guides."""
         card_holes : list[svg.Element] = []
-        for rindex, row in enumerate(PunchcardSVG.CARD_HOLE_ROW_NUMBERING):
-            for cindex, col in enumerate(PunchcardSVG.CARD_HOLE_COLUMN_NUMBERING):
-                # logger.debug(f"Drawing punchcard row={row} rindex={rindex} col={col}, colindex={cindex}")
-                card_holes.append(self._draw_cardpunch_hole_by_holecoord(col, row, class_="cardpunch_hole_boundary"))
+        for row in range(HOLE_ROWS):
+            for col in range(COLUMNS):
+                card_holes.append(self._draw_cardpunch_hole_by_holecoord(row, col, class_="cardpunch_hole_boundary"))
                 
-        self._card_punch_boundaries_g  = svg.G(id="cardpunch_hole_boundary", elements=card_holes) 
+        self._card_punch_boundaries_g  = _StaticG(id="cardpunch_hole_boundary", elements=card_holes) 
+
+    def _define_cell_column_template(self) -> None:
+        cells = []
+        for row in range(CELL_ROWS):
+            cell = self._draw_character_cell_box(0, row, 0.0, PunchcardSVG.GEOMETRY.cell_y[cell_index(row, 0)])
+            cell.id = None
+            cells.append(cell)
+        self._card_cell_column_template = _StaticG(id="cell_column", elements=cells)
+
+    def _define_hole_column_template(self) -> None:
+        holes = [ self._draw_cardpunch_hole(0.0, PunchcardSVG.GEOMETRY.hole_y[hole_index(row, 0)], class_="cardpunch_hole_boundary")
+                  for row in range(HOLE_ROWS) ]
+        self._card_hole_column_template = _StaticG(id="hole_column", elements=holes)
+
+    def _define_row_label_column_template(self) -> None:
+        labels = [ svg.Text(x=0.0, y=PunchcardSVG.GEOMETRY.hole_center_y[hole_index(row, 0)],
+                            text=PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row],
+                            class_="numlabel", text_anchor="middle", dominant_baseline="central")
+                   for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS) ]
+        self._card_row_label_column_template = _StaticG(id="row_label_column", elements=labels)
+
+    def _define_row_outline_column_template(self) -> None:
+        labels = [ (0.0, PunchcardSVG.GEOMETRY.hole_center_y[hole_index(row, 0)], PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row])
+                   for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS) ]
+        self._card_row_outline_column_template = _StaticG(id="row_label_column", elements=self._draw_label_outlines(labels, "numlabel"))
+
+    def _column_instances(self, template_id : str, column_x : list[float], id : str) -> _StaticG:
+        # The templates are drawn at x = 0, each column is a <use> moved to the column's x
+        return _StaticG(id=id, elements=[ svg.Use(href="#" + template_id, x=x) for x in column_x ])
+
+    def _draw_character_grid_instances(self) -> None:
+        column_x = [ PunchcardSVG.GEOMETRY.cell_x[cell_index(0, col)] for col in range(COLUMNS) ]
+        self._card_character_cells_use_g = self._column_instances("cell_column", column_x, "character_grid__draw_character_cell_box")
+
+    def _draw_punchhole_boundary_instances(self) -> None:
+        column_x = [ PunchcardSVG.GEOMETRY.hole_x[hole_index(0, col)] for col in range(COLUMNS) ]
+        self._card_punch_boundaries_use_g = self._column_instances("hole_column", column_x, "cardpunch_hole_boundary")
+
+    def _draw_row_number_label_instances(self) -> None:
+        column_x = [ PunchcardSVG.GEOMETRY.hole_center_x[hole_index(0, col)] for col in range(COLUMNS) ]
+        self._card_row_number_labels_use_g = self._column_instances("row_label_column", column_x, "row_number_labels")
 
     def _draw_punchcard_column_label(self, row : int, col : int) -> svg.Element:
         colnumber = col + 1
-        (x, y) = self._character_cell_location(col, row)
-        (x_center, y_center) = (x + PunchcardSVG.CARD_INCHES_PER_COLUMN / 2.0, y - PunchcardSVG.CARD_INCHES_PER_LINE / 2.0)
+        (x_center, y_center) = self._character_cell_center_location(col, row)
         return svg.Text(x=x_center, y=y_center, text=str(colnumber), class_="collabel",text_anchor="middle", dominant_baseline="central")
 
     def _draw_column_number_labels(self) -> None:
         """Placeholder for drawing column number labels."""
         elements : list[svg.Element] = []
         for row in [6, 24]:
-            for col in range(80):
+            for col in range(COLUMNS):
                 elements.append(self._draw_punchcard_column_label(row, col))
-        self._card_column_number_labels = svg.G(id="column_number_labels", elements=elements)
+        self._card_column_number_labels = _StaticG(id="column_number_labels", elements=elements)
 
-    def _draw_punchcard_row_label(self, row : str, col : int) -> svg.Element:
-        colnumber = col + 1
-        col_location, row_location = self._character_cell_location_for_punch(column=str(colnumber), row=row)
-        (x, y) = self._character_cell_location(col_location, row_location)
-        (x_center, y_center) = (x + PunchcardSVG.CARD_INCHES_PER_COLUMN / 2.0, y - PunchcardSVG.CARD_INCHES_PER_LINE / 2.0)
-        return svg.Text(x=x_center, y=y_center, text=str(row), class_="numlabel", text_anchor="middle", dominant_baseline="central")
+    def _draw_punchcard_row_label(self, row : int, col : int) -> svg.Element:
+        hole = hole_index(row, col)
+        (x_center, y_center) = (PunchcardSVG.GEOMETRY.hole_center_x[hole], PunchcardSVG.GEOMETRY.hole_center_y[hole])
+        text = PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row]
+        return svg.Text(x=x_center, y=y_center, text=text, class_="numlabel", text_anchor="middle", dominant_baseline="central")
 
     def _draw_row_number_labels(self) -> svg.G:
         """Placeholder for drawing row number labels."""
         elements : list[svg.Element] = []
-        for row in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9']:
-            for col in range(80):
+        # rows '0' through '9', the 12 and 11 rows are not labelled
+        for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS):
+            for col in range(COLUMNS):
                 elements.append(self._draw_punchcard_row_label(row, col))
-        self._card_row_number_labels = svg.G(id="row_number_labels", elements = elements)
+        self._card_row_number_labels = _StaticG(id="row_number_labels", elements = elements)
     
-    def _draw_cardpunch_printedlabel(self, character : str, columname : str) -> list[svg.Element]:
-    # elements : list[svg.Element] = []
-        col = PunchcardSVG.CARD_HOLE_COLUMN_NUMBERING.index(columname)
-        (x, y) = self._character_cell_location(col, 0)
-        (x_center, y_center) = (x + PunchcardSVG.CARD_INCHES_PER_COLUMN / 2.0, y - PunchcardSVG.CARD_INCHES_PER_LINE / 2.0)
+    def _draw_label_outlines(self, labels : list[tuple[float, float, str]], class_ : str, anchor : str = 'middle') -> list[svg.Element]:
+        """ labels, (x, y, text) each, as one path of glyph outlines (see puncher.glyphs) """
+        path_data = "".join(glyphs.label_path(x, y, text, class_, anchor) for (x, y, text) in labels)
+        return [ svg.Path(class_=class_, d=path_data) ] if path_data else []
+
+    def _draw_row_number_outlines(self) -> None:
+        labels = [ (PunchcardSVG.GEOMETRY.hole_center_x[hole_index(row, col)], PunchcardSVG.GEOMETRY.hole_center_y[hole_index(row, col)],
+                    PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row])
+                   for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS) for col in range(COLUMNS) ]
+        self._card_row_number_outlines = _StaticG(id="row_number_labels", elements=self._draw_label_outlines(labels, "numlabel"))
+
+    def _draw_column_number_outlines(self) -> None:
+        labels = [ (*self._character_cell_center_location(col, row), str(col + 1)) for row in [6, 24] for col in range(COLUMNS) ]
+        self._card_column_number_outlines = _StaticG(id="column_number_labels", elements=self._draw_label_outlines(labels, "collabel"))
+
+    def _draw_cardpunch_printedlabel(self, character : str, column : int) -> list[svg.Element]:
+        (x_center, y_center) = self._character_cell_center_location(column, 0)
         
         text = escape(character)
 
         # logger.debug(__name__ + f"character is {character} -> {text}")
         return [svg.Text(x=x_center, y=y_center, text=text, class_="cardchar",text_anchor="middle", dominant_baseline="central")]
     
-    def _draw_cardpunch_column_labels(self, character : str, columnname : str) -> list[svg.Element]:
+    def _draw_cardpunch_column_labels(self, character : str, column : int) -> list[svg.Element]:
         column_elements : list[svg.Element] = []
-        column_elements.append(self._draw_cardpunch_printedlabel(character=character,columname=columnname))
+        column_elements.append(self._draw_cardpunch_printedlabel(character=character,column=column))
         return column_elements
 
-    def _draw_cardpunch_printblock(self, rowname : str, columnname: str) -> list[svg.Element]:
-        return [self._draw_cardpunch_hole_by_holecoord(columnname, rowname, fill="blue", stroke="blue")]
-
-    def _draw_cardpunch_cutboundary(self, rowname : str, columnname: str) -> list[svg.Element]:
-        return [self._draw_cardpunch_hole_by_holecoord(columnname, rowname, class_="cardpunch_boundary", fill="transparent", stroke="blue")]
-
-
-    def _draw_cardpunch_column_punches(self, character : str, columnname : str) -> list[svg.Element]:
-        punch_rows = PunchcardSVG.EBCD_PUNCH_RULES.get(character, [])        
-        column_elements : list[svg.Element] = []
-
-        for rowname in punch_rows:
-            column_elements.extend(self._draw_cardpunch_cutboundary(rowname, columnname))
-            #column_elements.extend(self._draw_cardpunch_printblock(rowname, columnname))
-            
-        return column_elements
+    def _cardpunch_column_holes(self, mask : int, column : int) -> list[int]:
+        """ hole_index of each punch in column for the 12-bit hole mask """
+        return [ hole_index(row, column) for row in PunchcardSVG.CODEC.mask_rows[mask] ]
+
+    def _draw_cardpunch_punch_columns(self, columns : list[int]) -> list[list[svg.Element]]:
+        """ The hole elements of each of columns """
+        # Gather the corners of every hole in the columns at once, then draw them
+        holes : list[int] = []
+        ends : list[int] = []
+        for column in columns:
+            holes.extend(self._cardpunch_column_holes(self.card_codes[column], column))
+            ends.append(len(holes))
+        (holes_x, holes_y) = PunchcardSVG.GEOMETRY.hole_corners(holes)
+        card_holes = [ self._draw_cardpunch_hole(x, y, class_="cardpunch_boundary", fill="transparent", stroke="blue")
+                       for (x, y) in zip(holes_x, holes_y) ]
+        return [ card_holes[start:end] for (start, end) in zip([0] + ends, ends) ]
 
     def _draw_cardpunch_content_punches(self) -> None:
-        card_holes : list[svg.Element] = []
-        for index, col in enumerate(range(1,len(self.card_content)+1)):
-            elements = self._draw_cardpunch_column_punches(self.card_content[index], str(col))
-            card_holes.extend(elements)
-        self._punched_holes_g = svg.G(id="cardpunches", elements = card_holes) 
+        self._punched_holes_g = _ColumnsG(id="cardpunches")
+        self._punched_holes_g.set_columns(self._draw_cardpunch_punch_columns(list(range(COLUMNS))))
+
+    def _draw_cut_path(self, merge_punches : bool = False) -> svg.Path:
+        from puncher.cutpath import optimized_cut_plan
+
+        path_data : list[svg.PathData] = []
+        for outline in optimized_cut_plan(self, merge_punches=merge_punches).outlines:
+            path_data.append(svg.M(*outline[0]))
+            path_data.extend(svg.L(x, y) for (x, y) in outline[1:])
+            path_data.append(svg.Z())
+        return svg.Path(stroke=PunchcardSVG.STROKE_COLOR_CUTLINES,
+                        stroke_width=PunchcardSVG.STROKE_WEIGHT_1PT_IN,
+                        class_="cardpunch_boundary",
+                        id="cardcutpath",
+                        d=path_data,
+                        fill="transparent")
+
+    def _draw_cardpunch_label_column(self, column : int) -> list[svg.Element]:
+        if column >= len(self.card_content):
+            return []
+        return self._draw_cardpunch_column_labels(self.card_content[column], column)
 
     def _draw_cardpunch_content_labels(self) -> svg.G:
-        labels = [ ]
-        for index, col in enumerate(range(1,len(self.card_content)+1)):
-            elements = self._draw_cardpunch_column_labels(self.card_content[index], str(col))
-            labels.extend(elements)
-        self._card_content_column_labels =  svg.G(id="cardpunchlabels", elements = labels) 
+        self._card_content_column_labels = _ColumnsG(id="cardpunchlabels")
+        self._card_content_column_labels.set_columns([ self._draw_cardpunch_label_column(column) for column in range(COLUMNS) ])
+
+    def _draw_cardpunch_outline_column(self, column : int) -> list[svg.Element]:
+        if column >= len(self.card_content):
+            return []
+        return self._draw_label_outlines([ (*self._character_cell_center_location(column, 0), self.card_content[column]) ], "cardchar")
+
+    def _draw_cardpunch_content_outlines(self) -> None:
+        self._card_content_column_outlines = _ColumnsG(id="cardpunchlabels")
+        self._card_content_column_outlines.set_columns([ self._draw_cardpunch_outline_column(column) for column in range(COLUMNS) ])
 
     def _draw_manufacturer_labeltext(self) -> svg.G:
         x_start_baseline = PunchcardSVG.CARD_LEFT_MARGIN_IN
@@ -353,22 +513,37 @@ class PunchcardSVG():
                         class_="card_manufacturer_label")
         self._card_manufacturer_label = svg.G(elements = [text], id="card_manufacturer_label")
 
-    def _makesvg_content(self):
-        self._define_card_style()
-
-        # Cutlines - including the card boundary, plus any punched holes
-        self._draw_card_boundary()
-        self._draw_cardpunch_content_punches()
-    
-        # Card structure and notes (not printed by default)9
-        self._draw_character_grid()
-        self._draw_punchhole_boundaries()
+    def _draw_manufacturer_outline(self) -> None:
+        # with its runs of spaces collapsed, as SVG text is rendered
+        label = (PunchcardSVG.CARD_LEFT_MARGIN_IN, PunchcardSVG.CARD_DIM_LENGTH_IN - 0.03, " ".join(self.card_manufacturer_string.split()))
+        self._card_manufacturer_outline = svg.G(elements=self._draw_label_outlines([ label ], "card_manufacturer_label", anchor='start'),
+                                                id="card_manufacturer_label")
 
-        # Card printed Material
-        self._draw_row_number_labels()
-        self._draw_column_number_labels()
-        self._draw_cardpunch_content_labels()
-        self._draw_manufacturer_labeltext()
+    def _layer(self, attribute : str) -> svg.Element:
+        """ Return the layer stored in attribute, building it on first use.  Static layers
+            (and their serialized text) are built once per process and shared.
+        """
+        layer = getattr(self, attribute)
+        if layer is not None:
+            return layer
+
+        static_builder = PunchcardSVG.STATIC_LAYER_BUILDERS.get(attribute)
+        if static_builder is None:
+            builder = PunchcardSVG.CARD_LAYER_BUILDERS[attribute]
+            with profiling.timer(f"draw.{builder}"):
+                getattr(self, builder)()
+            return getattr(self, attribute)
+
+        layer = PunchcardSVG._static_layers.get(attribute)
+        if layer is None:
+            with profiling.timer(f"draw.{static_builder}"):
+                getattr(self, static_builder)()
+            layer = getattr(self, attribute)
+            _static_layer_text[id(layer)] = layer.as_str()
+            PunchcardSVG._static_layers[attribute] = layer
+            logger.debug(f"_layer: built static layer {attribute}")
+        setattr(self, attribute, layer)
+        return layer
 
     def __init__(self, 
                  card_content : str, 
@@ -376,7 +551,15 @@ class PunchcardSVG():
                  enable_document_margins : bool = True,
                  enable_punchhole_printed_cutlines : bool = False):
         
+        if len(card_content) > COLUMNS:
+            raise ValueError(f"card_content is {len(card_content)} columns long, a card holds {COLUMNS}")
         self.card_content = card_content
+        # 12-bit hole mask per column, unsupported characters are left blank
+        self.card_codes = PunchcardSVG.CODEC.encode(card_content)
+        # Bumped when a column's content changes, see set_content()
+        self._column_versions = [ 0 ] * COLUMNS
+        # Output kept by writers (svgwriter, flatten) with the _column_versions it was made from
+        self._column_outputs : dict = {}
         
         if card_manufacturer_string:
             self.card_manufacturer_string = card_manufacturer_string
@@ -397,14 +580,91 @@ class PunchcardSVG():
         self._card_column_number_labels : svg.G = None
         self._card_content_column_labels : svg.G = None
         self._card_manufacturer_label : svg.G = None
-        self._makesvg_content()
 
+        # Column templates and grids of <use> instances for use_defs
+        self._card_cell_column_template : svg.G = None
+        self._card_hole_column_template : svg.G = None
+        self._card_row_label_column_template : svg.G = None
+        self._card_character_cells_use_g : svg.G = None
+        self._card_punch_boundaries_use_g : svg.G = None
+        self._card_row_number_labels_use_g : svg.G = None
+
+        # Printed material as glyph outlines for outline_text
+        self._card_row_number_outlines : svg.G = None
+        self._card_column_number_outlines : svg.G = None
+        self._card_row_outline_column_template : svg.G = None
+        self._card_content_column_outlines : svg.G = None
+        self._card_manufacturer_outline : svg.G = None
+        # Layers are built on demand, see _layer()
+
+    @profiling.timed("set_content")
+    def set_content(self, card_content : str) -> list[int]:
+        """ Change the card's text in place, for an editor re-rendering as it is typed.
+            Only the punches and printed characters of the columns that changed are
+            redrawn: the layers already built, and the output kept by svgwriter and
+            flatten, are kept for every other column.  Returns the changed columns.
+        """
+        if len(card_content) > COLUMNS:
+            raise ValueError(f"card_content is {len(card_content)} columns long, a card holds {COLUMNS}")
+        previous = self.card_content
+        changed = [ column for column in range(max(len(previous), len(card_content)))
+                    if previous[column:column + 1] != card_content[column:column + 1] ]
+        if not changed:
+            return changed
+        self.card_content = card_content
+        self.card_codes = PunchcardSVG.CODEC.encode(card_content)
+        for column in changed:
+            self._column_versions[column] += 1
+
+        if self._punched_holes_g is not None:
+            self._punched_holes_g.redraw_columns(dict(zip(changed, self._draw_cardpunch_punch_columns(changed))))
+        if self._card_content_column_labels is not None:
+            self._card_content_column_labels.redraw_columns({ column : self._draw_cardpunch_label_column(column)
+                                                              for column in changed })
+        if self._card_content_column_outlines is not None:
+            self._card_content_column_outlines.redraw_columns({ column : self._draw_cardpunch_outline_column(column)
+                                                                for column in changed })
+        return changed
+
+    def set_column(self, column : int, character : str) -> None:
+        """ Punch and print character in column (from 0), padding the text with blanks up
+            to the column if it is shorter.  See set_content().
+        """
+        if not 0 <= column < COLUMNS:
+            raise ValueError(f"column {column} is off the card, columns are 0 to {COLUMNS - 1}")
+        if len(character) != 1:
+            raise ValueError(f"a column holds one character, not \"{character}\"")
+        content = self.card_content.ljust(column)
+        self.set_content(content[:column] + character + content[column + 1:])
+
+    @profiling.timed("makesvg")
     def makesvg(self, 
                 flatten_printed_material : bool = False,
                 print_cellboundaries : bool = False,
                 print_punchboundaries: bool = False,
-                print_punchboxes : bool = True ) -> svg.SVG:
+                print_punchboxes : bool = True,
+                optimize_cuts : bool = False,
+                merge_punches : bool = False,
+                use_defs : bool = False,
+                outline_text : bool = False ) -> svg.SVG:
         """ Build and SVG of the punchcard with options.
+
+            With optimize_cuts the cut lines are a single path in the order planned by
+            puncher.cutpath, and with merge_punches as well, holes in adjacent rows are
+            cut as one slot.
+
+            With use_defs the row number labels and the structure grids are drawn as one
+            column template each in <defs>, placed on every column with <use>, which
+            renders the same card from a much smaller document.  The cut lines are
+            always drawn inline, for cutter software that ignores <use>.
+
+            With outline_text the printed labels are paths, the glyph outlines of
+            puncher.glyphs, instead of text: no renderer has to find a font for them, and
+            the card looks the same everywhere.  Each label layer is one path per class
+            (and the card's characters one per column).
+
+            The card-invariant layers in the returned tree are shared with every other
+            card in the process and must not be modified.
         """
         logger.debug(f"Building a punchcard SVG with: "+
                      f"\n\tcard_content = \"{self.card_content}\""+
@@ -414,48 +674,29 @@ class PunchcardSVG():
         # We will construct the SVG in groups representing layers
 
         card_layers = []
-        card_layers.append(self._card_style)
+        card_layers.append(self._layer('_card_style'))
 
         document_transform = f"translate({PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN}, {PunchcardSVG.DOCUMENT_MARGIN_TOP_IN})"
 
         cut_lines_elements = []
-        cut_lines_elements.append(self._card_boundary_g)
-        cut_lines_elements.append(self._punched_holes_g)
+        if optimize_cuts:
+            with profiling.timer("draw._draw_cut_path"):
+                cut_lines_elements.append(self._draw_cut_path(merge_punches))
+        else:
+            cut_lines_elements.append(self._layer('_card_boundary_g'))
+            cut_lines_elements.append(self._layer('_punched_holes_g'))
         cut_lines_g = svg.G(id="card_cutlines",
                             transform=document_transform, 
                             elements=cut_lines_elements)
         
-        structure_elements = []
-        if print_cellboundaries: 
-            logger.debug(f"makesvg: including _card_character_cells_g is a group with {len(self._card_character_cells_g.elements)}")
-            structure_elements.append(self._card_character_cells_g)
-        if print_punchboundaries: structure_elements.append(self._card_punch_boundaries_g) 
-        
-        print_elements = []
-        print_elements.append(self._card_row_number_labels)
-        print_elements.append(self._card_column_number_labels)
-        print_elements.append(self._card_content_column_labels)
-        print_elements.append(self._card_manufacturer_label)
-
         if flatten_printed_material:
-            card_structure_and_notes_g : svg.G = svg.G(
-                id="punchcard_structure", 
-                elements=structure_elements)
-            
-            card_printed_material_g = svg.G( 
-                id="card_printed", 
-                elements=print_elements)
-                        
-            printsvg = svg.SVG(width=str(PunchcardSVG.CARD_DIM_WIDTH_IN) +"in", 
-                height=str(PunchcardSVG.CARD_DIM_LENGTH_IN) +"in",
-                elements=[self._card_style, card_printed_material_g,card_structure_and_notes_g],
-                viewBox=svg.ViewBoxSpec(0, 0, 
-                                        PunchcardSVG.CARD_DIM_WIDTH_IN, 
-                                        PunchcardSVG.CARD_DIM_LENGTH_IN))
-            svg_stream = io.StringIO(printsvg.as_str())
-            png_bytes = cairosvg.svg2png(file_obj=svg_stream, 
-                                        background_color="white",
-                                        scale = 5)
+            # The printed material and structure are rasterized from cached layers and glyphs
+            import base64
+            from puncher.flatten import printed_material_png
+            png_bytes = printed_material_png(self,
+                                             print_cellboundaries=print_cellboundaries,
+                                             print_punchboundaries=print_punchboundaries,
+                                             outline_text=outline_text)
             png_base64_bytes = base64.b64encode(png_bytes)
             png_base64_string = png_base64_bytes.decode('utf-8')
             flattened_image = svg.Image(
@@ -469,7 +710,39 @@ class PunchcardSVG():
                 id="card_printed_flattened", 
                 elements=[flattened_image])
             card_layers.append(flattened_g)
+            layers = [ flattened_g ]
         else:
+            templates = []
+            structure_elements = []
+            if print_cellboundaries and use_defs:
+                templates.append(self._layer('_card_cell_column_template'))
+                structure_elements.append(self._layer('_card_character_cells_use_g'))
+            elif print_cellboundaries: 
+                structure_elements.append(self._layer('_card_character_cells_g'))
+                logger.debug(f"makesvg: including _card_character_cells_g is a group with {len(self._card_character_cells_g.elements)}")
+            if print_punchboundaries and use_defs:
+                templates.append(self._layer('_card_hole_column_template'))
+                structure_elements.append(self._layer('_card_punch_boundaries_use_g'))
+            elif print_punchboundaries: structure_elements.append(self._layer('_card_punch_boundaries_g')) 
+            
+            print_elements = []
+            if use_defs:
+                templates.insert(0, self._layer('_card_row_outline_column_template' if outline_text else '_card_row_label_column_template'))
+                card_layers.append(svg.Defs(elements=templates))
+                print_elements.append(self._layer('_card_row_number_labels_use_g'))
+            elif outline_text:
+                print_elements.append(self._layer('_card_row_number_outlines'))
+            else:
+                print_elements.append(self._layer('_card_row_number_labels'))
+            if outline_text:
+                print_elements.append(self._layer('_card_column_number_outlines'))
+                print_elements.append(self._layer('_card_content_column_outlines'))
+                print_elements.append(self._layer('_card_manufacturer_outline'))
+            else:
+                print_elements.append(self._layer('_card_column_number_labels'))
+                print_elements.append(self._layer('_card_content_column_labels'))
+                print_elements.append(self._layer('_card_manufacturer_label'))
+
             card_structure_and_notes_g : svg.G = svg.G(
                 transform=document_transform, 
                 id="punchcard_structure", 
@@ -481,8 +754,12 @@ class PunchcardSVG():
 
             card_layers.append(card_printed_material_g)
             card_layers.append(card_structure_and_notes_g)
+            layers = print_elements + structure_elements
 
         card_layers.append(cut_lines_g)
+        if profiling.enabled():
+            for layer in layers + cut_lines_elements:
+                profiling.count_elements(layer)
 
         return svg.SVG(width=str(PunchcardSVG.DOCUMENT_WIDTH_IN) +"in", 
                       height=str(PunchcardSVG.DOCUMENT_HEIGHT_IN) +"in",
@@ -490,23 +767,132 @@ class PunchcardSVG():
                       viewBox=svg.ViewBoxSpec(0, 0, PunchcardSVG.DOCUMENT_WIDTH_IN, PunchcardSVG.DOCUMENT_HEIGHT_IN)
                       )
     
-def writesvg(svg_content : svg.SVG, path : Path, stem : str) -> None:
-    """ Write an svg.SVG to an svg file, at the path specified, 
-        with the name [stem].svg
+def writesvg(svg_content : svg.SVG | str, path : Path, stem : str) -> None:
+    """ Write an svg.SVG (or SVG text from puncher.svgwriter) to an svg file, 
+        at the path specified, with the name [stem].svg
     """
     svg_filename = path / (stem + ".svg")
     logger.info(f"writing to \"{svg_filename}\"")
 
+    with profiling.timer("serialize"):
+        svg_text = str(svg_content)
     with open(svg_filename, "w") as svg_file:
-        print(svg_content, file=svg_file)
-
-def writepng(svg_content : svg.SVG, path : Path, stem : str, dpi : float = 600):
-    """ Write an svg.SVG to a PNG file using cairosvg
+        print(svg_text, file=svg_file)
+    if profiling.enabled():
+        profiling.count("bytes.svg", len(svg_text.encode('utf-8')) + 1)
+
+def writesvgz(svg_content : svg.SVG | str, path : Path, stem : str, compresslevel : int = 6) -> None:
+    """ Write an svg.SVG (or SVG text from puncher.svgwriter) gzip compressed to an svgz
+        file, at the path specified, with the name [stem].svgz.  The file holds the same
+        text writesvg writes, and is the same bytes for the same document.
+    """
+    import gzip
+
+    svgz_filename = path / (stem + ".svgz")
+    logger.info(f"writing to \"{svgz_filename}\"")
+
+    with profiling.timer("serialize"):
+        svg_text = str(svg_content)
+    with open(svgz_filename, "wb") as svgz_file:
+        with gzip.GzipFile(fileobj=svgz_file, mode="wb", compresslevel=compresslevel, filename="", mtime=0) as compressed:
+            compressed.write((svg_text + "\n").encode('utf-8'))
+    if profiling.enabled():
+        profiling.count("bytes.svgz", svgz_filename.stat().st_size)
+
+def renderpng(svg_content : svg.SVG | str, dpi : float = 600, write_to : BinaryIO | str | None = None) -> bytes | None:
+    """ PNG of an svg.SVG (or SVG text from puncher.svgwriter) using cairosvg, at dpi
+        pixels per inch of the document.  Returned as bytes, or written to write_to, a
+        file name or binary file object.
+    """
+    from puncher.backends import cairosvg
+
+    with profiling.timer("serialize"):
+        svg_text = svg_content if isinstance(svg_content, str) else svg_content.as_str()
+    # The document is sized in inches, which cairosvg converts to pixels at dpi
+    with profiling.timer("cairosvg.svg2png"):
+        return cairosvg().svg2png(bytestring=svg_text.encode('utf-8'),
+                                write_to=write_to,
+                                background_color="white",
+                                dpi=dpi)
+
+def writepng(svg_content : svg.SVG | str, path : Path, stem : str, dpi : float = 600):
+    """ Write an svg.SVG (or SVG text from puncher.svgwriter) to a PNG file using cairosvg,
+        at dpi pixels per inch of the document
     """
     png_filename = path / (stem + ".png")
     logger.info(f"writing to \"{png_filename}\"")
-    svg_stream = io.StringIO(svg_content.as_str())
-    cairosvg.svg2png(file_obj=svg_stream, 
-                     write_to=str(png_filename),
-                     background_color="white",
-                     scale = 5)
\ No newline at end of file
+    renderpng(svg_content, dpi=dpi, write_to=str(png_filename))
+    if profiling.enabled():
+        profiling.count("bytes.png", png_filename.stat().st_size)
+
+OUTPUT_FORMATS = [ 'svg', 'svgz', 'png', 'pdf', 'dxf', 'hpgl' ]
+
+def render(card : "PunchcardSVG | str",
+           format : str = 'svg',
+           fp : BinaryIO | int | None = None,
+           dpi : float = 600,
+           png_backend : str = 'cairosvg',
+           **options) -> bytes | None:
+    """ Render card (a PunchcardSVG, or the text to punch) in format, one of OUTPUT_FORMATS,
+        as the same bytes writesvg, writesvgz, writepng or puncher.pdf.writepdf (with a
+        page) would write to a file, or the card's cut lines alone as DXF or HPGL (see
+        puncher.cutfile).  Returns them, or writes them to fp, a binary file object or an
+        open file descriptor, and returns None.  SVG and svgz are written to fp layer by
+        layer as they are emitted.
+        PNGs are drawn at dpi by png_backend, one of puncher.backends.PNG_BACKENDS.
+        options are those of puncher.svgwriter.dump.
+    """
+    from puncher import svgwriter
+
+    if format not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format \"{format}\", expected one of {', '.join(OUTPUT_FORMATS)}")
+    if isinstance(card, str):
+        card = PunchcardSVG(card)
+    if fp is None:
+        if format == 'svg':
+            return (svgwriter.dumps(card, **options) + "\n").encode('utf-8')
+        if format == 'png':
+            return _render_png(card, dpi, png_backend, None, options)
+        sink = io.BytesIO()
+        render(card, format, sink, **options)
+        return sink.getvalue()
+
+    # A descriptor is written through a buffer of our own, leaving it open for the caller
+    sink = open(fp, "wb", closefd=False) if isinstance(fp, int) else fp
+    try:
+        if format in ('svg', 'dxf', 'hpgl'):
+            text = io.TextIOWrapper(sink, encoding="utf-8")
+            try:
+                if format == 'svg':
+                    svgwriter.dump(card, text, **options)
+                    text.write("\n")
+                else:
+                    from puncher.cutfile import dump_cuts
+                    dump_cuts([card], text, format, **options)
+            finally:
+                # hand the stream back flushed, but not closed as the wrapper would close it
+                text.detach()
+        elif format == 'svgz':
+            svgwriter.dump_svgz(card, sink, **options)
+        elif format == 'pdf':
+            from puncher.pdf import dump_pdf
+            dump_pdf([card], sink, **options)
+        else:
+            _render_png(card, dpi, png_backend, sink, options)
+    finally:
+        if sink is not fp:
+            sink.close()
+    return None
+
+def _render_png(card : "PunchcardSVG", dpi : float, png_backend : str, fp : BinaryIO | None, options : dict) -> bytes | None:
+    """ PNG bytes of card, or None having written them to fp """
+    if png_backend == 'cairosvg':
+        from puncher import svgwriter
+        # cairosvg writes straight to fp
+        return renderpng(svgwriter.dumps(card, **options), dpi=dpi, write_to=fp)
+    from puncher.backends import png_renderer
+    png = png_renderer(png_backend)(card, dpi, **options)
+    if fp is None:
+        return png
+    fp.write(png)
+    return None
\ No newline at end of file
@@ -0,0 +1,270 @@
+""" Native PNG backend: draws a card straight into a NumPy pixel buffer.
+
+    A card is axis-aligned rectangles, one polygon and single centred glyphs, so it can
+    be rasterized at any resolution without building, parsing and rendering an SVG
+    document.  The card-invariant part of the picture (labels and the optional structure
+    layers) is drawn once per resolution and reused; per card only the printed
+    characters, from a cache of glyph bitmaps, and the cut lines are drawn, and the PNG is
+    encoded here with zlib.  cairosvg rendering of the SVG stays the reference backend;
+    this one matches its layout and colours but not its exact anti-aliasing or fonts.
+
+    Needs numpy (pip install puncher[native]).
+"""
+import logging
+import struct
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from puncher import profiling
+from puncher.geometry import CELL_ROWS, COLUMNS, HOLE_ROWS, cell_index, hole_index
+from puncher.glyphs import text_rects
+from puncher.puncher import PunchcardSVG
+
+logger = logging.getLogger("puncher")
+
+DEFAULT_DPI = 600
+
+# Colours of the card style (see PunchcardSVG._define_card_style), as RGB
+_WHITE = (255, 255, 255)
+_PRINTED_BROWN = (0x99, 0x66, 0x33)
+_CHARACTER_BLACK = (0, 0, 0)
+_MANUFACTURER_GREEN = (0, 128, 0)
+_CUTLINE_RED = (255, 0, 0)
+_BOUNDARY_GREY = (128, 128, 128)
+
+# Font sizes of the card style in inches: CSS em sizes of the 16px default font, in user units
+_NUMBER_LABEL_EM_IN = 0.007 * 16
+_COLUMN_LABEL_EM_IN = 0.004 * 16
+_MANUFACTURER_EM_IN = 0.004 * 16
+
+_MONOSPACE_FONTS = [ "DejaVuSansMono.ttf", "LiberationMono-Regular.ttf", "Menlo.ttc", "consola.ttf" ]
+_SANS_SERIF_FONTS = [ "DejaVuSans.ttf", "LiberationSans-Regular.ttf", "Helvetica.ttc", "arial.ttf" ]
+
+_GEOMETRY = PunchcardSVG.GEOMETRY
+
+
+@lru_cache(maxsize=16)
+def _font(monospace : bool, size_px : int):
+    """ First available system font of the family, or Pillow's built-in scalable font """
+    from PIL import ImageFont
+
+    for name in (_MONOSPACE_FONTS if monospace else _SANS_SERIF_FONTS):
+        try:
+            return ImageFont.truetype(name, size_px)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size_px)
+
+@lru_cache(maxsize=4096)
+def _text_bitmap(text : str, size_px : int, monospace : bool = True, anchor : str = "mm") -> tuple[np.ndarray, int, int]:
+    """ Coverage bitmap (0.0-1.0) of text, and the offset of its top left corner from
+        the anchor point ("mm" middle/central, "ls" left/baseline)
+    """
+    from PIL import Image, ImageDraw
+
+    font = _font(monospace, size_px)
+    (left, top, right, bottom) = font.getbbox(text, anchor=anchor)
+    image = Image.new("L", (max(right - left, 1), max(bottom - top, 1)), 0)
+    ImageDraw.Draw(image).text((-left, -top), text, fill=255, font=font, anchor=anchor)
+    return (np.asarray(image, dtype=np.float32) / 255.0, left, top)
+
+def _pixel_overlap(low : float, high : float, start : int, count : int) -> np.ndarray:
+    """ How much of each of count pixels from start the span low to high covers """
+    edges = np.arange(start, start + count + 1, dtype=np.float64)
+    return np.clip(np.minimum(edges[1:], high) - np.maximum(edges[:-1], low), 0.0, 1.0)
+
+@lru_cache(maxsize=4096)
+def _outline_bitmap(text : str, size_in : float, dpi : float, anchor : str = "mm") -> tuple[np.ndarray, int, int]:
+    """ Coverage bitmap of text drawn in the glyph outlines of puncher.glyphs, and the
+        offset of its top left corner from the anchor point, as _text_bitmap returns them
+    """
+    rects = [ (x * dpi, y * dpi, (x + width) * dpi, (y + height) * dpi)
+              for (x, y, width, height) in text_rects(text, size_in, 'middle' if anchor == "mm" else 'start') ]
+    if not rects:
+        return (np.zeros((1, 1), dtype=np.float32), 0, 0)
+    left = int(np.floor(min(rect[0] for rect in rects)))
+    top = int(np.floor(min(rect[1] for rect in rects)))
+    width = int(np.ceil(max(rect[2] for rect in rects))) - left
+    height = int(np.ceil(max(rect[3] for rect in rects))) - top
+    coverage = np.zeros((height, width), dtype=np.float64)
+    # the rectangles do not overlap, so their coverage adds up
+    for (x0, y0, x1, y1) in rects:
+        coverage += np.outer(_pixel_overlap(y0, y1, top, height), _pixel_overlap(x0, x1, left, width))
+    return (np.minimum(coverage, 1.0).astype(np.float32), left, top)
+
+
+class _Canvas():
+    """ RGB pixel buffer for one document, with drawing in card coordinates (inches) """
+    def __init__(self, pixels : np.ndarray, dpi : float):
+        self.pixels = pixels
+        self.dpi = dpi
+        self.origin_x = PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN * dpi
+        self.origin_y = PunchcardSVG.DOCUMENT_MARGIN_TOP_IN * dpi
+        self.stroke_px = max(1, round(PunchcardSVG.STROKE_WEIGHT_1PT_IN * dpi))
+
+    @classmethod
+    def blank(cls, dpi : float) -> "_Canvas":
+        width = round(PunchcardSVG.DOCUMENT_WIDTH_IN * dpi)
+        height = round(PunchcardSVG.DOCUMENT_HEIGHT_IN * dpi)
+        return cls(np.full((height, width, 3), _WHITE, dtype=np.uint8), dpi)
+
+    def to_px(self, x : float, y : float) -> tuple[float, float]:
+        return (self.origin_x + x * self.dpi, self.origin_y + y * self.dpi)
+
+    def _fill(self, x0 : int, y0 : int, x1 : int, y1 : int, color : tuple[int, int, int]) -> None:
+        (height, width, _) = self.pixels.shape
+        self.pixels[max(y0, 0):min(y1, height), max(x0, 0):min(x1, width)] = color
+
+    def _span(self, low : float, high : float) -> tuple[int, int]:
+        """ Pixel range covered by a stroke from low to high, at least stroke_px wide """
+        start = round(low - self.stroke_px / 2.0)
+        return (start, max(start + self.stroke_px, round(high + self.stroke_px / 2.0)))
+
+    def stroke_polygon(self, points : list[tuple[float, float]], color : tuple[int, int, int]) -> None:
+        """ Outline of the closed polygon through points """
+        pixels = [ self.to_px(x, y) for (x, y) in points ]
+        for ((x0, y0), (x1, y1)) in zip(pixels, pixels[1:] + pixels[:1]):
+            if round(x0) == round(x1) or round(y0) == round(y1):
+                (left, right) = self._span(min(x0, x1), max(x0, x1))
+                (top, bottom) = self._span(min(y0, y1), max(y0, y1))
+                self._fill(left, top, right, bottom, color)
+                continue
+            # Diagonal edge (the card's clipped corner): a square pen stepped along the line
+            steps = int(max(abs(x1 - x0), abs(y1 - y0))) + 1
+            for (x, y) in zip(np.linspace(x0, x1, steps), np.linspace(y0, y1, steps)):
+                (left, right) = self._span(x, x)
+                (top, bottom) = self._span(y, y)
+                self._fill(left, top, right, bottom, color)
+
+    def stroke_rect(self, x : float, y : float, width : float, height : float, color : tuple[int, int, int]) -> None:
+        self.stroke_polygon([ (x, y), (x + width, y), (x + width, y + height), (x, y + height) ], color)
+
+    def text(self, x : float, y : float, text : str, size_in : float, color : tuple[int, int, int],
+             monospace : bool = True, anchor : str = "mm", outline : bool = False) -> None:
+        if outline:
+            (coverage, left, top) = _outline_bitmap(text, size_in, self.dpi, anchor)
+        else:
+            (coverage, left, top) = _text_bitmap(text, max(1, round(size_in * self.dpi)), monospace, anchor)
+        (x_px, y_px) = self.to_px(x, y)
+        (x0, y0) = (round(x_px) + left, round(y_px) + top)
+        (height, width, _) = self.pixels.shape
+        (tile_height, tile_width) = coverage.shape
+
+        # Clip the bitmap to the buffer
+        (cx0, cy0) = (max(0, -x0), max(0, -y0))
+        (cx1, cy1) = (min(tile_width, width - x0), min(tile_height, height - y0))
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+        alpha = coverage[cy0:cy1, cx0:cx1, np.newaxis]
+        region = self.pixels[y0 + cy0:y0 + cy1, x0 + cx0:x0 + cx1]
+        region[:] = (region + (np.asarray(color, dtype=np.float32) - region) * alpha + 0.5).astype(np.uint8)
+
+
+@lru_cache(maxsize=8)
+def _background(dpi : float, card_manufacturer_string : str,
+                print_cellboundaries : bool, print_punchboundaries : bool, outline_text : bool = False) -> np.ndarray:
+    """ The card-invariant picture: labels and the optional structure layers """
+    canvas = _Canvas.blank(dpi)
+    for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS):
+        rowname = PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row]
+        for col in range(COLUMNS):
+            hole = hole_index(row, col)
+            canvas.text(_GEOMETRY.hole_center_x[hole], _GEOMETRY.hole_center_y[hole], rowname,
+                        _NUMBER_LABEL_EM_IN, _PRINTED_BROWN, outline=outline_text)
+    for row in [6, 24]:
+        for col in range(COLUMNS):
+            cell = cell_index(row, col)
+            canvas.text(_GEOMETRY.cell_center_x[cell], _GEOMETRY.cell_center_y[cell], str(col + 1),
+                        _COLUMN_LABEL_EM_IN, _PRINTED_BROWN, outline=outline_text)
+    if card_manufacturer_string:
+        # outlines with its runs of spaces collapsed, as SVG text is rendered
+        label = " ".join(card_manufacturer_string.split()) if outline_text else card_manufacturer_string
+        canvas.text(PunchcardSVG.CARD_LEFT_MARGIN_IN, PunchcardSVG.CARD_DIM_LENGTH_IN - 0.03, label,
+                    _MANUFACTURER_EM_IN, _MANUFACTURER_GREEN, monospace=False, anchor="ls", outline=outline_text)
+
+    if print_cellboundaries:
+        for cell in range(CELL_ROWS * COLUMNS):
+            canvas.stroke_rect(_GEOMETRY.cell_x[cell], _GEOMETRY.cell_y[cell] - _GEOMETRY.cell_height,
+                               _GEOMETRY.cell_width, _GEOMETRY.cell_height, _BOUNDARY_GREY)
+    if print_punchboundaries:
+        for (x, y) in zip(_GEOMETRY.hole_x, _GEOMETRY.hole_y):
+            canvas.stroke_rect(x, y, _GEOMETRY.hole_width, _GEOMETRY.hole_height, _BOUNDARY_GREY)
+    logger.debug(f"_background: drew card background at {dpi} dpi")
+    return canvas.pixels
+
+
+@profiling.timed("raster.render")
+def render(card : PunchcardSVG,
+           dpi : float = DEFAULT_DPI,
+           flatten_printed_material : bool = False,
+           print_cellboundaries : bool = False,
+           print_punchboundaries : bool = False,
+           print_punchboxes : bool = True,
+           optimize_cuts : bool = False,
+           merge_punches : bool = False,
+           use_defs : bool = False,
+           outline_text : bool = False,
+           precision : int | None = None) -> np.ndarray:
+    """ The card's document as a height x width x 3 uint8 RGB array at dpi.  Takes the
+        svgwriter.dump options; flatten_printed_material, use_defs and precision make no
+        difference to a raster.  With outline_text the labels are drawn from the glyph
+        outlines of puncher.glyphs instead of a system font.
+    """
+    from puncher.cutpath import document_cut_plan, optimized_cut_plan
+
+    background = _background(dpi, card.card_manufacturer_string, print_cellboundaries, print_punchboundaries, outline_text)
+    canvas = _Canvas(background.copy(), dpi)
+    for column, character in enumerate(card.card_content):
+        if not character.isspace():
+            cell = cell_index(0, column)
+            canvas.text(_GEOMETRY.cell_center_x[cell], _GEOMETRY.cell_center_y[cell], character,
+                        _NUMBER_LABEL_EM_IN, _CHARACTER_BLACK, outline=outline_text)
+
+    # Every cut line takes the cardpunch_boundary style, so all of them are red
+    if optimize_cuts or merge_punches:
+        plan = optimized_cut_plan(card, merge_punches=merge_punches)
+    else:
+        plan = document_cut_plan(card)
+    for outline in plan.outlines:
+        canvas.stroke_polygon(outline, _CUTLINE_RED)
+    return canvas.pixels
+
+def _chunk(kind : bytes, data : bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+@profiling.timed("raster.encode_png")
+def encode_png(pixels : np.ndarray, dpi : float | None = None, level : int = 6) -> bytes:
+    """ PNG file for a height x width x 3 uint8 RGB array, recording dpi if given.
+        Each row uses the Sub filter, which suits the card's large flat areas.
+    """
+    (height, width, _) = pixels.shape
+    rows = pixels.reshape(height, width * 3)
+    filtered = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:4] = rows[:, :3]
+    np.subtract(rows[:, 3:], rows[:, :-3], out=filtered[:, 4:])
+
+    png = [ b"\x89PNG\r\n\x1a\n",
+            _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) ]
+    if dpi:
+        pixels_per_metre = round(dpi / 0.0254)
+        png.append(_chunk(b"pHYs", struct.pack(">IIB", pixels_per_metre, pixels_per_metre, 1)))
+    png.append(_chunk(b"IDAT", zlib.compress(filtered.tobytes(), level)))
+    png.append(_chunk(b"IEND", b""))
+    return b"".join(png)
+
+def png_bytes(card : PunchcardSVG, dpi : float = DEFAULT_DPI, **options) -> bytes:
+    """ PNG of the card at dpi, see render() for the options """
+    return encode_png(render(card, dpi, **options), dpi)
+
+def writepng(card : PunchcardSVG, path : Path, stem : str, dpi : float = DEFAULT_DPI, **options) -> None:
+    """ Write the card to path / [stem].png with the native backend """
+    png_filename = path / (stem + ".png")
+    logger.info(f"writing to \"{png_filename}\"")
+    data = png_bytes(card, dpi, **options)
+    with open(png_filename, "wb") as png_file:
+        png_file.write(data)
+    profiling.count("bytes.png", len(data))
@@ -0,0 +1,217 @@
+""" Render daemon: `puncher serve` answers render requests over loopback HTTP or a Unix
+    socket, so the interpreter start, imports and template build are paid once instead
+    of per card.
+
+    Requests are rendered by a pool of worker processes, each with the card template,
+    glyph caches and cairosvg loaded once at start.
+
+      POST /render   JSON body, all keys but "text" optional:
+                       { "text": "HELLO", "form": "svg" | "svgz" | "png" | "pdf" | "dxf" | "hpgl", "dpi": 600,
+                         "png_backend": "cairosvg" | "native",
+                         "options": { <PunchcardSVG.makesvg options> } }
+                     -> the SVG or PNG bytes, a 400 with a plain text reason, or a 503 if
+                        the PNG backend cannot be loaded
+      GET /health    -> "ok"
+"""
+import ipaddress
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from puncher.backends import PNG_BACKENDS, BackendUnavailableError
+from puncher.batch import render_card_bytes
+
+logger = logging.getLogger("puncher")
+
+DEFAULT_PORT = 8080
+
+# Largest request body accepted, a card's text is 80 characters
+MAX_REQUEST_BYTES = 64 * 1024
+
+# makesvg options a request may set
+MAKESVG_OPTIONS = [ 'flatten_printed_material', 'print_cellboundaries', 'print_punchboundaries',
+                    'print_punchboxes', 'optimize_cuts', 'merge_punches', 'use_defs', 'outline_text' ]
+
+CONTENT_TYPES = { 'svg' : "image/svg+xml", 'svgz' : "image/svg+xml", 'png' : "image/png",
+                  'pdf' : "application/pdf", 'dxf' : "image/vnd.dxf", 'hpgl' : "application/vnd.hp-hpgl" }
+
+# Forms sent gzip compressed, with a Content-Encoding
+CONTENT_ENCODINGS = { 'svgz' : "gzip" }
+
+
+def _worker_init() -> None:
+    """ Build the card template and load the PNG backends once per worker """
+    from puncher.backends import png_renderer
+    from puncher.batch import _worker_init as warm_template
+    # The server's SIGTERM handler is inherited on fork, the pool shuts the workers down
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    warm_template(('svg',), {})
+    for backend in PNG_BACKENDS:
+        try:
+            png_renderer(backend)
+        except BackendUnavailableError as e:
+            logger.info(f"serve: the {backend} PNG backend is disabled: {e}")
+    try:
+        from puncher.puncher import PunchcardSVG
+        from puncher import raster
+        raster.render(PunchcardSVG(""), dpi=96)
+    except ImportError:
+        pass        # reported above
+
+def parse_request(body : bytes) -> dict:
+    """ Keyword arguments for render_card_bytes from a JSON request body, raising
+        ValueError for anything malformed
+    """
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"request is not JSON: {e}") from None
+    if not isinstance(request, dict) or not isinstance(request.get("text"), str):
+        raise ValueError("request must be a JSON object with a \"text\" string")
+
+    unknown = set(request) - { "text", "form", "dpi", "png_backend", "options" }
+    if unknown:
+        raise ValueError(f"unknown request keys: {', '.join(sorted(unknown))}")
+    form = request.get("form", "svg")
+    if form not in CONTENT_TYPES:
+        raise ValueError(f"form must be one of {', '.join(CONTENT_TYPES)}")
+    png_backend = request.get("png_backend", "cairosvg")
+    if png_backend not in PNG_BACKENDS:
+        raise ValueError(f"png_backend must be one of {', '.join(PNG_BACKENDS)}")
+    dpi = request.get("dpi", 600)
+    if isinstance(dpi, bool) or not isinstance(dpi, (int, float)) or not 1 <= dpi <= 2400:
+        raise ValueError("dpi must be a number from 1 to 2400")
+
+    options = request.get("options", {})
+    if not isinstance(options, dict):
+        raise ValueError("options must be a JSON object")
+    for name, value in options.items():
+        if name not in MAKESVG_OPTIONS:
+            raise ValueError(f"unknown option \"{name}\", expected one of {', '.join(MAKESVG_OPTIONS)}")
+        if not isinstance(value, bool):
+            raise ValueError(f"option \"{name}\" must be true or false")
+    return dict(options, content=request["text"], form=form, png_backend=png_backend, dpi=dpi)
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    server_version = "puncher"
+
+    def _reply(self, status : HTTPStatus, body : bytes, content_type : str = "text/plain; charset=utf-8",
+               content_encoding : str | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if content_encoding:
+            self.send_header("Content-Encoding", content_encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(HTTPStatus.OK, b"ok\n")
+        else:
+            self._reply(HTTPStatus.NOT_FOUND, b"not found\n")
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._reply(HTTPStatus.NOT_FOUND, b"not found\n")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._reply(HTTPStatus.LENGTH_REQUIRED, b"Content-Length required\n")
+            return
+        if length > MAX_REQUEST_BYTES:
+            self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, b"request too large\n")
+            return
+
+        try:
+            request = parse_request(self.rfile.read(length))
+            body = self.server.executor.submit(render_card_bytes, **request).result()
+        except ValueError as e:
+            self._reply(HTTPStatus.BAD_REQUEST, f"{e}\n".encode('utf-8'))
+            return
+        except BackendUnavailableError as e:
+            logger.warning(f"serve: {e}")
+            self._reply(HTTPStatus.SERVICE_UNAVAILABLE, f"{e}\n".encode('utf-8'))
+            return
+        except Exception as e:
+            logger.warning("serve: render failed", exc_info=True)
+            self._reply(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}\n".encode('utf-8'))
+            return
+        self._reply(HTTPStatus.OK, body, CONTENT_TYPES[request["form"]], CONTENT_ENCODINGS.get(request["form"]))
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format : str, *args) -> None:
+        logger.info(f"serve: {self.address_string()} {format % args}")
+
+
+class _HTTPServerIPv6(ThreadingHTTPServer):
+    address_family = socket.AF_INET6
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _check_loopback(host : str) -> None:
+    try:
+        addresses = { info[4][0] for info in socket.getaddrinfo(host, None) }
+    except socket.gaierror as e:
+        raise ValueError(f"cannot resolve host \"{host}\": {e}") from None
+    if not all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses):
+        raise ValueError(f"host \"{host}\" is not a loopback address, puncher serve only listens locally")
+
+def make_server(host : str = "127.0.0.1",
+                port : int = DEFAULT_PORT,
+                unix_socket : str | None = None,
+                jobs : int = 0) -> socketserver.BaseServer:
+    """ A render server on loopback host:port, or on the Unix socket path unix_socket,
+        with a pool of jobs worker processes (0 for one per CPU).  Call serve_forever()
+        to run it and server_close() when done.
+    """
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            if not stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                raise ValueError(f"\"{unix_socket}\" exists and is not a socket")
+            os.unlink(unix_socket)      # left behind by an earlier server
+        server = _UnixHTTPServer(unix_socket, _RenderHandler)
+    else:
+        _check_loopback(host)
+        if socket.getaddrinfo(host, port)[0][0] == socket.AF_INET6:
+            server = _HTTPServerIPv6((host, port), _RenderHandler)
+        else:
+            server = ThreadingHTTPServer((host, port), _RenderHandler)
+    server.executor = ProcessPoolExecutor(max_workers=jobs if jobs > 0 else os.cpu_count(),
+                                          initializer=_worker_init)
+    return server
+
+def _terminate(signum, frame) -> None:
+    # Shut down on SIGTERM as on Ctrl-C, removing the Unix socket
+    raise KeyboardInterrupt
+
+def serve(host : str = "127.0.0.1",
+          port : int = DEFAULT_PORT,
+          unix_socket : str | None = None,
+          jobs : int = 0) -> None:
+    """ Run a render server until interrupted """
+    server = make_server(host, port, unix_socket, jobs)
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown(cancel_futures=True)
+        if unix_socket and os.path.exists(unix_socket):
+            os.unlink(unix_socket)
@@ -0,0 +1,469 @@
+""" Direct SVG writer for punchcards.
+
+    Writes the same document as str(PunchcardSVG.makesvg(...)), element for element,
+    straight to a text stream.  Each layer, rect and text element has its own emitter,
+    so no svg.py objects are built or serialized per card.
+
+    Numbers are written rounded to a number of decimal places, PunchcardSVG.COORDINATE_PRECISION
+    by default; with precision=None they are written in full, as makesvg writes them.
+"""
+import base64
+import gzip
+import io
+import logging
+import re
+from functools import lru_cache
+from typing import BinaryIO, Callable, TextIO
+
+from puncher import glyphs, profiling
+from puncher.geometry import CELL_ROWS, COLUMNS, HOLE_ROWS, cell_index, hole_index
+from puncher.puncher import PunchcardSVG, escape
+
+logger = logging.getLogger("puncher")
+
+_STROKE_WIDTH = str(PunchcardSVG.STROKE_WEIGHT_1PT_IN)
+_DOCUMENT_TRANSFORM = f"translate({PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN}, {PunchcardSVG.DOCUMENT_MARGIN_TOP_IN})"
+_XMLNS = "http://www.w3.org/2000/svg"
+_GEOMETRY = PunchcardSVG.GEOMETRY
+
+# Emitted text of the card-invariant layers, built on first use, keyed by layer name and precision
+_static_text : dict[tuple[str, int | None], str] = {}
+
+# Fewest decimal places numbers may be rounded to: below this the 1pt stroke width
+# (0.0033 in) rounds to 0
+MIN_PRECISION = 3
+
+# Layers written as they are at every precision: the style's CSS lengths are em font
+# sizes as small as 0.004em, not coordinates
+_UNROUNDED_LAYERS = { 'style' }
+
+# gzip level for .svgz: level 9 is about 2% smaller and takes 60% longer
+SVGZ_COMPRESSLEVEL = 6
+
+_DECIMAL = re.compile(r"\d+\.\d+")
+
+
+class _Numbers():
+    """ Numbers as written at one precision: the geometry tables and constant lengths are
+        rounded once, num() rounds anything computed per card
+    """
+    def __init__(self, precision : int | None):
+        if precision is not None and precision < MIN_PRECISION:
+            raise ValueError(f"precision {precision} is too coarse, numbers need at least {MIN_PRECISION} decimal places")
+        self.precision = precision
+        self.geometry = _GEOMETRY if precision is None else _GEOMETRY.rounded(precision)
+        self.stroke_width = self.num(PunchcardSVG.STROKE_WEIGHT_1PT_IN)
+        self.hole_width = self.num(PunchcardSVG.CARD_PUNCH_HOLE_COLWIDTH_IN)
+        self.hole_height = self.num(PunchcardSVG.CARD_PUNCH_HOLE_ROWHEIGHT_IN)
+
+    def num(self, x : float) -> str:
+        return str(x) if self.precision is None else repr(round(x, self.precision))
+
+    def round_text(self, text : str) -> str:
+        """ text with every decimal number in it rounded """
+        if self.precision is None:
+            return text
+        return _DECIMAL.sub(lambda match: self.num(float(match.group())), text)
+
+@lru_cache(maxsize=None)
+def _numbers(precision : int | None) -> _Numbers:
+    return _Numbers(precision)
+
+_FULL = _numbers(None)
+
+
+def _group_attributes(id : str, transform : str | None) -> str:
+    attributes = f' id="{id}"'
+    if transform is not None:
+        attributes += f' transform="{transform}"'
+    return attributes
+
+def _group(parts : list[str], id : str, transform : str | None = None) -> str:
+    attributes = _group_attributes(id, transform)
+    content = "".join(parts)
+    if content:
+        return f"<g{attributes}>{content}</g>"
+    return f"<g{attributes}/>"
+
+def _defs(parts : list[str]) -> str:
+    return "<defs>" + "".join(parts) + "</defs>"
+
+def _svg_open(width : float, height : float) -> str:
+    return f'<svg xmlns="{_XMLNS}" viewBox="0 0 {width} {height}" width="{width}in" height="{height}in">'
+
+def _hole_rect(x : float, y : float, class_ : str, fill : str, stroke : str | None = None, numbers : _Numbers = _FULL) -> str:
+    """ Emitter for PunchcardSVG._draw_cardpunch_hole, x and y already rounded """
+    stroke_attribute = f'stroke="{stroke}" ' if stroke is not None else ""
+    return (f'<rect {stroke_attribute}stroke-width="{numbers.stroke_width}" class="{class_}" '
+            f'x="{x}" y="{y}" width="{numbers.hole_width}" '
+            f'height="{numbers.hole_height}" rx="0" ry="0" fill="{fill}"/>')
+
+def _centered_text(x : float, y : float, text : str, class_ : str) -> str:
+    """ Emitter for the middle/central anchored svg.Text labels """
+    attributes = f'dominant-baseline="central" text-anchor="middle" class="{class_}" x="{x}" y="{y}"'
+    if text:
+        return f"<text {attributes}>{text}</text>"
+    return f"<text {attributes}/>"
+
+def _outlined_labels(labels : list[tuple[float | str, float | str, str]], class_ : str, anchor : str = 'middle') -> str:
+    """ Emitter for PunchcardSVG._draw_label_outlines """
+    path_data = "".join(glyphs.label_path(x, y, text, class_, anchor) for (x, y, text) in labels)
+    return f'<path class="{class_}" d="{path_data}"/>' if path_data else ""
+
+def _cell_center(column : int, row : int, numbers : _Numbers = _FULL) -> tuple[float, float]:
+    cell = cell_index(row, column)
+    return (numbers.geometry.cell_center_x[cell], numbers.geometry.cell_center_y[cell])
+
+
+def _style_layer(card : PunchcardSVG) -> str:
+    return f"<style>{card._layer('_card_style').text}</style>"
+
+def _card_boundary_layer(card : PunchcardSVG, suffix : str = "", numbers : _Numbers = _FULL) -> str:
+    points = " ".join(f"{numbers.num(x)}, {numbers.num(y)} " for [x, y] in PunchcardSVG.CARD_BOUNDARY_POINTS)
+    polygon = (f'<polygon stroke="{PunchcardSVG.STROKE_COLOR_CUTLINES}" stroke-width="{numbers.stroke_width}" '
+               f'class="cardpunch_boundary" points="{points}"/>')
+    return _group([polygon], id="cardpunch_boundary" + suffix)
+
+def _cell_box(card : PunchcardSVG, x : float, bottom_y : float, id : str | None) -> str:
+    """ Emitter for PunchcardSVG._draw_character_cell_box """
+    (cell_width, cell_height) = card._character_cell_size()
+    id_attribute = f'id="{id}" ' if id is not None else ""
+    return (f'<rect stroke="grey" stroke-dasharray="3 1" stroke-width="{_STROKE_WIDTH}" '
+            f'{id_attribute}x="{x}" y="{bottom_y - cell_height}" '
+            f'width="{cell_width}" height="{cell_height}" rx="0" ry="0" fill="transparent"/>')
+
+def _character_grid_layer(card : PunchcardSVG) -> str:
+    parts : list[str] = []
+    for row in range(CELL_ROWS):
+        for col in range(COLUMNS):
+            cell = cell_index(row, col)
+            parts.append(_cell_box(card, _GEOMETRY.cell_x[cell], _GEOMETRY.cell_y[cell], id=f"cell_box_{col}_{row}"))
+    return _group(parts, id="character_grid__draw_character_cell_box")
+
+def _punchhole_boundaries_layer(card : PunchcardSVG) -> str:
+    parts = [ _hole_rect(x, y, class_="cardpunch_hole_boundary", fill="transparent")
+              for (x, y) in zip(_GEOMETRY.hole_x, _GEOMETRY.hole_y) ]
+    return _group(parts, id="cardpunch_hole_boundary")
+
+def _row_number_labels_layer(card : PunchcardSVG) -> str:
+    parts : list[str] = []
+    for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS):
+        rowname = PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row]
+        for col in range(COLUMNS):
+            hole = hole_index(row, col)
+            parts.append(_centered_text(_GEOMETRY.hole_center_x[hole], _GEOMETRY.hole_center_y[hole], rowname, "numlabel"))
+    return _group(parts, id="row_number_labels")
+
+def _column_number_labels_layer(card : PunchcardSVG) -> str:
+    parts = [ _centered_text(*_cell_center(col, row), str(col + 1), "collabel")
+              for row in [6, 24] for col in range(COLUMNS) ]
+    return _group(parts, id="column_number_labels")
+
+def _row_number_outlines_layer(card : PunchcardSVG) -> str:
+    labels = [ (_GEOMETRY.hole_center_x[hole_index(row, col)], _GEOMETRY.hole_center_y[hole_index(row, col)],
+                PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row])
+               for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS) for col in range(COLUMNS) ]
+    return _group([ _outlined_labels(labels, "numlabel") ], id="row_number_labels")
+
+def _column_number_outlines_layer(card : PunchcardSVG) -> str:
+    labels = [ (*_cell_center(col, row), str(col + 1)) for row in [6, 24] for col in range(COLUMNS) ]
+    return _group([ _outlined_labels(labels, "collabel") ], id="column_number_labels")
+
+def _cell_column_template(card : PunchcardSVG) -> str:
+    parts = [ _cell_box(card, 0.0, _GEOMETRY.cell_y[cell_index(row, 0)], id=None) for row in range(CELL_ROWS) ]
+    return _group(parts, id="cell_column")
+
+def _hole_column_template(card : PunchcardSVG) -> str:
+    parts = [ _hole_rect(0.0, _GEOMETRY.hole_y[hole_index(row, 0)], class_="cardpunch_hole_boundary", fill="transparent")
+              for row in range(HOLE_ROWS) ]
+    return _group(parts, id="hole_column")
+
+def _row_label_column_template(card : PunchcardSVG) -> str:
+    parts = [ _centered_text(0.0, _GEOMETRY.hole_center_y[hole_index(row, 0)], PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row], "numlabel")
+              for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS) ]
+    return _group(parts, id="row_label_column")
+
+def _row_outline_column_template(card : PunchcardSVG) -> str:
+    labels = [ (0.0, _GEOMETRY.hole_center_y[hole_index(row, 0)], PunchcardSVG.CARD_HOLE_ROW_NUMBERING[row])
+               for row in range(PunchcardSVG.CARD_HOLE_ROW_INDEX['0'], HOLE_ROWS) ]
+    return _group([ _outlined_labels(labels, "numlabel") ], id="row_label_column")
+
+def _column_instances(template_id : str, column_x : list[float], id : str) -> str:
+    """ Emitter for PunchcardSVG._column_instances """
+    return _group([ f'<use href="#{template_id}" x="{x}"/>' for x in column_x ], id=id)
+
+def _character_grid_instances(card : PunchcardSVG) -> str:
+    return _column_instances("cell_column", [ _GEOMETRY.cell_x[cell_index(0, col)] for col in range(COLUMNS) ],
+                             id="character_grid__draw_character_cell_box")
+
+def _punchhole_boundary_instances(card : PunchcardSVG) -> str:
+    return _column_instances("hole_column", [ _GEOMETRY.hole_x[hole_index(0, col)] for col in range(COLUMNS) ],
+                             id="cardpunch_hole_boundary")
+
+def _row_number_label_instances(card : PunchcardSVG) -> str:
+    return _column_instances("row_label_column", [ _GEOMETRY.hole_center_x[hole_index(0, col)] for col in range(COLUMNS) ],
+                             id="row_number_labels")
+
+_STATIC_LAYER_EMITTERS = {
+    'style' : _style_layer,
+    'card_boundary' : _card_boundary_layer,
+    'character_grid' : _character_grid_layer,
+    'punchhole_boundaries' : _punchhole_boundaries_layer,
+    'row_number_labels' : _row_number_labels_layer,
+    'column_number_labels' : _column_number_labels_layer,
+    # use_defs: column templates, and the layers drawn as <use> instances of them
+    'cell_column' : _cell_column_template,
+    'hole_column' : _hole_column_template,
+    'row_label_column' : _row_label_column_template,
+    'character_grid_instances' : _character_grid_instances,
+    'punchhole_boundary_instances' : _punchhole_boundary_instances,
+    'row_number_label_instances' : _row_number_label_instances,
+    # outline_text: the label layers as glyph outlines
+    'row_number_outlines' : _row_number_outlines_layer,
+    'column_number_outlines' : _column_number_outlines_layer,
+    'row_outline_column' : _row_outline_column_template,
+}
+
+# Static layer -> (column template, layer drawn with <use>) for use_defs
+_INSTANCED_LAYERS = {
+    'row_number_labels' : ('row_label_column', 'row_number_label_instances'),
+    'character_grid' : ('cell_column', 'character_grid_instances'),
+    'punchhole_boundaries' : ('hole_column', 'punchhole_boundary_instances'),
+}
+
+# Static label layer -> the layer drawing it in glyph outlines, for outline_text
+_OUTLINED_LAYERS = {
+    'row_number_labels' : 'row_number_outlines',
+    'column_number_labels' : 'column_number_outlines',
+    'row_label_column' : 'row_outline_column',
+}
+
+def _label_layer_name(name : str, outline_text : bool) -> str:
+    return _OUTLINED_LAYERS.get(name, name) if outline_text else name
+
+def _static_layer(card : PunchcardSVG, name : str, precision : int | None = None) -> str:
+    text = _static_text.get((name, precision))
+    if text is None:
+        with profiling.timer(f"emit.{name}"):
+            if precision is None or name in _UNROUNDED_LAYERS:
+                text = _STATIC_LAYER_EMITTERS[name](card)
+            else:
+                text = _numbers(precision).round_text(_static_layer(card, name))
+            _static_text[(name, precision)] = text
+    return text
+
+
+def _column_parts(card : PunchcardSVG,
+                  layer : str,
+                  numbers : _Numbers,
+                  emit : Callable[[PunchcardSVG, list[int], _Numbers], list[str]]) -> list[str]:
+    """ The text of each column of one of card's layers, kept on the card so that after
+        PunchcardSVG.set_content() only the changed columns are emitted again
+    """
+    key = (layer, numbers.precision)
+    kept = card._column_outputs.get(key)
+    if kept is None:
+        kept = card._column_outputs[key] = ([ None ] * COLUMNS, [ "" ] * COLUMNS)
+    (versions, parts) = kept
+    stale = [ column for (column, version) in enumerate(card._column_versions) if versions[column] != version ]
+    if stale:
+        for column, text in zip(stale, emit(card, stale, numbers)):
+            parts[column] = text
+            versions[column] = card._column_versions[column]
+    return parts
+
+def _punch_columns(card : PunchcardSVG, columns : list[int], numbers : _Numbers) -> list[str]:
+    holes : list[int] = []
+    ends : list[int] = []
+    for column in columns:
+        holes.extend(card._cardpunch_column_holes(card.card_codes[column], column))
+        ends.append(len(holes))
+    rects = [ _hole_rect(x, y, class_="cardpunch_boundary", fill="transparent", stroke="blue", numbers=numbers)
+              for (x, y) in zip(*numbers.geometry.hole_corners(holes)) ]
+    return [ "".join(rects[start:end]) for (start, end) in zip([0] + ends, ends) ]
+
+@profiling.timed("emit.punches")
+def _punches_layer(card : PunchcardSVG, suffix : str = "", numbers : _Numbers = _FULL) -> str:
+    return _group(_column_parts(card, 'punches', numbers, _punch_columns), id="cardpunches" + suffix)
+
+@profiling.timed("emit.cut_path")
+def _cut_path_layer(card : PunchcardSVG, merge_punches : bool = False, suffix : str = "", numbers : _Numbers = _FULL) -> str:
+    """ Emitter for the optimized cut lines: one compound path in cutting order """
+    from puncher.cutpath import optimized_cut_plan
+
+    num = numbers.num
+    # Commands joined as svg.py joins svg.Path.d, where the close command is "Z "
+    d = " ".join(f"M {num(outline[0][0])} {num(outline[0][1])} " + " ".join(f"L {num(x)} {num(y)}" for (x, y) in outline[1:]) + " Z "
+                 for outline in optimized_cut_plan(card, merge_punches=merge_punches).outlines)
+    return (f'<path stroke="{PunchcardSVG.STROKE_COLOR_CUTLINES}" stroke-width="{numbers.stroke_width}" '
+            f'class="cardpunch_boundary" id="cardcutpath{suffix}" d="{d}" fill="transparent"/>')
+
+def _cut_lines(card : PunchcardSVG,
+               optimize_cuts : bool = False,
+               merge_punches : bool = False,
+               suffix : str = "",
+               numbers : _Numbers = _FULL) -> list[str]:
+    if optimize_cuts:
+        return [ _cut_path_layer(card, merge_punches, suffix, numbers) ]
+    if suffix:
+        boundary = _card_boundary_layer(card, suffix, numbers)
+    else:
+        boundary = _static_layer(card, 'card_boundary', numbers.precision)
+    return [ boundary, _punches_layer(card, suffix, numbers) ]
+
+def _label_columns(card : PunchcardSVG, columns : list[int], numbers : _Numbers) -> list[str]:
+    content = card.card_content
+    return [ _centered_text(*_cell_center(column, 0, numbers), escape(content[column]), "cardchar")
+             if column < len(content) else "" for column in columns ]
+
+def _outline_columns(card : PunchcardSVG, columns : list[int], numbers : _Numbers) -> list[str]:
+    content = card.card_content
+    return [ _outlined_labels([ (*_cell_center(column, 0, numbers), content[column]) ], "cardchar")
+             if column < len(content) else "" for column in columns ]
+
+@profiling.timed("emit.content_labels")
+def _content_labels_layer(card : PunchcardSVG, suffix : str = "", numbers : _Numbers = _FULL, outline_text : bool = False) -> str:
+    if outline_text:
+        return _group(_column_parts(card, 'content_outlines', numbers, _outline_columns), id="cardpunchlabels" + suffix)
+    return _group(_column_parts(card, 'content_labels', numbers, _label_columns), id="cardpunchlabels" + suffix)
+
+def _manufacturer_label_layer(card : PunchcardSVG, suffix : str = "", numbers : _Numbers = _FULL, outline_text : bool = False) -> str:
+    x = numbers.num(PunchcardSVG.CARD_LEFT_MARGIN_IN)
+    y = numbers.num(PunchcardSVG.CARD_DIM_LENGTH_IN - 0.03)
+    text = card.card_manufacturer_string
+    if outline_text:
+        # with its runs of spaces collapsed, as SVG text is rendered
+        label = _outlined_labels([ (x, y, " ".join(text.split())) ], "card_manufacturer_label", anchor='start')
+        return _group([ label ], id="card_manufacturer_label" + suffix)
+    attributes = f'class="card_manufacturer_label" x="{x}" y="{y}"'
+    label = f"<text {attributes}>{text}</text>" if text else f"<text {attributes}/>"
+    return _group([label], id="card_manufacturer_label" + suffix)
+
+
+def _shared_layer_names(print_cellboundaries : bool, print_punchboundaries : bool) -> list[str]:
+    """ Static layers in the printed and structure layers, in document order """
+    names = [ 'row_number_labels', 'column_number_labels' ]
+    if print_cellboundaries:
+        names.append('character_grid')
+    if print_punchboundaries:
+        names.append('punchhole_boundaries')
+    return names
+
+def _layer_templates(card : PunchcardSVG, names : list[str], precision : int | None = None, outline_text : bool = False) -> list[str]:
+    """ The column templates the static layers names need in <defs> with use_defs """
+    return [ _static_layer(card, _label_layer_name(_INSTANCED_LAYERS[name][0], outline_text), precision)
+             for name in names if name in _INSTANCED_LAYERS ]
+
+def _shared_layer(card : PunchcardSVG, name : str, use_defs : bool = False, precision : int | None = None, outline_text : bool = False) -> str:
+    if use_defs and name in _INSTANCED_LAYERS:
+        return _static_layer(card, _INSTANCED_LAYERS[name][1], precision)
+    return _static_layer(card, _label_layer_name(name, outline_text), precision)
+
+def _structure_layers(card : PunchcardSVG,
+                      print_cellboundaries : bool,
+                      print_punchboundaries : bool,
+                      use_defs : bool = False,
+                      precision : int | None = None) -> list[str]:
+    parts : list[str] = []
+    if print_cellboundaries:
+        parts.append(_shared_layer(card, 'character_grid', use_defs, precision))
+    if print_punchboundaries:
+        parts.append(_shared_layer(card, 'punchhole_boundaries', use_defs, precision))
+    return parts
+
+def _printed_layers(card : PunchcardSVG, use_defs : bool = False, numbers : _Numbers = _FULL, outline_text : bool = False) -> list[str]:
+    return [ _shared_layer(card, 'row_number_labels', use_defs, numbers.precision, outline_text),
+             _shared_layer(card, 'column_number_labels', use_defs, numbers.precision, outline_text),
+             _content_labels_layer(card, numbers=numbers, outline_text=outline_text),
+             _manufacturer_label_layer(card, numbers=numbers, outline_text=outline_text) ]
+
+def _flattened_layer_parts(card : PunchcardSVG,
+                           print_cellboundaries : bool,
+                           print_punchboundaries : bool,
+                           transform : str | None = _DOCUMENT_TRANSFORM,
+                           suffix : str = "",
+                           numbers : _Numbers = _FULL,
+                           outline_text : bool = False) -> list[str]:
+    """ The flattened layer as its markup up to the image data, the base64 PNG, and the
+        markup after it, so the image can be written out without another copy of it
+    """
+    from puncher.flatten import printed_material_png
+
+    png_bytes = printed_material_png(card,
+                                     print_cellboundaries=print_cellboundaries,
+                                     print_punchboundaries=print_punchboundaries,
+                                     outline_text=outline_text)
+    group_attributes = _group_attributes("card_printed_flattened" + suffix, transform)
+    return [ f'<g{group_attributes}><image id="flattened_print{suffix}" href="data:image/png;base64,',
+             base64.b64encode(png_bytes).decode('ascii'),
+             f'" width="{numbers.num(PunchcardSVG.CARD_DIM_WIDTH_IN)}" height="{numbers.num(PunchcardSVG.CARD_DIM_LENGTH_IN)}"/></g>' ]
+
+def _flattened_layer(card : PunchcardSVG,
+                     print_cellboundaries : bool,
+                     print_punchboundaries : bool,
+                     transform : str | None = _DOCUMENT_TRANSFORM,
+                     suffix : str = "",
+                     numbers : _Numbers = _FULL,
+                     outline_text : bool = False) -> str:
+    return "".join(_flattened_layer_parts(card, print_cellboundaries, print_punchboundaries, transform, suffix, numbers, outline_text))
+
+
+@profiling.timed("svgwriter.dump")
+def dump(card : PunchcardSVG,
+         fp : TextIO,
+         flatten_printed_material : bool = False,
+         print_cellboundaries : bool = False,
+         print_punchboundaries: bool = False,
+         print_punchboxes : bool = True,
+         optimize_cuts : bool = False,
+         merge_punches : bool = False,
+         use_defs : bool = False,
+         outline_text : bool = False,
+         precision : int | None = PunchcardSVG.COORDINATE_PRECISION) -> None:
+    """ Write the SVG document for card to the text stream fp.  Takes the same options
+        as PunchcardSVG.makesvg and writes the same document, with numbers rounded to
+        precision decimal places (or in full, as makesvg writes them, with None).
+    """
+    numbers = _numbers(precision)
+    fp.write(_svg_open(PunchcardSVG.DOCUMENT_WIDTH_IN, PunchcardSVG.DOCUMENT_HEIGHT_IN))
+    fp.write(_static_layer(card, 'style', precision))
+
+    if flatten_printed_material:
+        parts = _flattened_layer_parts(card, print_cellboundaries, print_punchboundaries, numbers=numbers, outline_text=outline_text)
+        fp.writelines(parts)
+        # the layer's markup without the image data, which is all the element counts need
+        layers = [ parts[0] + parts[2] ]
+    else:
+        if use_defs:
+            templates = _layer_templates(card, _shared_layer_names(print_cellboundaries, print_punchboundaries), precision, outline_text)
+            fp.write(_defs(templates))
+        structure = _structure_layers(card, print_cellboundaries, print_punchboundaries, use_defs, precision)
+        printed = _printed_layers(card, use_defs, numbers, outline_text)
+        fp.write(_group(printed, id="card_printed", transform=_DOCUMENT_TRANSFORM))
+        fp.write(_group(structure, id="punchcard_structure", transform=_DOCUMENT_TRANSFORM))
+        layers = printed + structure
+
+    cut_lines = _cut_lines(card, optimize_cuts, merge_punches, numbers=numbers)
+    fp.write(_group(cut_lines, id="card_cutlines", transform=_DOCUMENT_TRANSFORM))
+    fp.write("</svg>")
+    if profiling.enabled():
+        for layer in layers + cut_lines:
+            profiling.count_layer_text(layer)
+
+def dumps(card : PunchcardSVG, **options) -> str:
+    """ Return the SVG document for card as a string, see dump() for the options.
+    """
+    fp = io.StringIO()
+    dump(card, fp, **options)
+    return fp.getvalue()
+
+def dump_svgz(card : PunchcardSVG, fileobj : BinaryIO, compresslevel : int = SVGZ_COMPRESSLEVEL, **options) -> None:
+    """ Write the SVG document for card, gzip compressed as an .svgz file, to the binary
+        stream fileobj.  The document is compressed as it is written, layer by layer, and
+        ends with a newline like writesvg's .svg files.  See dump() for the options.
+    """
+    # mtime 0 and no file name in the header, so the same card always compresses to the same bytes
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=compresslevel, filename="", mtime=0) as compressed:
+        with io.TextIOWrapper(compressed, encoding="utf-8") as fp:
+            dump(card, fp, **options)
+            fp.write("\n")
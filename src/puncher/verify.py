@@ -0,0 +1,267 @@
+""" Card reader: decodes rendered cards back to text, to check them against their deck.
+
+    A card is read from its cut lines, which are what actually gets cut: every outline
+    that is not the card boundary is a hole (or, with merged punches, a slot over
+    adjacent rows), and the hole positions it covers are punched.  SVG and svgz files
+    are read from the cut line markup, puncher's PDFs from the page content, and PNGs by
+    sampling the red cut line colour across the left and right edges of all 960 hole
+    positions at once with NumPy.  The punched holes of each column are decoded through
+    PunchcardSVG.CODEC, so a hole pattern that is not a character reads as U+FFFD.
+
+    Reading PNGs needs numpy and Pillow (pip install puncher[native]).
+"""
+import gzip
+import io
+import logging
+import re
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from puncher.geometry import COLUMNS, HOLE_ROWS, hole_index
+from puncher.puncher import PunchcardSVG
+
+logger = logging.getLogger("puncher")
+
+_GEOMETRY = PunchcardSVG.GEOMETRY
+_COLUMN_PITCH_IN = PunchcardSVG.CARD_INCHES_PER_COLUMN
+
+# Hole centres across a row and down a column, in card coordinates
+_COLUMN_X = [ _GEOMETRY.hole_center_x[hole_index(0, column)] for column in range(COLUMNS) ]
+_ROW_Y = [ _GEOMETRY.hole_center_y[hole_index(row, 0)] for row in range(HOLE_ROWS) ]
+_ROW_BITS = [ 1 << (HOLE_ROWS - 1 - row) for row in range(HOLE_ROWS) ]
+
+_CUT_LINES = re.compile(r'<g id="card_cutlines"')
+_RECT = re.compile(r"<rect\b[^>]*>")
+_PATH_D = re.compile(r'<path\b[^>]*?\bd="([^"]*)"')
+_NUMBER = re.compile(r"-?\d+(?:\.\d*)?(?:[eE]-?\d+)?")
+_PDF_STREAM = re.compile(rb"/Length (\d+) >>\nstream\n")
+
+# Below this an anti-aliased cut line fades into the printing and neighbouring holes blur together
+MIN_PNG_DPI = 96
+
+
+@dataclass
+class CardCheck:
+    """ One card as read back, and how it differs from the text it should carry """
+    source : str                            # file read, and page for PDFs
+    text : str                              # the card as read, COLUMNS characters
+    expected : str | None = None
+    # (column from 0, expected character, character read) for every column that differs;
+    # expected text past the last column is reported with "" read
+    mismatches : list[tuple[int, str, str]] = field(default_factory=list)
+    error : str | None = None               # the file could not be read, or card and text do not pair up
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches and self.error is None
+
+    def describe(self) -> str:
+        if self.error is not None:
+            return f"{self.source}: {self.error}"
+        shown = ", ".join(f"column {column + 1} {expected!r} read as {read!r}" if read else f"column {column + 1} {expected!r} is past the card"
+                          for (column, expected, read) in self.mismatches[:10])
+        more = f" (and {len(self.mismatches) - 10} more)" if len(self.mismatches) > 10 else ""
+        return f"{self.source}: {shown}{more}"
+
+
+def _masks_from_boxes(boxes : Iterable[tuple[float, float, float, float]]) -> array:
+    """ Column masks punched by the cut outlines with bounding boxes (left, top, right,
+        bottom), skipping the card boundary
+    """
+    masks = array('H', bytes(2 * COLUMNS))
+    for (left, top, right, bottom) in boxes:
+        if right - left > _COLUMN_PITCH_IN:
+            continue        # the card boundary
+        center_x = (left + right) / 2.0
+        column = round((center_x - _COLUMN_X[0]) / _COLUMN_PITCH_IN)
+        if not 0 <= column < COLUMNS or abs(_COLUMN_X[column] - center_x) > _COLUMN_PITCH_IN / 4.0:
+            logger.debug(f"verify: outline at x={center_x} is not on a column")
+            continue
+        for row in range(bisect_left(_ROW_Y, top), bisect_right(_ROW_Y, bottom)):
+            masks[column] |= _ROW_BITS[row]
+    return masks
+
+def _outline_box(coordinates : list[str]) -> tuple[float, float, float, float]:
+    xs = [ float(x) for x in coordinates[0::2] ]
+    ys = [ float(y) for y in coordinates[1::2] ]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+def _attribute(element : str, name : str) -> float:
+    match = re.search(rf'\s{name}="([^"]*)"', element)
+    if match is None:
+        raise ValueError(f"cut line {element} has no {name}")
+    return float(match.group(1))
+
+def read_svg(text : str) -> array:
+    """ Column masks of a card SVG (from makesvg or puncher.svgwriter), read from its
+        card_cutlines layer
+    """
+    start = _CUT_LINES.search(text)
+    if start is None:
+        raise ValueError("not a puncher card SVG, it has no card_cutlines layer (cutting mats cannot be read)")
+    cut_lines = text[start.start():]
+    boxes = []
+    for element in _RECT.findall(cut_lines):
+        (x, y) = (_attribute(element, "x"), _attribute(element, "y"))
+        boxes.append((x, y, x + _attribute(element, "width"), y + _attribute(element, "height")))
+    for d in _PATH_D.findall(cut_lines):
+        boxes.extend(_outline_box(_NUMBER.findall(outline)) for outline in d.split("M")[1:])
+    return _masks_from_boxes(boxes)
+
+def read_pdf(data : bytes) -> list[array]:
+    """ Column masks of each page of a PDF written by puncher.pdf """
+    pages = []
+    for match in _PDF_STREAM.finditer(data):
+        content = zlib.decompress(data[match.end():match.end() + int(match.group(1))]).decode('cp1252')
+        if "/Card Do" not in content:
+            continue        # the shared card artwork
+        # The cut lines are drawn last, once the stroke colour is set to red
+        boxes = []
+        (operands, outline) = ([], [])
+        for token in content[content.rindex(" RG ") + 4:].split():
+            if token in ("m", "l"):
+                outline.extend(operands[-2:])
+            elif token == "h":
+                boxes.append(_outline_box(outline))
+                outline = []
+            operands = [] if token.isalpha() else operands + [token]
+        pages.append(_masks_from_boxes(boxes))
+    if not pages:
+        raise ValueError("not a PDF written by puncher, it has no card pages")
+    return pages
+
+
+def _png_libraries():
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError(f"reading PNGs needs numpy and Pillow (pip install puncher[native]): {e}") from e
+    return (np, Image)
+
+@lru_cache(maxsize=8)
+def _edge_samples(width : int, height : int):
+    """ Pixels to sample for every hole position of a width x height document: a short
+        horizontal run across the hole's left edge and one across its right edge, on the
+        hole row's centre line.  Returns the centre line of each hole row, and for each
+        hole its row (0-11) and the left and right runs' pixel columns.
+    """
+    (np, _) = _png_libraries()
+    dpi = width / PunchcardSVG.DOCUMENT_WIDTH_IN
+    # wide enough to catch a cut line that rasterized a pixel off its true position,
+    # narrow enough not to reach the next column's holes
+    reach = max(1, round(PunchcardSVG.STROKE_WEIGHT_1PT_IN * dpi))
+    offsets = np.arange(-reach, reach + 1)
+    lines = [ min(height - 1, round((y + PunchcardSVG.DOCUMENT_MARGIN_TOP_IN) * dpi)) for y in _ROW_Y ]
+    rows = (np.arange(HOLE_ROWS * COLUMNS) // COLUMNS)[:, np.newaxis]
+    left_x = (np.frombuffer(_GEOMETRY.hole_x, dtype=np.float64) + PunchcardSVG.DOCUMENT_MARGIN_LEFT_IN) * dpi
+    right_x = left_x + _GEOMETRY.hole_width * dpi
+    left = np.clip(np.round(left_x).astype(np.intp)[:, np.newaxis] + offsets, 0, width - 1)
+    right = np.clip(np.round(right_x).astype(np.intp)[:, np.newaxis] + offsets, 0, width - 1)
+    return (lines, rows, left, right)
+
+def _red(np, pixels):
+    """ Which pixels have some of the cut line red in them.  The printing is brown, black,
+        grey and green, and for those and any blend of them with each other and the white
+        card, R - G is at most G - B; the red pushes R - 2G + B up by 255 times its coverage.
+    """
+    (r, g, b) = (pixels[..., 0].astype(np.int16), pixels[..., 1].astype(np.int16), pixels[..., 2].astype(np.int16))
+    return r - 2 * g + b > 32
+
+def read_png(data : bytes) -> array:
+    """ Column masks of a card PNG of the whole document, at MIN_PNG_DPI or more, from
+        cairosvg or the native backend
+    """
+    (np, Image) = _png_libraries()
+    with Image.open(io.BytesIO(data)) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        (width, height) = image.size
+        if width < PunchcardSVG.DOCUMENT_WIDTH_IN * MIN_PNG_DPI:
+            raise ValueError(f"a {width} pixel wide PNG is below {MIN_PNG_DPI} dpi, too coarse to tell the holes apart")
+        (lines, rows, left, right) = _edge_samples(width, height)
+        # Only the 12 hole row centre lines are sampled, so only they become arrays
+        pixels = np.stack([ np.asarray(image.crop((0, y, width, y + 1)))[0] for y in lines ])
+    punched = _red(np, pixels[rows, left]).any(axis=1) & _red(np, pixels[rows, right]).any(axis=1)
+    bits = np.array(_ROW_BITS, dtype=np.uint16)[:, np.newaxis]
+    masks = (punched.reshape(HOLE_ROWS, COLUMNS) * bits).sum(axis=0, dtype=np.uint16)
+    return array('H', masks.tobytes())
+
+
+def read_cards(data : bytes) -> list[array]:
+    """ Column masks of the card(s) in an SVG, svgz, PNG or puncher PDF file's bytes """
+    if data.startswith(b"\x89PNG"):
+        return [ read_png(data) ]
+    if data.startswith(b"%PDF"):
+        return read_pdf(data)
+    if data.startswith(b"\x1f\x8b"):
+        data = gzip.decompress(data)
+    return [ read_svg(data.decode('utf-8')) ]
+
+def read_file(path : Path | str) -> list[tuple[str, str]]:
+    """ (source, text) of each card in the file at path """
+    cards = read_cards(Path(path).read_bytes())
+    decode = PunchcardSVG.CODEC.decode
+    if len(cards) == 1:
+        return [ (str(path), decode(cards[0])) ]
+    return [ (f"{path} page {page}", decode(masks)) for page, masks in enumerate(cards, start=1) ]
+
+
+def compare(text : str, expected : str) -> list[tuple[int, str, str]]:
+    """ (column, expected, read) of each column where the card text read differs from
+        expected, and of any expected text past the end of the card
+    """
+    mismatches = [ (column, want, read) for column, (want, read) in enumerate(zip(expected.ljust(COLUMNS), text)) if want != read ]
+    mismatches.extend((column, want, "") for column, want in enumerate(expected[COLUMNS:], start=COLUMNS))
+    return mismatches
+
+def _read_checked(path : Path | str) -> list[tuple[str, str]] | str:
+    """ read_file(path), or the reason it cannot be read """
+    try:
+        return read_file(path)
+    except (OSError, ValueError, ImportError, zlib.error) as e:
+        return f"{type(e).__name__}: {e}"
+
+def verify(paths : Iterable[Path | str], expected : Iterable[str] | None = None, jobs : int = 1) -> Iterator[CardCheck]:
+    """ Read every card in the files at paths, in order, yielding a CardCheck per card.
+        With expected, the text each card should carry in the same order, each card is
+        compared with its text.  A file that cannot be read counts as one card, and a
+        card without text or text without a card is an error.  With jobs > 1 the files
+        are read by a pool of that many worker processes.
+    """
+    paths = list(paths)
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        files = executor.map(_read_checked, paths, chunksize=16)
+    else:
+        executor = None
+        files = map(_read_checked, paths)
+    texts = iter(expected) if expected is not None else None
+    try:
+        for (path, cards) in zip(paths, files):
+            if isinstance(cards, str):
+                if texts is not None:
+                    next(texts, None)
+                yield CardCheck(str(path), "", error=cards)
+                continue
+            for (source, text) in cards:
+                check = CardCheck(source, text)
+                if texts is not None:
+                    check.expected = next(texts, None)
+                    if check.expected is None:
+                        check.error = "no text left in the deck for this card"
+                    else:
+                        check.mismatches = compare(text, check.expected)
+                yield check
+        if texts is not None:
+            for text in texts:
+                yield CardCheck("(missing)", "", expected=text, error=f"no card for {text!r}")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)